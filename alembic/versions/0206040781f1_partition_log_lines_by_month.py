@@ -0,0 +1,136 @@
+"""Partition log_lines by month and dedup on a hash of raw
+
+Revision ID: 0206040781f1
+Revises: 3f12a7b9c4d1
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0206040781f1"
+down_revision = "3f12a7b9c4d1"
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    "id, version, creation_time, event_time, type, player1_name, player1_steamid, "
+    "player2_name, player2_steamid, weapon, raw, content, server, game"
+)
+# Partitions are created this many months ahead, see rcon.logs.partitions
+MONTHS_AHEAD = 2
+
+
+def _swap_tables(new_table):
+    """Replace log_lines with `new_table`, keeping its ID sequence"""
+    op.execute(f"INSERT INTO {new_table} ({COLUMNS}) SELECT {COLUMNS} FROM log_lines")
+    op.execute("ALTER SEQUENCE log_lines_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE log_lines")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO log_lines")
+    op.execute("ALTER SEQUENCE log_lines_id_seq OWNED BY log_lines.id")
+    for player in ("player1", "player2"):
+        op.create_foreign_key(
+            f"log_lines_{player}_steamid_fkey",
+            "log_lines",
+            "steam_id_64",
+            [f"{player}_steamid"],
+            ["id"],
+        )
+        op.create_index(
+            f"ix_log_lines_{player}_steamid", "log_lines", [f"{player}_steamid"]
+        )
+
+
+def upgrade():
+    # The partition key has to be part of the primary key and of the unique
+    # constraint. The unique index on (event_time, raw) was about as large as
+    # the table itself, it's replaced by one on a 16 bytes MD5 of raw that
+    # also serves the event_time lookups.
+    op.execute(
+        """
+        CREATE TABLE log_lines_partitioned (
+            id integer NOT NULL DEFAULT nextval('log_lines_id_seq'),
+            version integer,
+            creation_time timestamp without time zone,
+            event_time timestamp without time zone NOT NULL,
+            type varchar,
+            player1_name varchar,
+            player1_steamid integer,
+            player2_name varchar,
+            player2_steamid integer,
+            weapon varchar,
+            raw varchar NOT NULL,
+            content varchar,
+            server varchar,
+            game integer NOT NULL DEFAULT 1,
+            raw_hash uuid GENERATED ALWAYS AS (md5(raw)::uuid) STORED
+        ) PARTITION BY RANGE (event_time)
+        """
+    )
+    # One partition per month from the oldest line up to a few months from
+    # now, lines out of that range go to the default partition
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', coalesce(min(event_time), now() at time zone 'utc')),
+                    date_trunc('month', now() at time zone 'utc') + interval '{MONTHS_AHEAD} months',
+                    interval '1 month'
+                )
+                FROM log_lines
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF log_lines_partitioned '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'log_lines_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END
+        $$;
+        """
+    )
+    op.execute("CREATE TABLE log_lines_default PARTITION OF log_lines_partitioned DEFAULT")
+
+    _swap_tables("log_lines_partitioned")
+    op.create_primary_key("log_lines_pkey", "log_lines", ["id", "event_time"])
+    op.create_unique_constraint(
+        "unique_log_line", "log_lines", ["event_time", "raw_hash"]
+    )
+
+
+def downgrade():
+    # Partitions detached by the retention policy are not restored, re-import
+    # their archives before downgrading to keep them
+    op.execute(
+        """
+        CREATE TABLE log_lines_unpartitioned (
+            id integer NOT NULL DEFAULT nextval('log_lines_id_seq'),
+            version integer,
+            creation_time timestamp without time zone,
+            event_time timestamp without time zone NOT NULL,
+            type varchar,
+            player1_name varchar,
+            player1_steamid integer,
+            player2_name varchar,
+            player2_steamid integer,
+            weapon varchar,
+            raw varchar NOT NULL,
+            content varchar,
+            server varchar,
+            game integer NOT NULL DEFAULT 1
+        )
+        """
+    )
+    _swap_tables("log_lines_unpartitioned")
+    op.create_primary_key("log_lines_pkey", "log_lines", ["id"])
+    op.create_unique_constraint("unique_log_line", "log_lines", ["event_time", "raw"])
+    op.create_index("ix_log_lines_event_time", "log_lines", ["event_time"])
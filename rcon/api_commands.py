@@ -8,7 +8,7 @@ from typing import Any, Literal, Optional
 import rcon.settings
 from rcon import blacklist, game_logs, maps, player_history, webhook_service
 from rcon.audit import ingame_mods, online_mods
-from rcon.cache_utils import RedisCached, get_redis_pool
+from rcon.cache_utils import RedisCached, get_cache_metrics, get_redis_pool
 from rcon.commands import HLLCommandFailedError
 from rcon.discord import audit_user_config_differences
 from rcon.message_templates import (
@@ -438,6 +438,14 @@ class RconAPI(Rcon):
         # TODO: allow clearing specific cache keys
         return RedisCached.clear_all_caches(get_redis_pool())
 
+    def get_cache_metrics(self) -> dict[str, dict]:
+        """Return hit ratios, lock waits, source call times and value sizes per cached function
+
+        Collected by every CRCON service since the metrics were last reset
+        (through the `cache_metrics --reset` CLI command)
+        """
+        return get_cache_metrics()
+
     def get_player_profile(
         self,
         player_id: str,
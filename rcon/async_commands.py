@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import Any
+
+import rcon.settings
+from rcon.commands import (
+    build_gamestate,
+    next_map_id_from_sequence,
+    parse_map_sequence,
+)
+from rcon.connection import AsyncHLLConnection, HLLBrokenConnectionError, Response
+from rcon.game import get_game_profile
+from rcon.types import GameStateType, PlayerInfoType, ServerInfo
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncServerCtl:
+    """asyncio equivalent of the hot `ServerCtl` getters
+
+    A handful of pipelined sockets are shared by every coroutine on the event
+    loop, so a single loop can replace the threads otherwise needed for
+    concurrent RCON calls.
+    """
+
+    def __init__(self, config: ServerInfo, connections: int = 2, auto_retry=1):
+        self.config = config
+        self.game_profile = get_game_profile(config.game)
+        self.auto_retry = auto_retry
+        self.max_connections = max(1, connections)
+        self.conns: list[AsyncHLLConnection] = []
+        self._mu: asyncio.Lock | None = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        conns, self.conns = self.conns, []
+        for conn in conns:
+            await conn.close()
+
+    async def _get_connection(self) -> AsyncHLLConnection:
+        if self._mu is None:
+            self._mu = asyncio.Lock()
+
+        async with self._mu:
+            for conn in [c for c in self.conns if c.broken]:
+                logger.warning("Connection (%s) marked as broken, removing", conn.id)
+                self.conns.remove(conn)
+                await conn.close()
+
+            idle = [c for c in self.conns if not c.in_flight]
+            if idle or len(self.conns) >= self.max_connections:
+                return min(self.conns, key=lambda c: c.in_flight)
+
+            conn = AsyncHLLConnection()
+            await conn.connect(
+                self.config.host, int(self.config.port), self.config.password
+            )
+            self.conns.append(conn)
+            return conn
+
+    async def exchange(
+        self, command: str, version: int, content: dict[str, Any] | str = ""
+    ) -> Response:
+        logger.debug("Sending command %s: %s", command, content)
+        try:
+            conn = await self._get_connection()
+            response = await conn.exchange(command, version, content)
+        except (
+            HLLBrokenConnectionError,
+            asyncio.IncompleteReadError,
+            OSError,
+        ):
+            if not self.auto_retry:
+                raise
+            logger.exception("Failed %s, resending after 1 second", command)
+            await asyncio.sleep(1)
+            conn = await self._get_connection()
+            response = await conn.exchange(command, version, content)
+
+        response.raise_for_status()
+        return response
+
+    async def get_all_player_info(self) -> list[PlayerInfoType]:
+        response = await self.exchange(
+            "GetServerInformation", 2, {"Name": "players", "Value": ""}
+        )
+        return response.content_dict["players"]
+
+    async def get_player_info(self, player_id: str) -> PlayerInfoType | None:
+        response = await self.exchange(
+            "GetServerInformation", 2, {"Name": "player", "Value": player_id}
+        )
+        return response.content_dict  # type: ignore
+
+    async def get_logs(self, since_min_ago: int, filter_: str = "") -> list[str]:
+        response = await self.exchange(
+            "GetAdminLog",
+            2,
+            {"LogBackTrackTime": since_min_ago * 60, "Filters": filter_},
+        )
+        return [entry["message"] for entry in response.content_dict["entries"]]
+
+    async def get_gamestate(self) -> GameStateType:
+        # Both requests are in flight at the same time
+        session, sequence = await asyncio.gather(
+            self.exchange("GetServerInformation", 2, {"Name": "session", "Value": ""}),
+            self.exchange(
+                "GetServerInformation", 2, {"Name": "mapsequence", "Value": ""}
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(session, BaseException):
+            raise session
+
+        try:
+            if isinstance(sequence, BaseException):
+                raise sequence
+            next_map_id = next_map_id_from_sequence(
+                parse_map_sequence(sequence.content_dict)
+            )
+        except Exception:  # noqa
+            next_map_id = "unknown"
+
+        return build_gamestate(self.game_profile, session.content_dict, next_map_id)
+
+
+def create_async_server_ctl(
+    credentials: ServerInfo | None = None, connections: int = 2
+) -> AsyncServerCtl:
+    """Construct an async controller, connections are opened on first use"""
+    if credentials is None:
+        credentials = rcon.settings.get_server_info()
+    return AsyncServerCtl(credentials, connections=connections)
@@ -0,0 +1,124 @@
+"""Value codecs and key schemes for `rcon.cache_utils.ttl_cache`
+
+Codecs prefix what they write with a single tag byte so the decoder knows how
+a value was stored, e.g. `OrjsonCodec` falls back to pickle for the rare
+values JSON can't represent and `CompressedCodec` only compresses large ones.
+"""
+
+import datetime
+import hashlib
+import pickle
+import zlib
+from typing import Any, Protocol
+
+import orjson
+
+_PICKLE_TAG = b"p"
+_JSON_TAG = b"j"
+_RAW_TAG = b"r"
+_ZLIB_TAG = b"z"
+
+_DATETIME = "__datetime__"
+_TIMEDELTA = "__timedelta__"
+_TAGGED_TYPES = (b'"' + _DATETIME.encode() + b'"', b'"' + _TIMEDELTA.encode() + b'"')
+
+
+class CacheCodec(Protocol):
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, data: bytes) -> Any: ...
+
+
+class PickleCodec:
+    """Round trips any picklable value, what `ttl_cache` has always used"""
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+def _encode_default(value: Any):
+    if isinstance(value, datetime.datetime):
+        return {_DATETIME: value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {_TIMEDELTA: value.total_seconds()}
+    raise TypeError
+
+
+def _revive(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if _DATETIME in value:
+                return datetime.datetime.fromisoformat(value[_DATETIME])
+            if _TIMEDELTA in value:
+                return datetime.timedelta(seconds=value[_TIMEDELTA])
+        return {k: _revive(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_revive(v) for v in value]
+    return value
+
+
+class OrjsonCodec:
+    """Compact, fast JSON that other languages can read
+
+    datetimes (naive or aware) and timedeltas are preserved, tuples come back
+    as lists. Values JSON can't hold, such as dicts with non string keys, are
+    pickled instead.
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return _JSON_TAG + orjson.dumps(
+                value,
+                default=_encode_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return _PICKLE_TAG + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        tag, body = data[:1], memoryview(data)[1:]
+        if tag == _PICKLE_TAG:
+            return pickle.loads(body)
+        value = orjson.loads(body)
+        # Only walk the value when it actually holds tagged types
+        if any(marker in data for marker in _TAGGED_TYPES):
+            return _revive(value)
+        return value
+
+
+class CompressedCodec:
+    """zlib compress what `codec` produces when it's at least `min_size` bytes"""
+
+    def __init__(self, codec: CacheCodec, min_size: int = 16 * 1024, level: int = 1):
+        self.codec = codec
+        self.min_size = min_size
+        self.level = level
+
+    def dumps(self, value: Any) -> bytes:
+        data = self.codec.dumps(value)
+        if len(data) >= self.min_size:
+            return _ZLIB_TAG + zlib.compress(data, self.level)
+        return _RAW_TAG + data
+
+    def loads(self, data: bytes) -> Any:
+        tag, body = data[:1], memoryview(data)[1:]
+        if tag == _ZLIB_TAG:
+            return self.codec.loads(zlib.decompress(body))
+        return self.codec.loads(body.tobytes())
+
+
+def hashed_key(prefix: str, args: tuple, kwargs: dict) -> str:
+    """A short, stable key: the prefix and a hash of the canonical JSON arguments
+
+    Keyword arguments are sorted so their order doesn't matter, and the key
+    can be rebuilt from any language with a blake2b-128 of the same JSON.
+    """
+    params = orjson.dumps(
+        {"args": args, "kwargs": kwargs},
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+    )
+    return f"{prefix}__{hashlib.blake2b(params, digest_size=16).hexdigest()}"
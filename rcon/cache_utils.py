@@ -2,22 +2,185 @@ import functools
 import logging
 import os
 import pickle
+import threading
 import time
 import uuid
+import weakref
+from collections import Counter
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 import redis
 import redis.exceptions
 import simplejson
+from cachetools import TTLCache
 from cachetools.func import ttl_cache as cachetools_ttl_cache
 
+from rcon.cache_codecs import CacheCodec, hashed_key
+
 logger = logging.getLogger(__name__)
 
 _REDIS_POOL = None
 # We use the redis database with db number 0 as a shared database amongst all the containers
 _GLOBAL_REDIS_POOL = None
 
+# In-process caches in front of redis, see `LocalCache`
+LOCAL_CACHE_INVALIDATION_CHANNEL = "cache_invalidations"
+LOCAL_CACHE_MAX_TTL_SECONDS = 5
+LOCAL_CACHE_MAXSIZE = 256
+_INVALIDATION_SEPARATOR = b"\x00"
+_LOCAL_CACHES: dict[bytes, list["LocalCache"]] = {}
+_LOCAL_CACHES_MU = threading.Lock()
+_invalidation_listener: threading.Thread | None = None
+
+# Background refreshes of stale values, see `RedisCached.stale_ttl_seconds`
+REFRESH_WORKERS = 4
+_refresh_executor: ThreadPoolExecutor | None = None
+_refresh_executor_mu = threading.Lock()
+
+# Per function cache metrics, collected in-process and periodically added to
+# a redis hash per function so every service contributes
+CACHE_METRICS_PREFIX = "cache_metrics:"
+CACHE_METRICS_FLUSH_SECONDS = 10
+_INSTRUMENTED: "weakref.WeakSet[RedisCached]" = weakref.WeakSet()
+_metrics_flush_mu = threading.Lock()
+_metrics_flushed_at = time.monotonic()
+
+
+class LocalCache:
+    """A small, short lived, in-process LRU cache in front of redis
+
+    It holds the serialized value so every hit still returns a fresh copy,
+    exactly like a redis hit would. Entries are dropped when they expire, when
+    the cache is full (least recently used first) and whenever any process
+    clears the matching redis keys, through a pub/sub invalidation channel.
+    The lifetime is kept short so a missed invalidation (e.g. while the
+    listener reconnects) can only serve a value for a few seconds.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = LOCAL_CACHE_MAXSIZE):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._mu = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key):
+        with self._mu:
+            return self._cache.get(key)
+
+    def set(self, key, value) -> None:
+        with self._mu:
+            self._cache[key] = value
+
+    def pop(self, key) -> None:
+        with self._mu:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._mu:
+            self._cache.clear()
+
+
+def _as_bytes(value: str | bytes) -> bytes:
+    return value if isinstance(value, bytes) else value.encode()
+
+
+def _register_local_cache(prefix: str, cache: LocalCache) -> None:
+    with _LOCAL_CACHES_MU:
+        caches = _LOCAL_CACHES.setdefault(_as_bytes(prefix), [])
+        if not any(c is cache for c in caches):
+            caches.append(cache)
+
+
+def register_local_cache(prefix: str, cache, red: redis.Redis) -> None:
+    """Have the invalidations published for `prefix` dropped from `cache`
+
+    `cache` needs a `pop(key)` and a `clear()` method, like `LocalCache`. Call
+    it before caching anything, the listener is started again after a fork.
+    """
+    _register_local_cache(prefix, cache)
+    _ensure_invalidation_listener(red)
+
+
+def _ensure_invalidation_listener(red: redis.Redis) -> None:
+    """Subscribe to invalidations once per process, the first time it's needed"""
+    global _invalidation_listener
+    # The thread doesn't survive a fork, e.g. of the preloaded gunicorn workers
+    if _invalidation_listener is not None and _invalidation_listener.is_alive():
+        return
+    with _LOCAL_CACHES_MU:
+        if _invalidation_listener is None or not _invalidation_listener.is_alive():
+            _invalidation_listener = threading.Thread(
+                target=_listen_for_invalidations,
+                args=(red,),
+                name="cache-invalidations",
+                daemon=True,
+            )
+            _invalidation_listener.start()
+
+
+def _listen_for_invalidations(red: redis.Redis) -> None:
+    while True:
+        try:
+            pubsub = red.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(LOCAL_CACHE_INVALIDATION_CHANNEL)
+            # Anything cached while we were not listening may have been invalidated
+            clear_local_caches()
+            for message in pubsub.listen():
+                if message and message.get("type") == "message":
+                    _handle_invalidation(message["data"])
+        except redis.exceptions.RedisError:
+            logger.exception("Cache invalidation listener disconnected, retrying")
+            time.sleep(1)
+
+
+def _handle_invalidation(data: str | bytes) -> None:
+    prefix, _, key = _as_bytes(data).partition(_INVALIDATION_SEPARATOR)
+    if not prefix:
+        clear_local_caches()
+        return
+
+    for cache in _LOCAL_CACHES.get(prefix, []):
+        if key:
+            cache.pop(key)
+            cache.pop(key.decode(errors="replace"))
+        else:
+            cache.clear()
+
+
+def publish_invalidation(
+    red: redis.Redis, prefix: str | bytes = b"", key: str | bytes | None = None
+) -> None:
+    """Tell every process to drop local copies of `key`, or of every key of `prefix`
+
+    An empty prefix clears every local cache.
+    """
+    message = _as_bytes(prefix) + _INVALIDATION_SEPARATOR
+    if key:
+        message += _as_bytes(key)
+    try:
+        red.publish(LOCAL_CACHE_INVALIDATION_CHANNEL, message)
+    except redis.exceptions.RedisError:
+        logger.exception("Unable to publish cache invalidation")
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _refresh_executor_mu:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=REFRESH_WORKERS, thread_name_prefix="cache-refresh"
+            )
+        return _refresh_executor
+
+
+def clear_local_caches() -> None:
+    for caches in list(_LOCAL_CACHES.values()):
+        for cache in caches:
+            cache.clear()
+
 
 class RedisCached:
     PREFIX = "cached_"
@@ -33,6 +196,9 @@ class RedisCached:
         cache_falsy=True,
         serializer=simplejson.dumps,
         deserializer=simplejson.loads,
+        local_ttl_seconds: float | None = None,
+        stale_ttl_seconds: int | None = None,
+        hashed_keys: bool = False,
     ):
         # TODO: isinstance check ttl_seconds it must be an int
         # not a float or anything else
@@ -49,13 +215,30 @@ class RedisCached:
         self.deserializer = deserializer
         self.ttl_seconds = ttl_seconds
         self.is_method = is_method
+        self.hashed_keys = hashed_keys
         self.cache_falsy = cache_falsy
+        # When set, values are kept `stale_ttl_seconds` past `ttl_seconds` and
+        # served stale while a single background worker refreshes them
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.stats: Counter[str] = Counter()
+        self._unflushed: Counter[str] = Counter()
+        self._stats_mu = threading.Lock()
+        _INSTRUMENTED.add(self)
+
+        self.local_cache: LocalCache | None = None
+        if local_ttl_seconds:
+            self.local_cache = LocalCache(
+                min(local_ttl_seconds, ttl_seconds, LOCAL_CACHE_MAX_TTL_SECONDS)
+            )
+            _register_local_cache(self.key_prefix, self.local_cache)
 
     @staticmethod
     def clear_all_caches(pool) -> bool:
         red = redis.Redis(connection_pool=pool)
         keys = list(red.scan_iter(match=f"{RedisCached.PREFIX}*"))
         logger.warning("Wiping cached values %s", keys)
+        clear_local_caches()
+        publish_invalidation(red)
         if not keys:
             return 0
         return red.delete(*keys)
@@ -67,11 +250,19 @@ class RedisCached:
     def key(self, *args, **kwargs):
         if self.is_method:
             args = args[1:]
+        if self.hashed_keys:
+            return hashed_key(self.key_prefix, args, kwargs)
         params = self.serializer({"args": args, "kwargs": kwargs})
         if isinstance(params, bytes):
             return self.key_prefix.encode() + b"__" + params
         return f"{self.key_prefix}__{params}"
 
+    def fresh_key(self, key):
+        """Marks a value as fresh, stale values outlive it by `stale_ttl_seconds`"""
+        if isinstance(key, bytes):
+            return key + b"__fresh"
+        return f"{key}__fresh"
+
     def lock_key(self, key):
         if isinstance(key, bytes):
             return b"lock_" + key
@@ -99,6 +290,85 @@ class RedisCached:
         except redis.exceptions.RedisError:
             logger.exception("Unable to release cache refresh lock")
 
+    def _set_local(self, key, serialized) -> None:
+        if self.local_cache is not None:
+            _ensure_invalidation_listener(self.red)
+            self.local_cache.set(key, serialized)
+
+    @property
+    def metrics_name(self) -> str:
+        return self.function.__qualname__
+
+    def _record(self, **metrics: float) -> None:
+        with self._stats_mu:
+            self.stats.update(metrics)
+            self._unflushed.update(metrics)
+        _maybe_flush_cache_metrics(self.red)
+
+    def get_stats(self) -> dict[str, float]:
+        """This process' metrics since it started, see `get_cache_metrics`"""
+        with self._stats_mu:
+            return dict(self.stats)
+
+    def take_unflushed_stats(self) -> dict[str, float]:
+        with self._stats_mu:
+            unflushed = dict(self._unflushed)
+            self._unflushed.clear()
+        return unflushed
+
+    def _call_source(self, func, args, kwargs):
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._record(source_calls=1, source_seconds=time.monotonic() - start)
+
+    def _store(self, key, serialized) -> None:
+        self._record(stores=1, stored_bytes=len(serialized))
+        if self.stale_ttl_seconds:
+            with self.red.pipeline() as pipe:
+                pipe.setex(key, self.ttl_seconds + self.stale_ttl_seconds, serialized)
+                pipe.setex(self.fresh_key(key), self.ttl_seconds, 1)
+                pipe.execute()
+        else:
+            self.red.setex(key, self.ttl_seconds, serialized)
+        self._set_local(key, serialized)
+
+    def _refresh_in_background(self, key, args, kwargs) -> None:
+        """Refresh a stale value unless another worker is already doing it"""
+        lock_key = self.lock_key(key)
+        lock_token = str(uuid.uuid4())
+        try:
+            lock_acquired = self.red.set(
+                lock_key, lock_token, nx=True, ex=max(1, min(30, self.ttl_seconds))
+            )
+        except redis.exceptions.RedisError:
+            logger.exception("Unable to acquire cache refresh lock")
+            return
+        if not lock_acquired:
+            return
+
+        self._record(refresh=1)
+        try:
+            _get_refresh_executor().submit(
+                self._refresh, key, lock_key, lock_token, args, kwargs
+            )
+        except RuntimeError:
+            # The executor is shut down when the interpreter exits
+            self._release_lock(lock_key, lock_token)
+
+    def _refresh(self, key, lock_key, lock_token, args, kwargs) -> None:
+        try:
+            val = self._call_source(self.function, args, kwargs)
+            if not val and not self.cache_falsy:
+                return
+            self._store(key, self.serializer(val))
+        except Exception:
+            self._record(refresh_error=1)
+            logger.exception("Unable to refresh cached value for %s", self.__name__)
+        finally:
+            self._release_lock(lock_key, lock_token)
+
     def __call__(self, *args, **kwargs):
         val = None
         key = self.key(*args, **kwargs)
@@ -108,8 +378,19 @@ class RedisCached:
         cache_available = True
         refresh_without_lock = False
         func = self.function
+
+        if self.local_cache is not None:
+            val = self.local_cache.get(key)
+            if val is not None:
+                self._record(hit=1)
+                return self.deserializer(val)
+
+        fresh = True
         try:
-            val = self.red.get(key)
+            if self.stale_ttl_seconds:
+                val, fresh = self.red.mget(key, self.fresh_key(key))
+            else:
+                val = self.red.get(key)
         except redis.exceptions.RedisError:
             cache_available = False
             logger.exception("Unable to use cache")
@@ -118,11 +399,19 @@ class RedisCached:
                 logger.error("Using fallback function due to cache failure: %s", func)
 
         if val is not None:
+            if fresh is None:
+                self._record(stale=1)
+                self._refresh_in_background(key, args, kwargs)
+                return self.deserializer(val)
             # logger.debug("Cache HIT for %s", self.key(*args, **kwargs))
+            self._record(hit=1)
+            self._set_local(key, val)
             return self.deserializer(val)
 
         if not cache_available:
-            return func(*args, **kwargs)
+            self._record(fallback=1)
+            return self._call_source(func, args, kwargs)
+        self._record(miss=1)
 
         # logger.debug("Cache MISS for %s", self.key(*args, **kwargs))
         try:
@@ -139,7 +428,8 @@ class RedisCached:
             refresh_without_lock = True
 
         if not lock_acquired and not refresh_without_lock:
-            deadline = time.monotonic() + max(0.25, min(5, self.ttl_seconds))
+            wait_start = time.monotonic()
+            deadline = wait_start + max(0.25, min(5, self.ttl_seconds))
             while time.monotonic() < deadline:
                 time.sleep(0.05)
                 try:
@@ -148,17 +438,25 @@ class RedisCached:
                     logger.exception("Unable to use cache while waiting for refresh")
                     break
                 if val is not None:
+                    self._record(
+                        lock_waits=1, lock_wait_seconds=time.monotonic() - wait_start
+                    )
                     return self.deserializer(val)
+            self._record(
+                lock_waits=1,
+                lock_wait_timeouts=1,
+                lock_wait_seconds=time.monotonic() - wait_start,
+            )
 
         try:
-            val = func(*args, **kwargs)
+            val = self._call_source(func, args, kwargs)
 
             if not val and not self.cache_falsy:
                 logger.debug("Caching falsy result is disabled for %s", self.__name__)
                 return val
 
             try:
-                self.red.setex(key, self.ttl_seconds, self.serializer(val))
+                self._store(key, self.serializer(val))
                 # logger.debug("Cache SET for %s", self.key(*args, **kwargs))
             except redis.exceptions.RedisError:
                 logger.exception("Unable to set cache")
@@ -182,7 +480,10 @@ class RedisCached:
             key = self.key(*args, **kwargs)
         logger.debug("Invalidating cache for %s", key)
         if key:
-            self.red.delete(key)
+            self.red.delete(key, self.fresh_key(key))
+            if self.local_cache is not None:
+                self.local_cache.pop(key)
+                publish_invalidation(self.red, self.key_prefix, key)
 
     def clear_all(self):
         try:
@@ -191,10 +492,90 @@ class RedisCached:
                 self.red.delete(*keys)
         except redis.exceptions.RedisError:
             logger.exception("Unable to clear cache")
+        if self.local_cache is not None:
+            self.local_cache.clear()
+            publish_invalidation(self.red, self.key_prefix)
         # else:
         #   logger.debug("Cache CLEARED for %s", keys)
 
 
+def _maybe_flush_cache_metrics(red: redis.Redis) -> None:
+    global _metrics_flushed_at
+    if time.monotonic() - _metrics_flushed_at < CACHE_METRICS_FLUSH_SECONDS:
+        return
+    # Whoever notices first flushes for every function, the others carry on
+    if not _metrics_flush_mu.acquire(blocking=False):
+        return
+    try:
+        _metrics_flushed_at = time.monotonic()
+        flush_cache_metrics(red)
+    finally:
+        _metrics_flush_mu.release()
+
+
+def flush_cache_metrics(red: redis.Redis) -> None:
+    """Add the metrics collected since the last flush to redis, in one round trip"""
+    pipe = red.pipeline(transaction=False)
+    for cached in list(_INSTRUMENTED):
+        for metric, value in cached.take_unflushed_stats().items():
+            pipe.hincrbyfloat(
+                f"{CACHE_METRICS_PREFIX}{cached.metrics_name}", metric, value
+            )
+    try:
+        pipe.execute()
+    except redis.exceptions.RedisError:
+        logger.exception("Unable to flush cache metrics")
+
+
+def _ratio(numerator: float, denominator: float, scale: float = 1) -> float | None:
+    return round(numerator / denominator * scale, 3) if denominator else None
+
+
+def get_cache_metrics(red: redis.Redis | None = None) -> dict[str, dict]:
+    """Metrics of every cached function, from every service, since the last reset
+
+    Hit ratios count stale values served as hits.
+    """
+    if red is None:
+        red = redis.Redis(connection_pool=get_redis_pool(decode_responses=False))
+
+    keys = list(red.scan_iter(match=f"{CACHE_METRICS_PREFIX}*"))
+    pipe = red.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+
+    result: dict[str, dict] = {}
+    for key, raw in zip(keys, pipe.execute()):
+        name = (key.decode() if isinstance(key, bytes) else key).removeprefix(
+            CACHE_METRICS_PREFIX
+        )
+        metrics = Counter(
+            {
+                (k.decode() if isinstance(k, bytes) else k): float(v)
+                for k, v in raw.items()
+            }
+        )
+        served = metrics["hit"] + metrics["stale"]
+        result[name] = dict(metrics) | {
+            "hit_ratio": _ratio(served, served + metrics["miss"] + metrics["fallback"]),
+            "avg_lock_wait_ms": _ratio(
+                metrics["lock_wait_seconds"], metrics["lock_waits"], 1000
+            ),
+            "avg_source_ms": _ratio(
+                metrics["source_seconds"], metrics["source_calls"], 1000
+            ),
+            "avg_stored_bytes": _ratio(metrics["stored_bytes"], metrics["stores"]),
+        }
+    return result
+
+
+def reset_cache_metrics(red: redis.Redis | None = None) -> int:
+    if red is None:
+        red = redis.Redis(connection_pool=get_redis_pool(decode_responses=False))
+    keys = list(red.scan_iter(match=f"{CACHE_METRICS_PREFIX}*"))
+    return red.delete(*keys) if keys else 0
+
+
 def construct_redis_url(db_number: int = 0) -> str:
     """Allow overriding the database number when creating a redis instance"""
     host = os.getenv("HLL_REDIS_HOST")
@@ -264,8 +645,25 @@ def ttl_cache(
     is_method=True,
     cache_falsy=True,
     function_cache_unavailable=None,
+    local_ttl=None,
+    stale_ttl=None,
+    codec: CacheCodec | None = None,
+    hashed_keys=False,
     **kwargs,
 ):
+    """Cache the decorated function's results in redis for `ttl` seconds
+
+    `local_ttl` additionally keeps results in an in-process cache for up to
+    that many seconds (capped at `LOCAL_CACHE_MAX_TTL_SECONDS`), for values a
+    process asks for many times per second.
+
+    `stale_ttl` keeps results that many seconds past `ttl`: callers then get
+    the stale value right away while one worker refreshes it in the
+    background, instead of waiting on the refresh.
+
+    `codec` replaces pickle for the values (see `rcon.cache_codecs`) and
+    `hashed_keys` builds short, readable keys from a hash of the arguments.
+    """
     pool = get_redis_pool(decode_responses=False)
     # Allow use of in memory cache and not redis when running tests
     # but still use redis when running the development web server
@@ -289,8 +687,11 @@ def ttl_cache(
             function_cache_unavailable=function_cache_unavailable,
             is_method=is_method,
             cache_falsy=cache_falsy,
-            serializer=pickle.dumps,
-            deserializer=pickle.loads,
+            serializer=codec.dumps if codec else pickle.dumps,
+            deserializer=codec.loads if codec else pickle.loads,
+            local_ttl_seconds=local_ttl,
+            stale_ttl_seconds=stale_ttl,
+            hashed_keys=hashed_keys,
         )
 
         def wrapper(*args, **kwargs):
@@ -301,6 +702,7 @@ def ttl_cache(
         wrapper.cache_clear = cached_func.clear_all
         wrapper.get_cached_value_for = cached_func.get_cached_value_for
         wrapper.clear_for = cached_func.clear_for
+        wrapper.cache_stats = cached_func.get_stats
         wrapper.cache = cached_func
         return wrapper
 
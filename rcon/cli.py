@@ -1,8 +1,12 @@
+import functools
 import inspect
 import json
 import logging
+import multiprocessing
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import UTC, datetime, timedelta
+from pathlib import Path
 from typing import Any
 
 import click
@@ -12,19 +16,33 @@ from sqlalchemy import select, text
 
 import rcon.expiring_vips.service
 import rcon.seed_vip.service
+import rcon.steam_refresh
 import rcon.user_config
 import rcon.user_config.utils
 import rcon.watch_killrate
 from rcon import auto_settings, broadcast, routines
 from rcon.automods import automod
 from rcon.blacklist import BlacklistCommandHandler
-from rcon.cache_utils import RedisCached, get_redis_pool, invalidates
+from rcon.cache_utils import (
+    RedisCached,
+    get_cache_metrics,
+    get_redis_pool,
+    invalidates,
+    reset_cache_metrics,
+)
 from rcon.discord_chat import get_handler
+from rcon.live_stats import live_stats_loop
+from rcon.logs.bus import LogBus
 from rcon.logs.loop import LogLoop, load_generic_hooks
+from rcon.logs.partitions import (
+    MONTHS_AHEAD,
+    import_archive,
+    list_partitions,
+    maintain_partitions,
+)
 from rcon.logs.recorder import LogRecorder
 from rcon.logs.stream import LogStream
 from rcon.models import PlayerID, enter_session, install_unaccent
-from rcon.player_stats import live_stats_loop
 from rcon.rcon import get_rcon
 from rcon.steam_utils import enrich_db_users
 from rcon.types import GameEnum, ServerInfo
@@ -73,6 +91,24 @@ def run_enrich_db_users():
         sys.exit(1)
 
 
+@cli.command(name="steam_refresh")
+def run_steam_refresh():
+    try:
+        rcon.steam_refresh.run()
+    except:  # noqa
+        logger.exception("Steam refresh stopped")
+        sys.exit(1)
+
+
+@cli.command(name="steam_refresh_metrics")
+def print_steam_refresh_metrics():
+    metrics = rcon.steam_refresh.get_steam_refresh_metrics()
+    if metrics is None:
+        print("No metrics published yet, is the steam_refresh service running?")
+        return
+    print(json.dumps(metrics, indent=2))
+
+
 @cli.command(name="log_loop")
 def run_log_loop():
     # Invalidate the cache on startup so it always loads user settings
@@ -85,6 +121,15 @@ def run_log_loop():
             sys.exit(1)
 
 
+@cli.command(name="log_bus_lag")
+def print_log_bus_lag():
+    lag = LogBus().lag()
+    if not lag:
+        print("No consumers yet, are the log_recorder and log_stream services running?")
+        return
+    print(json.dumps(lag, indent=2))
+
+
 @cli.command(name="log_stream")
 def run_log_stream():
     try:
@@ -158,6 +203,49 @@ def run_log_recorder(interval, frequency_min, now):
     LogRecorder(interval).run(run_immediately=now)
 
 
+@cli.command(name="log_partitions")
+@click.option("--months-ahead", type=int, default=MONTHS_AHEAD)
+@click.option(
+    "--retention-months",
+    type=int,
+    default=None,
+    help="Archive the log lines older than this many full months, kept forever by default",
+)
+@click.option(
+    "--archive-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default="/logs/log_lines_archive",
+)
+def run_log_partitions(months_ahead, retention_months, archive_dir):
+    """Create the upcoming log_lines partitions and archive the expired ones"""
+    with enter_session() as sess:
+        result = maintain_partitions(
+            sess,
+            retention_months=retention_months,
+            archive_directory=archive_dir,
+            months_ahead=months_ahead,
+        )
+        if result is None:
+            print("Partitions are already being maintained by another server")
+            return
+        created, archives = result
+        for partition in created:
+            print(f"Created {partition.name}")
+        for path in archives:
+            print(f"Archived {path}")
+        for partition in list_partitions(sess):
+            print(partition.name)
+
+
+@cli.command(name="import_log_lines_archive")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, path_type=Path))
+def run_import_log_lines_archive(paths):
+    """Record the log lines of archives written by log_partitions again"""
+    for path in paths:
+        with enter_session() as sess:
+            print(f"{path}: {import_archive(sess, path)} log lines imported")
+
+
 def init(force=False):
     install_unaccent()
 
@@ -201,6 +289,38 @@ def clear():
     RedisCached.clear_all_caches(get_redis_pool())
 
 
+@cli.command(name="cache_metrics")
+@click.option("-s", "--sort-by", default="source_seconds")
+@click.option("--reset", default=False, is_flag=True)
+def print_cache_metrics(sort_by, reset):
+    """Show how effective each ttl_cache'd function is, busiest first"""
+    metrics = get_cache_metrics()
+    columns = (
+        "hit",
+        "stale",
+        "miss",
+        "fallback",
+        "hit_ratio",
+        "lock_waits",
+        "avg_lock_wait_ms",
+        "source_calls",
+        "avg_source_ms",
+        "avg_stored_bytes",
+    )
+    print(f"{'function':<45}" + "".join(f"{c:>17}" for c in columns))
+    for name, values in sorted(
+        metrics.items(), key=lambda item: item[1].get(sort_by) or 0, reverse=True
+    ):
+        cells = (values.get(c) for c in columns)
+        print(
+            f"{name:<45}"
+            + "".join(f"{'-' if v is None else f'{v:g}':>17}" for v in cells)
+        )
+
+    if reset:
+        reset_cache_metrics()
+
+
 @cli.command
 def export_vips():
     ctl = get_rcon()
@@ -232,12 +352,17 @@ def do_print(func):
     default=False,
     help="Set this flag if you want the existing stats to be overriden. Otherwise they will just log an error and we move on to the next",
 )
-def process_games(start_day_offset, end_day_offset=0, force=False):
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    help="The number of processes recording the stats of the games in parallel",
+)
+def process_games(start_day_offset, end_day_offset=0, force=False, workers=1):
     from sqlalchemy import and_
-    from sqlalchemy.exc import IntegrityError
 
-    from rcon.models import Maps, enter_session
-    from rcon.workers import record_stats_from_map
+    from rcon.models import Maps, enter_session, get_engine
+    from rcon.workers import record_map_stats
 
     start_date = datetime.now(tz=UTC) - timedelta(days=start_day_offset)
     start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -246,27 +371,38 @@ def process_games(start_day_offset, end_day_offset=0, force=False):
 
     print("Reprocessing date range: ", start_date, end_date)
     with enter_session() as sess:
-        all_maps = (
-            sess.query(Maps)
+        map_ids = [
+            map_id
+            for (map_id,) in sess.query(Maps.id)
             .filter(and_(Maps.start > start_date, Maps.start < end_date))
-            .all()
+            .order_by(Maps.start)
+        ]
+    print(f"Found {len(map_ids)} games to reprocess")
+
+    record = functools.partial(record_map_stats, force=force)
+    if workers > 1:
+        # The forked workers open their own connections
+        get_engine().dispose()
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
         )
-        print(f"Found {len(all_maps)} games to reprocess")
-        for map_ in all_maps:
-            print("Reprocessing map: ", map_.to_dict())
-            try:
-                # TODO we could attempt to find the temporary cached stats in redis for the match
-                record_stats_from_map(sess, map_, None, force=force)
-                sess.commit()
-                print("Done")
-            except IntegrityError as e:
-                sess.rollback()
-                # logger.exception("Failed")
+        results = executor.map(record, map_ids)
+    else:
+        executor = None
+        results = map(record, map_ids)
+
+    try:
+        for map_id, error in zip(map_ids, results):
+            if error:
                 print(
-                    "Can't re-process stats. Probably already exist. Set force flag to override. Error msg: ",
-                    repr(e),
+                    f"Can't re-process stats of map {map_id}. Set force flag to override already recorded stats. Error msg: ",
+                    error,
                 )
-                continue
+            else:
+                print(f"Map {map_id} done")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
 
 def _models_to_exclude():
@@ -1,4 +1,5 @@
 import logging
+import math
 import threading
 import time
 from collections.abc import Generator, Sequence
@@ -7,8 +8,14 @@ from datetime import timedelta
 from functools import wraps
 from typing import Any
 
-from rcon.connection import Handle, HLLCommandError, HLLConnection, Response
-from rcon.game import get_game_profile
+from rcon.connection import (
+    Handle,
+    HLLCommandError,
+    HLLConnection,
+    HLLMultiplexedConnection,
+    Response,
+)
+from rcon.game import GameProfile, get_game_profile
 from rcon.maps import GameMode
 from rcon.perf_statistics import PerformanceStatistics
 from rcon.types import (
@@ -55,6 +62,64 @@ def _escape_params(func):
     return wrapper
 
 
+def next_map_id_from_sequence(sequence: MapSequenceResponse) -> str:
+    if not sequence["maps"]:
+        return "unknown"
+    next_index = (sequence["current_index"] + 1) % len(sequence["maps"])
+    return sequence["maps"][next_index]
+
+
+def parse_map_sequence(data: dict[str, Any]) -> MapSequenceResponse:
+    return {
+        "maps": [x["iD"].split("/")[-1] for x in data["mAPS"]],
+        "current_index": data["currentIndex"],
+    }
+
+
+def build_gamestate(
+    game_profile: GameProfile, s: dict[str, Any], next_map_id: str
+) -> GameStateType:
+    """Build the gamestate from a `session` response and the next map ID"""
+    time_remaining = timedelta(seconds=int(s["remainingMatchTime"]))
+    seconds_remaining = int(time_remaining.total_seconds())
+    raw_time_remaining = f"{seconds_remaining // 3600}:{(seconds_remaining // 60) % 60:02}:{seconds_remaining % 60:02}"
+
+    current_map = game_profile.parse_layer_or_unknown(s["mapId"])
+    # The server reports an empty gameMode between matches. The layer ID is
+    # still populated there and encodes the mode, so prefer it over failing
+    # the whole gamestate call -- an unhandled ValueError here kills every
+    # caller, including the log event loop and the scoreboard service.
+    game_mode = (
+        game_profile.parse_game_mode_or_none(s["gameMode"]) or current_map.game_mode
+    )
+    next_map = game_profile.parse_layer_or_unknown(next_map_id)
+
+    return GameStateType(
+        next_map=next_map.model_dump(),
+        axis_score=s["axisScore"],
+        axis_faction=s["axisFaction"],
+        num_axis_players=s["axisPlayerCount"],
+        allied_score=s["alliedScore"],
+        allied_faction=s["alliedFaction"],
+        num_allied_players=s["alliedPlayerCount"],
+        allied_faction_id=s["alliedFaction"],
+        axis_faction_id=s["axisFaction"],
+        allied_morale=s["alliedMorale"],
+        axis_morale=s["axisMorale"],
+        initial_morale=s["initialMorale"],
+        current_map=current_map.model_dump(),
+        raw_time_remaining=raw_time_remaining,
+        time_remaining=time_remaining,
+        game_mode=game_mode,
+        match_time=s["matchTime"],
+        queue_count=s["queueCount"],
+        max_queue_count=s["maxQueueCount"],
+        vip_queue_count=s["vipQueueCount"],
+        max_vip_queue_count=s["maxVipQueueCount"],
+        server_name=s["serverName"],
+    )
+
+
 class HLLCommandFailedError(Exception):
     """Raised when a command fails"""
 
@@ -71,14 +136,43 @@ class ServerCtl:
     """
 
     def __init__(
-        self, config: ServerInfo, perf_stats: PerformanceStatistics, auto_retry=1
+        self,
+        config: ServerInfo,
+        perf_stats: PerformanceStatistics,
+        auto_retry=1,
+        multiplexed_connections: int = 0,
     ) -> None:
         self.config = config
         self.game_profile = get_game_profile(config.game)
         self.perf_stats = perf_stats
         self.auto_retry = auto_retry
+        # When > 0, every thread shares this many pipelined sockets instead of
+        # opening one blocking socket per thread
+        self.multiplexed_connections = multiplexed_connections
         self.mu = threading.Lock()
-        self.conns: dict[int, HLLConnection] = {}
+        self.conns: dict[int | str, HLLConnection] = {}
+
+    def _connection_key(self) -> int | str:
+        if not self.multiplexed_connections:
+            return threading.get_ident()
+
+        # Hand out the least busy shared socket, or an unused slot if one is free
+        best_key: int | str | None = None
+        best_load = None
+        for slot in range(self.multiplexed_connections):
+            key = f"multiplexed-{slot}"
+            conn = self.conns.get(key)
+            if conn is None or conn.broken:
+                return key
+            load = conn.in_flight  # type: ignore[attr-defined]
+            if best_load is None or load < best_load:
+                best_key, best_load = key, load
+        return best_key  # type: ignore[return-value]
+
+    def _new_connection(self) -> HLLConnection:
+        if self.multiplexed_connections:
+            return HLLMultiplexedConnection()
+        return HLLConnection()
 
     @contextmanager
     def with_connection(self) -> Generator[HLLConnection, None, None]:
@@ -90,11 +184,18 @@ class ServerCtl:
             raise TimeoutError()
 
         try:
-            conn = self.conns.get(thread_id)
+            conn_key = self._connection_key()
+            conn = self.conns.get(conn_key)
+            if conn is not None and conn.broken:
+                # A frame was cut short, whatever is left in the socket is garbage
+                conn.close()
+                self.conns.pop(conn_key, None)
+                self.perf_stats.increment("connection_closed")
+                conn = None
             if conn is None:
-                conn = HLLConnection()
+                conn = self._new_connection()
                 self._connect(conn)
-                self.conns[thread_id] = conn
+                self.conns[conn_key] = conn
                 self.perf_stats.increment("connection_established")
             else:
                 self.perf_stats.increment("connection_from_pool")
@@ -104,6 +205,12 @@ class ServerCtl:
         try:
             yield conn
         except Exception as e:
+            if isinstance(conn, HLLMultiplexedConnection) and not conn.broken:
+                # Other threads are waiting on the same socket: a timeout or a
+                # failed request only concerns this caller, the reader thread
+                # marks the connection as broken when the socket is unusable
+                raise
+
             # All other errors, that might be caught (like UnicodeDecodeError) do not really qualify as an error of the
             # connection itself. Instead of reconnecting the existing connection here (conditionally), we simply discard
             # the connection, assuming it is broken. The pool will establish a new connection when needed.
@@ -122,7 +229,8 @@ class ServerCtl:
 
                 try:
                     conn.close()
-                    self.conns.pop(thread_id, None)
+                    if self.conns.get(conn_key) is conn:
+                        self.conns.pop(conn_key, None)
                     self.perf_stats.increment("connection_closed")
                 finally:
                     self.mu.release()
@@ -141,7 +249,8 @@ class ServerCtl:
 
                 try:
                     conn.close()
-                    self.conns.pop(thread_id, None)
+                    if self.conns.get(conn_key) is conn:
+                        self.conns.pop(conn_key, None)
                     self.perf_stats.increment("connection_closed")
                 finally:
                     self.mu.release()
@@ -207,6 +316,9 @@ class ServerCtl:
         try:
             response = handle.receive()
             self.perf_stats.increment("receive_size", len(response.content))
+            self.perf_stats.observe_latency(
+                handle.request.name, time.monotonic() - handle.sent_at
+            )
             response.raise_for_status()
             return response
 
@@ -243,6 +355,9 @@ class ServerCtl:
         try:
             response = handle.receive()
             self.perf_stats.increment("receive_size", len(response.content))
+            self.perf_stats.observe_latency(
+                handle.request.name, time.monotonic() - handle.sent_at
+            )
             return response if response.is_successful() else None
 
         except (HLLCommandFailedError, UnicodeDecodeError, OSError) as e:
@@ -308,6 +423,22 @@ class ServerCtl:
         handle = self.send(command, version, content, log_info=log_info, conn=conn)
         return self.receive_success(handle)
 
+    def exchange_many(
+        self,
+        requests: Sequence[tuple[str, int, dict[str, Any] | str]],
+    ) -> list[Response]:
+        """Pipeline several requests and wait for all of their responses
+
+        Every request is written before the first response is awaited, so the
+        whole batch costs roughly a single round trip to the game server.
+        """
+        with self.with_connection() as conn:
+            handles = [
+                self.send(command, version, content, conn=conn)
+                for command, version, content in requests
+            ]
+        return [self.receive(handle) for handle in handles]
+
     def get_profanities(self) -> list[str]:
         return self.exchange(
             "GetServerInformation", 2, {"Name": "bannedwords", "Value": ""}
@@ -399,13 +530,11 @@ class ServerCtl:
         }
 
     def get_map_sequence(self) -> MapSequenceResponse:
-        data = self.exchange(
-            "GetServerInformation", 2, {"Name": "mapsequence", "Value": ""}
-        ).content_dict
-        return {
-            "maps": [x["iD"].split("/")[-1] for x in data["mAPS"]],
-            "current_index": data["currentIndex"],
-        }
+        return parse_map_sequence(
+            self.exchange(
+                "GetServerInformation", 2, {"Name": "mapsequence", "Value": ""}
+            ).content_dict
+        )
 
     def get_slots(self) -> SlotsType:
         resp = self.exchange(
@@ -433,7 +562,7 @@ class ServerCtl:
 
     def get_logs(
         self,
-        since_min_ago: int,
+        since_min_ago: int | float,
         filter_: str = "",
         conn: HLLConnection | None = None,
     ) -> list[str]:
@@ -442,7 +571,10 @@ class ServerCtl:
             for entry in self.exchange(
                 "GetAdminLog",
                 2,
-                {"LogBackTrackTime": since_min_ago * 60, "Filters": filter_},
+                {
+                    "LogBackTrackTime": math.ceil(since_min_ago * 60),
+                    "Filters": filter_,
+                },
                 conn=conn,
             ).content_dict["entries"]
         ]
@@ -690,49 +822,11 @@ class ServerCtl:
         s = self.exchange(
             "GetServerInformation", 2, {"Name": "session", "Value": ""}
         ).content_dict
-        time_remaining = timedelta(seconds=int(s["remainingMatchTime"]))
-        seconds_remaining = int(time_remaining.total_seconds())
-        raw_time_remaining = f"{seconds_remaining // 3600}:{(seconds_remaining // 60) % 60:02}:{seconds_remaining % 60:02}"
-
-        current_map = self.game_profile.parse_layer_or_unknown(s["mapId"])
-        # The server reports an empty gameMode between matches. The layer ID is
-        # still populated there and encodes the mode, so prefer it over failing
-        # the whole gamestate call -- an unhandled ValueError here kills every
-        # caller, including the log event loop and the scoreboard service.
-        game_mode = (
-            self.game_profile.parse_game_mode_or_none(s["gameMode"])
-            or current_map.game_mode
-        )
-
         try:
-            next_map = self.game_profile.parse_layer_or_unknown(self._get_next_map_id())
+            next_map_id = self._get_next_map_id()
         except Exception:  # noqa
-            next_map = self.game_profile.parse_layer_or_unknown("unknown")
-
-        return GameStateType(
-            next_map=next_map.model_dump(),
-            axis_score=s["axisScore"],
-            axis_faction=s["axisFaction"],
-            num_axis_players=s["axisPlayerCount"],
-            allied_score=s["alliedScore"],
-            allied_faction=s["alliedFaction"],
-            num_allied_players=s["alliedPlayerCount"],
-            allied_faction_id=s["alliedFaction"],
-            axis_faction_id=s["axisFaction"],
-            allied_morale=s["alliedMorale"],
-            axis_morale=s["axisMorale"],
-            initial_morale=s["initialMorale"],
-            current_map=current_map.model_dump(),
-            raw_time_remaining=raw_time_remaining,
-            time_remaining=time_remaining,
-            game_mode=game_mode,
-            match_time=s["matchTime"],
-            queue_count=s["queueCount"],
-            max_queue_count=s["maxQueueCount"],
-            vip_queue_count=s["vipQueueCount"],
-            max_vip_queue_count=s["maxVipQueueCount"],
-            server_name=s["serverName"],
-        )
+            next_map_id = "unknown"
+        return build_gamestate(self.game_profile, s, next_map_id)
 
     def get_game_mode(self) -> str:
         return self.exchange(
@@ -773,11 +867,7 @@ class ServerCtl:
         }
 
     def _get_next_map_id(self) -> str:
-        sequence = self.get_map_sequence()
-        if not sequence["maps"]:
-            return "unknown"
-        next_index = (sequence["current_index"] + 1) % len(sequence["maps"])
-        return sequence["maps"][next_index]
+        return next_map_id_from_sequence(self.get_map_sequence())
 
     def get_objective_row(self, row: int):
         if not (0 <= row <= 4):
@@ -1,19 +1,22 @@
 import datetime
 import logging
 import unicodedata
+from collections.abc import Mapping
 
 from dateutil import parser
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, aliased
 
 from rcon.logs.loop import LogLoop
-from rcon.models import LogLine, PlayerID, enter_session
+from rcon.logs.record import LogRecord
+from rcon.models import LogLine, PlayerID, enter_session, get_log_line_weapon
 from rcon.rcon import LOG_ACTIONS
 from rcon.types import (
     ParsedLogsType,
     StructuredLogLineWithMetaData,
 )
 from rcon.utils import (
+    LogsHistory,
     strtobool,
 )
 
@@ -68,7 +71,13 @@ def get_recent_logs(
     exact_player_match: bool = False,
     exact_action: bool = False,
     inclusive_filter: bool = True,
+    as_records: bool = False,
 ) -> ParsedLogsType:
+    """Filter the most recent lines of `LogsHistory`
+
+    The log services that hold on to the lines pass `as_records` to get the
+    compact `LogRecord`s instead of dicts.
+    """
     if player_search is None:
         player_search = []
     if action_filter is None:
@@ -93,20 +102,35 @@ def get_recent_logs(
     exact_player_match = strtobool(exact_player_match)
     exact_action = strtobool(exact_action)
     inclusive_filter = strtobool(inclusive_filter)
+    if player_search and not isinstance(player_search, list):
+        player_search = [player_search]
+
+    indexed = _query_log_index(
+        log_list,
+        start,
+        end,
+        player_search,
+        action_filter,
+        min_timestamp,
+        exact_player_match,
+        exact_action,
+        inclusive_filter,
+    )
+    if indexed is not None:
+        logs, all_players, actions = indexed
+        return _recent_logs_result(logs, all_players, actions, as_records)
 
     if start != 0:
         all_logs = log_list[start : min(end, len(log_list))]
     logs: list[StructuredLogLineWithMetaData] = []
     all_players = set()
     actions = set(LOG_ACTIONS)
-    if player_search and not isinstance(player_search, list):
-        player_search = [player_search]
     # flatten that shit
     line: StructuredLogLineWithMetaData
     for idx, line in enumerate(all_logs):
         if idx >= end - start:
             break
-        if not isinstance(line, dict):
+        if not isinstance(line, Mapping):
             continue
         if min_timestamp and line["timestamp_ms"] / 1000 < min_timestamp:
             logger.debug("Stopping log read due to old timestamp at index %s", idx)
@@ -154,9 +178,64 @@ def get_recent_logs(
             all_players.add(p2)
         actions.add(line["action"])
 
+    return _recent_logs_result(logs, all_players, actions, as_records)
+
+
+def _query_log_index(
+    log_list: LogsHistory,
+    start: int,
+    end: int,
+    player_search: list[str],
+    action_filter: list[str],
+    min_timestamp: float | None,
+    exact_player_match: bool,
+    exact_action: bool,
+    inclusive_filter: bool,
+) -> tuple[list[LogRecord], set[str], set[str]] | None:
+    """`get_recent_logs` served from the log history indexes, if they cover it"""
+
+    def name_matches(name: str) -> bool:
+        return any(
+            is_player(search, name, exact_player_match) for search in player_search
+        )
+
+    def action_matches(action: str) -> bool:
+        return bool(is_action(action_filter, action, exact_action)) == bool(
+            inclusive_filter
+        )
+
+    result = log_list.index.query(
+        start,
+        end,
+        min_timestamp=min_timestamp,
+        name_matches=name_matches if player_search else None,
+        action_matches=action_matches if action_filter else None,
+    )
+    if result is None:
+        return None
+
+    raw_lines, players, actions = result
+    logs = []
+    for raw_line in raw_lines:
+        if raw_line is None:
+            continue
+        line = log_list.deserializer(raw_line)
+        if isinstance(line, Mapping):
+            logs.append(line)
+    return logs, players, actions | set(LOG_ACTIONS)
+
+
+def _recent_logs_result(
+    logs: list, players: set[str], actions: set[str], as_records: bool
+) -> ParsedLogsType:
+    if not as_records:
+        logs = [
+            line.to_dict() if isinstance(line, LogRecord) else line for line in logs
+        ]
+
     return {
         "actions": sorted(actions),
-        "players": list(all_players),
+        "players": list(players),
         "logs": logs,
     }
 
@@ -242,6 +321,72 @@ def get_historical_logs_records(
     return q.all()
 
 
+def get_historical_logs_columns(
+    sess: Session,
+    from_: datetime.datetime,
+    till: datetime.datetime,
+    server_filter: str | None = None,
+) -> list[StructuredLogLineWithMetaData]:
+    """The lines logged between `from_` and `till`, oldest first
+
+    Only the columns the stats need are read, with the player IDs, in a single
+    query. Loading `LogLine` rows loads their players one by one.
+    """
+    player_1 = aliased(PlayerID)
+    player_2 = aliased(PlayerID)
+    q = (
+        select(
+            LogLine.version,
+            LogLine.event_time,
+            LogLine.type,
+            LogLine.player1_name,
+            player_1.player_id,
+            LogLine.player2_name,
+            player_2.player_id,
+            LogLine.weapon,
+            LogLine.raw,
+            LogLine.content,
+        )
+        .outerjoin(player_1, LogLine.player1_player_id == player_1.id)
+        .outerjoin(player_2, LogLine.player2_player_id == player_2.id)
+        .where(LogLine.event_time >= from_, LogLine.event_time <= till)
+        .order_by(LogLine.event_time.asc(), LogLine.id.asc())
+    )
+    if server_filter:
+        q = q.where(LogLine.server == server_filter)
+
+    return [
+        {
+            "version": version,
+            "timestamp_ms": int(event_time.timestamp() * 1000),
+            "event_time": event_time,
+            "relative_time_ms": None,
+            "raw": raw,
+            "line_without_time": None,
+            "action": type_,
+            "player_name_1": player1_name,
+            "player_id_1": player1_id,
+            "player_name_2": player2_name,
+            "player_id_2": player2_id,
+            "weapon": get_log_line_weapon(type_, weapon, raw),
+            "message": content,
+            "sub_content": None,
+        }
+        for (
+            version,
+            event_time,
+            type_,
+            player1_name,
+            player1_id,
+            player2_name,
+            player2_id,
+            weapon,
+            raw,
+            content,
+        ) in sess.execute(q)
+    ]
+
+
 def get_historical_logs(
     player_name: str | None = None,
     action: str | None = None,
@@ -0,0 +1,516 @@
+"""Live stats folded line by line from the log bus
+
+The live stats (`LIVE_STATS`) and the current game stats (`LIVE_GAME_STATS`)
+used to be recomputed from every log line of the sessions, and of the game,
+at each refresh. `LiveStatsEngine` instead reads each new line once from the
+log bus and folds it into per player accumulators:
+
+- `LiveSessionStats`: each connected player since they connected, started
+  over when they reconnect
+- `LiveGameStats`: each player of the current game, started over at
+  `MATCH START`
+
+A refresh only costs the new lines and one pass over the players. The
+accumulators are checkpointed to Redis, the lines are acknowledged on the bus
+once checkpointed, so a restart resumes from the checkpoint. Without a recent
+one they're rebuilt from `LogsHistory`.
+"""
+
+import datetime
+import logging
+import pickle
+import time
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from datetime import UTC
+
+import redis
+
+from rcon.cache_utils import get_redis_client
+from rcon.logs.bus import MAX_BLOCK_MS, LogBusConsumer
+from rcon.logs.recorder import HighWaterMark
+from rcon.models import enter_session
+from rcon.player_history import get_player_profile_by_player_ids
+from rcon.player_stats import (
+    PLAYER_ID,
+    BaseStats,
+    LiveStats,
+    PlayerSessions,
+    Streaks,
+    TimeWindowStats,
+    _apply_current_map_player_stats,
+)
+from rcon.types import (
+    AllLogTypes,
+    GetPlayersType,
+    MapInfo,
+    PlayerStat,
+    PlayerStatsType,
+    StructuredLogLineWithMetaData,
+)
+from rcon.user_config.rcon_server_settings import RconServerSettingsUserConfig
+from rcon.utils import LogsHistory, MapsHistory, get_default_player_stats
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATS_KEY = "LIVE_STATS"
+LIVE_GAME_STATS_KEY = "LIVE_GAME_STATS"
+CHECKPOINT_KEY = "live_stats_checkpoint"
+BUS_GROUP = "live_stats"
+BUS_BATCH_SIZE = 1000
+CHECKPOINT_SECONDS = 10
+# Older checkpoints are dropped, the sessions have changed too much since
+MAX_CHECKPOINT_AGE_SECONDS = 300
+
+
+@dataclass
+class PlayerAccumulator:
+    """The stats of a player so far and their ongoing streaks"""
+
+    player: GetPlayersType
+    stats: PlayerStatsType
+    streaks: Streaks = field(default_factory=Streaks)
+
+    @classmethod
+    def new(
+        cls,
+        name: str | None,
+        player_id: str,
+        last_spawn: datetime.datetime | None = None,
+    ) -> "PlayerAccumulator":
+        stats = PlayerStatsType(get_default_player_stats())
+        stats.update(player=name, player_id=player_id, last_spawn=last_spawn)
+        return cls({"name": name, PLAYER_ID: player_id}, stats)
+
+    def rename(self, name: str | None) -> None:
+        if name:
+            self.player["name"] = self.stats["player"] = name
+
+
+def _fold_player_line(
+    calc: BaseStats, acc: PlayerAccumulator, log: StructuredLogLineWithMetaData
+) -> None:
+    calc._process_log(acc.stats, acc.player, log)
+    calc._calc_streaks(acc.stats, acc.player, log, acc.streaks)
+
+
+def _player_slots(log: StructuredLogLineWithMetaData):
+    for slot in (1, 2):
+        yield log.get(f"player_id_{slot}"), log.get(f"player_name_{slot}")
+
+
+class LiveSessionStats(LiveStats):
+    """The stats of the connected players since they connected, what
+    `LiveStats.get_current_players_stats` computes"""
+
+    def __init__(self):
+        super().__init__()
+        self.players: dict[str, PlayerAccumulator] = {}
+
+    def prime(
+        self, players: Iterable[GetPlayersType], now: datetime.datetime
+    ) -> dict[str, int]:
+        """Start over with the connected players, returns the timestamp from
+        which the lines of each of them are part of their session"""
+        self.players = {}
+        sessions_start = {}
+        for player in players:
+            player_id = player.get(PLAYER_ID)
+            if not player_id:
+                continue
+            self.players[player_id] = PlayerAccumulator.new(
+                player["name"], player_id, self._get_player_first_appearance(player)
+            )
+            sessions_start[player_id] = int(
+                (now.timestamp() - self._get_player_session_time(player)) * 1000
+            )
+        return sessions_start
+
+    def fold(
+        self,
+        log: StructuredLogLineWithMetaData,
+        sessions_start: Mapping[str, int] | None = None,
+    ) -> None:
+        action = log["action"]
+        for player_id, player_name in _player_slots(log):
+            if not player_id:
+                continue
+            if sessions_start is not None and log["timestamp_ms"] < sessions_start.get(
+                player_id, float("inf")
+            ):
+                continue
+
+            acc = self.players.get(player_id)
+            if acc is None or action == AllLogTypes.connected:
+                acc = self.players[player_id] = PlayerAccumulator.new(
+                    player_name, player_id
+                )
+            acc.rename(player_name)
+            _fold_player_line(self, acc, log)
+            if action == AllLogTypes.disconnected:
+                del self.players[player_id]
+
+    def snapshot(
+        self,
+        players: Iterable[GetPlayersType],
+        detailed_players: Mapping[str, Mapping],
+    ) -> dict[str, PlayerStatsType]:
+        stats_by_player: dict[str, PlayerStatsType] = {}
+        for player in players:
+            player_id = player.get(PLAYER_ID)
+            if not player_id:
+                continue
+            acc = self.players.get(player_id)
+            # Only the top level keys are changed from here on, the pickled
+            # snapshot is taken before the next line is folded
+            stats = (
+                PlayerStatsType(dict(acc.stats))
+                if acc
+                else PlayerStatsType(get_default_player_stats())
+            )
+            profile = player.get("profile") or {}
+            soldier = profile.get("soldier") or {}
+            details = detailed_players.get(player_id) or {}
+            stats.update(
+                player=player["name"],
+                player_id=player_id,
+                platform=details.get("platform") or soldier.get("platform"),
+                steaminfo=profile.get("steaminfo"),
+                time_seconds=int(self._get_player_session_time(player)),
+            )
+            if not stats["last_spawn"]:
+                stats["last_spawn"] = self._get_player_first_appearance(player)
+            self._calc_computed_stats(stats)
+            stats_by_player[player_id] = stats
+        return stats_by_player
+
+
+class LiveGameStats(TimeWindowStats):
+    """The stats of the current game, what
+    `TimeWindowStats.get_players_stats_from_time` computes from the start of
+    the game"""
+
+    def __init__(self):
+        super().__init__()
+        # player ID: (platform, steaminfo), not checkpointed
+        self.profiles: dict[str, tuple[str | None, dict | None]] = {}
+        self.reset(None)
+
+    def reset(self, start: datetime.datetime | None) -> None:
+        self.start = start
+        self.players: dict[str, PlayerAccumulator] = {}
+        self.times: dict[str, PlayerSessions] = {}
+        self.name_to_id: dict[str, str] = {}
+        self.profiles = {}
+
+    def learn_names(self, cached_players: Mapping[str, PlayerStat]) -> None:
+        """Names of the players of `MapsHistory` for the lines without IDs"""
+        for player_id, player in cached_players.items():
+            for name in player.get("names") or ():
+                self.name_to_id.setdefault(name, player_id)
+
+    def fold(self, log: StructuredLogLineWithMetaData) -> None:
+        if log["action"] == AllLogTypes.match_start:
+            self.reset(
+                datetime.datetime.fromtimestamp(log["timestamp_ms"] // 1000, UTC)
+            )
+        if self.start is None:
+            return
+
+        for player_id, player_name in _player_slots(log):
+            player_key = player_id or (player_name and self.name_to_id.get(player_name))
+            if not player_key:
+                continue
+            if player_name:
+                self.name_to_id.setdefault(player_name, player_key)
+
+            self._set_start_end_times(player_key, self.times, log, self.start)
+            acc = self.players.get(player_key)
+            if acc is None:
+                acc = self.players[player_key] = PlayerAccumulator.new(
+                    player_name,
+                    player_key,
+                    self._get_player_first_appearance({PLAYER_ID: player_key}),
+                )
+            acc.rename(player_name)
+            _fold_player_line(self, acc, log)
+
+    def session_time(self, player_key: str, until: datetime.datetime) -> int:
+        """The time played this game, the ongoing session ending at `until`"""
+        times = self.times.get(player_key)
+        if not times:
+            return 0
+        starts, ends = times["start"], list(times["end"])
+        if len(starts) == len(ends) + 1:
+            ends.append(until)
+        if not starts or len(starts) != len(ends):
+            logger.error("Sessions time don't match for %s - %s", player_key, times)
+            return 0
+        return sum(
+            int((end - start).total_seconds()) for start, end in zip(starts, ends)
+        )
+
+    def _load_profiles(self, player_ids: Iterable[str]) -> None:
+        # Players without a profile yet are looked up again next time
+        missing = [
+            player_id for player_id in player_ids if player_id not in self.profiles
+        ]
+        if not missing:
+            return
+        with enter_session() as sess:
+            for profile in get_player_profile_by_player_ids(sess, missing):
+                self.profiles[profile.player_id] = (
+                    profile.soldier.platform if profile.soldier else None,
+                    profile.steaminfo.to_dict() if profile.steaminfo else None,
+                )
+
+    def snapshot(self, until: datetime.datetime) -> dict[str, PlayerStatsType]:
+        # Players only seen in lines without their name aren't listed
+        players = {key: acc for key, acc in self.players.items() if acc.player["name"]}
+        self._load_profiles(players)
+
+        stats_by_player: dict[str, PlayerStatsType] = {}
+        for player_key, acc in players.items():
+            platform, steaminfo = self.profiles.get(player_key, (None, None))
+            stats = PlayerStatsType(dict(acc.stats))
+            stats.update(
+                platform=platform,
+                steaminfo=steaminfo,
+                time_seconds=self.session_time(player_key, until),
+            )
+            self._calc_computed_stats(stats)
+            stats_by_player[player_key] = stats
+        return stats_by_player
+
+
+class LiveStatsEngine:
+    def __init__(
+        self,
+        consumer: LogBusConsumer | None = None,
+        red: redis.Redis | None = None,
+        logs_history: LogsHistory | None = None,
+    ):
+        self.consumer = consumer or LogBusConsumer(BUS_GROUP)
+        self.red = red or get_redis_client()
+        self.logs_history = logs_history or LogsHistory()
+        self.sessions = LiveSessionStats()
+        self.game = LiveGameStats()
+        # The last line folded, the lines read from both the logs history and
+        # the bus or read again from the bus are only folded once
+        self.mark = HighWaterMark()
+        self._unacknowledged: list[str] = []
+
+    def fold(self, logs: Iterable[StructuredLogLineWithMetaData | None]) -> int:
+        """Fold the lines not folded yet, oldest first"""
+        folded = 0
+        for log in logs:
+            if log is None:
+                logger.warning("Live stats missed lines trimmed from the log bus")
+                continue
+            if self.mark.covers(log):
+                continue
+            try:
+                self.game.fold(log)
+                self.sessions.fold(log)
+            except Exception:
+                logger.exception("Invalid log line %s", log)
+            self.mark.advance([log])
+            folded += 1
+        return folded
+
+    def _history_since(self, timestamp_ms: int):
+        # Oldest first, without the lines not folded yet
+        return (
+            log
+            for log in reversed(self.logs_history.since(timestamp_ms))
+            if self.mark.covers(log)
+        )
+
+    def rebuild(self, now: datetime.datetime | None = None) -> None:
+        """Start over from the logs history"""
+        now = now or datetime.datetime.now(tz=UTC)
+        players = [p for p in self.sessions.rcon.get_players() if p.get(PLAYER_ID)]
+        sessions_start = self.sessions.prime(players, now)
+
+        maps_history = MapsHistory()
+        current_map = maps_history.get_current_map()
+        if current_map:
+            maps_history.with_player_stats(current_map)
+        game_start = current_map.get("start") if current_map else None
+        self.game.reset(
+            datetime.datetime.fromtimestamp(game_start, UTC) if game_start else None
+        )
+        if current_map:
+            self.game.learn_names(current_map.get("player_stats") or {})
+
+        starts = list(sessions_start.values())
+        if game_start:
+            starts.append(game_start * 1000)
+        since = min(starts, default=int(now.timestamp() * 1000))
+
+        self.mark = HighWaterMark()
+        logs = list(reversed(self.logs_history.since(since)))
+        logger.info("Rebuilding the live stats from %d log lines", len(logs))
+        for log in logs:
+            if self.mark.covers(log):
+                continue
+            if game_start and log["timestamp_ms"] >= game_start * 1000:
+                self.game.fold(log)
+            self.sessions.fold(log, sessions_start)
+            self.mark.advance([log])
+
+    def _sync_game(self, current_map: MapInfo | None) -> None:
+        """Start the game over if a MATCH START was missed"""
+        game_start = current_map.get("start") if current_map else None
+        if not game_start:
+            return
+        start = datetime.datetime.fromtimestamp(game_start, UTC)
+        # The map history is updated after the MATCH START line was folded
+        if self.game.start is not None and start <= self.game.start:
+            return
+        logger.info("Live game stats started over from %s", start)
+        self.game.reset(start)
+        self.game.learn_names(current_map.get("player_stats") or {})
+        for log in self._history_since(game_start * 1000):
+            self.game.fold(log)
+
+    def refresh(self, refresh_interval_sec: int) -> None:
+        now = datetime.datetime.now(tz=UTC)
+        maps_history = MapsHistory()
+        current_map = maps_history.get_current_map()
+        if current_map:
+            maps_history.with_player_stats(current_map)
+
+        try:
+            players = [p for p in self.sessions.rcon.get_players() if p.get(PLAYER_ID)]
+            stats = {}
+            if players:
+                detailed_players = self.sessions.rcon.get_detailed_players()["players"]
+                stats = self.sessions.snapshot(players, detailed_players)
+                if current_map:
+                    _apply_current_map_player_stats(stats, current_map)
+            self.red.set(
+                LIVE_STATS_KEY,
+                pickle.dumps(
+                    {
+                        "snapshot_timestamp": now.timestamp(),
+                        "stats": list(stats.values()),
+                    }
+                ),
+            )
+        except Exception:
+            logger.exception("Error while producing stats")
+
+        try:
+            self._sync_game(current_map)
+            if current_map:
+                self.game.learn_names(current_map.get("player_stats") or {})
+            game_stats = {}
+            if current_map and current_map["start"] and self.game.start:
+                game_stats = self.game.snapshot(now)
+                _apply_current_map_player_stats(game_stats, current_map)
+            self.red.set(
+                LIVE_GAME_STATS_KEY,
+                pickle.dumps(
+                    {
+                        "snapshot_timestamp": now.timestamp(),
+                        "stats": list[PlayerStatsType](game_stats.values()),
+                        "refresh_interval_sec": refresh_interval_sec,
+                    }
+                ),
+            )
+        except Exception:
+            logger.exception("Failed to compute live game stats")
+
+    def checkpoint(self) -> None:
+        """Save the accumulators, then acknowledge the lines folded into them"""
+        self.red.set(
+            CHECKPOINT_KEY,
+            pickle.dumps(
+                {
+                    "saved_at": time.time(),
+                    "mark": (self.mark.timestamp_ms, self.mark.lines),
+                    "sessions": self.sessions.players,
+                    "game": {
+                        "start": self.game.start,
+                        "players": self.game.players,
+                        "times": self.game.times,
+                        "name_to_id": self.game.name_to_id,
+                    },
+                }
+            ),
+        )
+        self.consumer.ack(self._unacknowledged)
+        self._unacknowledged = []
+
+    def restore(self) -> bool:
+        """Resume from the checkpoint, returns whether there was a recent one"""
+        try:
+            data = self.red.get(CHECKPOINT_KEY)
+            state = pickle.loads(data) if data else None
+        except Exception:
+            logger.exception("Unable to read the live stats checkpoint")
+            return False
+        if state is None:
+            return False
+        if time.time() - state["saved_at"] > MAX_CHECKPOINT_AGE_SECONDS:
+            logger.info("The live stats checkpoint is too old")
+            return False
+
+        self.mark = HighWaterMark(*state["mark"])
+        self.sessions.players = state["sessions"]
+        game = state["game"]
+        self.game.reset(game["start"])
+        self.game.players = game["players"]
+        self.game.times = game["times"]
+        self.game.name_to_id = game["name_to_id"]
+        return True
+
+    def start(self) -> None:
+        new_group = self.consumer.setup()
+        if new_group or not self.restore():
+            # What's on the bus is in the logs history too
+            self.consumer.skip_to_latest()
+            self.rebuild()
+            self._unacknowledged = []
+            self.checkpoint()
+
+    def run(self) -> None:
+        self.start()
+        next_refresh = next_checkpoint = time.monotonic()
+        while True:
+            config = RconServerSettingsUserConfig.load_from_db()
+            refresh_interval_sec = config.live_stats_refresh_seconds
+
+            # Wait for new lines until the next refresh, a block of 0 would
+            # wait forever and a longer one than the socket timeout fails
+            block_ms = min(int((next_refresh - time.monotonic()) * 1000), MAX_BLOCK_MS)
+            try:
+                entries = self.consumer.read(
+                    count=BUS_BATCH_SIZE, block_ms=block_ms if block_ms > 0 else None
+                )
+            except redis.exceptions.RedisError as e:
+                logger.warning("Unable to read the log bus: %s", e)
+                # A read that was retried may have been delivered already,
+                # the lines folded twice are skipped
+                self.consumer.retry_pending()
+                entries = []
+                time.sleep(1)
+            self.fold(log for _, log in entries)
+            self._unacknowledged.extend(id_ for id_, _ in entries)
+
+            now = time.monotonic()
+            if now >= next_refresh:
+                self.refresh(refresh_interval_sec)
+                logger.debug("Refreshed the live stats")
+                next_refresh = now + refresh_interval_sec
+            if now >= next_checkpoint:
+                try:
+                    self.checkpoint()
+                except redis.exceptions.RedisError:
+                    logger.exception("Unable to checkpoint the live stats")
+                next_checkpoint = now + CHECKPOINT_SECONDS
+
+
+def live_stats_loop():
+    LiveStatsEngine().run()
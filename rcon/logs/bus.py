@@ -0,0 +1,181 @@
+"""The log bus, a Redis stream of every new log line
+
+`LogLoop` is the only service polling the game server for logs. Each line it
+records is published once, already parsed and with its player IDs filled in,
+and the services that need the lines (`LogRecorder`, `LogStream`) read them
+from the bus through their own consumer group instead of polling the game
+server or re-reading `LogsHistory`.
+
+A line is acknowledged once its consumer is done with it, lines read but not
+acknowledged (e.g. the service crashed) are read again when the consumer
+restarts, so every consumer sees every line at least once. The stream is
+trimmed to roughly `MAX_LEN` lines, a consumer that stays down longer than
+that misses lines and has to catch up from `LogsHistory`.
+"""
+
+import logging
+from collections.abc import Iterable
+
+import redis
+import redis.exceptions
+
+from rcon.cache_utils import get_redis_client
+from rcon.logs.record import LogRecord, dumps_log
+
+logger = logging.getLogger(__name__)
+
+LOG_BUS_KEY = "log_bus"
+# About 8 hours of a full server
+MAX_LEN = 50_000
+FIELD = "log"
+# The Redis pools time reads out after 5 seconds (see `get_redis_pool`), a
+# blocking read must return before that
+MAX_BLOCK_MS = 4000
+
+
+class LogBus:
+    def __init__(
+        self,
+        red: redis.Redis | None = None,
+        key: str = LOG_BUS_KEY,
+        max_len: int = MAX_LEN,
+    ):
+        self.red = red or get_redis_client()
+        self.key = key
+        self.max_len = max_len
+
+    def publish(self, logs: Iterable[LogRecord]) -> list[str]:
+        """Add the lines to the bus, oldest first"""
+        pipe = self.red.pipeline(transaction=False)
+        for log in logs:
+            pipe.xadd(
+                self.key, {FIELD: dumps_log(log)}, maxlen=self.max_len, approximate=True
+            )
+        return [_decode(id_) for id_ in pipe.execute()]
+
+    def create_group(self, group: str, start_id: str = "$") -> bool:
+        """Create the consumer group if it doesn't exist yet
+
+        New groups get the lines added after `start_id`, the default is only
+        the ones published from now on.
+        """
+        try:
+            self.red.xgroup_create(self.key, group, id=start_id, mkstream=True)
+            return True
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            return False
+
+    def read(
+        self,
+        group: str,
+        consumer: str,
+        count: int = 1000,
+        block_ms: int | None = None,
+        pending: bool = False,
+    ) -> list[tuple[str, LogRecord | None]]:
+        """Read up to `count` lines for `consumer`, oldest first
+
+        With `pending` the lines already delivered to `consumer` but not
+        acknowledged are read again instead of new ones. Those trimmed from the
+        bus in the meantime are returned as None. Reads block for at most
+        `MAX_BLOCK_MS`.
+        """
+        if block_ms is not None and not 0 < block_ms <= MAX_BLOCK_MS:
+            block_ms = MAX_BLOCK_MS
+        response = self.red.xreadgroup(
+            group,
+            consumer,
+            {self.key: "0" if pending else ">"},
+            count=count,
+            block=None if pending else block_ms,
+        )
+        if not response:
+            return []
+        _, entries = response[0]
+        return [
+            (_decode(id_), LogRecord.loads(fields[FIELD]) if fields else None)
+            for id_, fields in entries
+        ]
+
+    def ack(self, group: str, ids: Iterable[str]) -> int:
+        ids = list(ids)
+        if not ids:
+            return 0
+        return self.red.xack(self.key, group, *ids)
+
+    def lag(self) -> dict[str, dict[str, int | str | None]]:
+        """How far behind each consumer group is
+
+        `lag` is the number of lines not delivered yet, `pending` the ones
+        delivered but not acknowledged.
+        """
+        try:
+            groups = self.red.xinfo_groups(self.key)
+        except redis.exceptions.ResponseError:
+            # No bus yet
+            return {}
+        return {
+            _decode(group["name"]): {
+                "lag": group.get("lag"),
+                "pending": group["pending"],
+                "last_delivered_id": _decode(group["last-delivered-id"]),
+            }
+            for group in groups
+        }
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LogBusConsumer:
+    """Reads the lines of one consumer group, see `LogRecorder` and `LogStream`"""
+
+    def __init__(
+        self,
+        group: str,
+        bus: LogBus | None = None,
+        consumer: str | None = None,
+        start_id: str = "$",
+    ):
+        self.bus = bus or LogBus()
+        self.group = group
+        # A single instance of each service runs per server, restarting it
+        # picks up what the previous one left pending
+        self.consumer = consumer or group
+        self.start_id = start_id
+        self._recovering = True
+
+    def setup(self) -> bool:
+        """Create the group, returns whether it's new"""
+        return self.bus.create_group(self.group, self.start_id)
+
+    def read(
+        self, count: int = 1000, block_ms: int | None = None
+    ) -> list[tuple[str, LogRecord | None]]:
+        """The lines left pending by a previous run first, then new ones"""
+        if self._recovering:
+            entries = self.bus.read(self.group, self.consumer, count, pending=True)
+            if entries:
+                logger.info(
+                    "%s: reading %d lines left pending", self.group, len(entries)
+                )
+                return entries
+            self._recovering = False
+        return self.bus.read(self.group, self.consumer, count, block_ms)
+
+    def ack(self, ids: Iterable[str]) -> int:
+        return self.bus.ack(self.group, ids)
+
+    def skip_to_latest(self) -> None:
+        """Drop the lines not read or not acknowledged yet, for consumers that
+        catch up on them from `LogsHistory`"""
+        self.bus.red.xgroup_setid(self.bus.key, self.group, "$")
+        self.bus.red.xgroup_delconsumer(self.bus.key, self.group, self.consumer)
+        self._recovering = False
+
+    def retry_pending(self) -> None:
+        """Read the lines that weren't acknowledged again, e.g. after an error"""
+        self._recovering = True
@@ -0,0 +1,142 @@
+"""Track which game server log lines have already been consumed
+
+The game server can only be asked for "every log line from the last N
+seconds", so polling it with a fixed window returns (and would re-parse) each
+line over and over. `LogCursor` remembers the newest line it handed out and
+picks the smallest backtrack window that still covers everything since then.
+"""
+
+import logging
+import math
+import re
+import time
+
+import orjson
+import redis
+import redis.exceptions
+
+logger = logging.getLogger(__name__)
+
+# [12:34 min (1700000000)] KILL: ...
+RAW_LINE_TIMESTAMP = re.compile(r"^\[.+? \((\d+)\)\] ")
+# Covers the clock drift between CRCON and the game server and the time
+# spent between two polls that isn't accounted for
+DEFAULT_MARGIN_SECONDS = 60
+# How far back to look after a reconnect or a map change, in case the server
+# clock moved
+CATCH_UP_SECONDS = 5 * 60
+
+
+def raw_line_fingerprint(raw_line: str) -> tuple[int, str] | None:
+    """The server timestamp of a raw log line and the line without its relative time
+
+    The relative time (`12:34 min`) changes with every poll, the rest of the
+    line doesn't.
+    """
+    if match := RAW_LINE_TIMESTAMP.match(raw_line):
+        return int(match.group(1)), raw_line[match.end() :].strip()
+    return None
+
+
+class LogCursor:
+    """The newest consumed game server timestamp and the lines seen at that second
+
+    Several lines can share a timestamp (it has a one second resolution) so
+    the lines consumed at exactly the cursor's timestamp are remembered too.
+
+    The cursor is persisted in redis so a restarted service picks up where
+    it stopped instead of re-reading its whole startup window.
+    """
+
+    def __init__(
+        self,
+        red: redis.Redis | None = None,
+        key: str | None = "log_loop_cursor",
+        wide_window_seconds: int = 180 * 60,
+        margin_seconds: int = DEFAULT_MARGIN_SECONDS,
+        catch_up_seconds: int = CATCH_UP_SECONDS,
+        clock=time.time,
+    ):
+        self.red = red
+        self.key = key
+        self.wide_window_seconds = wide_window_seconds
+        self.margin_seconds = margin_seconds
+        self.catch_up_seconds = catch_up_seconds
+        self.clock = clock
+        self.timestamp: int | None = None
+        self.seen_at_timestamp: set[str] = set()
+        self.needs_catch_up = True
+        self.load()
+
+    def load(self) -> None:
+        if self.red is None or self.key is None:
+            return
+        try:
+            raw = self.red.get(self.key)
+        except redis.exceptions.RedisError:
+            logger.exception("Unable to load the log cursor")
+            return
+        if not raw:
+            return
+        state = orjson.loads(raw)
+        self.timestamp = state["timestamp"]
+        self.seen_at_timestamp = set(state["seen"])
+
+    def save(self) -> None:
+        if self.red is None or self.key is None or self.timestamp is None:
+            return
+        state = {"timestamp": self.timestamp, "seen": sorted(self.seen_at_timestamp)}
+        try:
+            self.red.set(self.key, orjson.dumps(state))
+        except redis.exceptions.RedisError:
+            logger.exception("Unable to save the log cursor")
+
+    def reset(self) -> None:
+        """Look further back on the next poll, e.g. after a reconnect or map change
+
+        Lines already consumed are still skipped.
+        """
+        self.needs_catch_up = True
+
+    def window_minutes(self) -> float:
+        """The backtrack window, in minutes, to ask the game server for"""
+        if self.timestamp is None:
+            seconds = self.wide_window_seconds
+        else:
+            gap = max(0.0, self.clock() - self.timestamp)
+            seconds = gap + self.margin_seconds
+            if self.needs_catch_up:
+                seconds = max(seconds, self.catch_up_seconds)
+            seconds = min(self.wide_window_seconds, seconds)
+        return math.ceil(seconds) / 60
+
+    def advance(self, raw_logs: list[str]) -> list[str]:
+        """Return the lines newer than the cursor, oldest first, and move past them"""
+        new_lines: list[str] = []
+        timestamp = self.timestamp
+        seen = self.seen_at_timestamp
+        for raw_line in raw_logs:
+            fingerprint = raw_line_fingerprint(raw_line)
+            if fingerprint is None:
+                # Let the parser report it
+                new_lines.append(raw_line)
+                continue
+
+            line_timestamp, line = fingerprint
+            if timestamp is not None and line_timestamp < timestamp:
+                continue
+            if line_timestamp == timestamp:
+                if line in seen:
+                    continue
+                seen.add(line)
+            else:
+                timestamp = line_timestamp
+                seen = {line}
+            new_lines.append(raw_line)
+
+        self.timestamp = timestamp
+        self.seen_at_timestamp = seen
+        self.needs_catch_up = False
+        if new_lines:
+            self.save()
+        return new_lines
@@ -0,0 +1,103 @@
+"""Remember which log lines were already recorded, bucketed by time
+
+Lines are grouped in one redis set per `bucket_seconds` of game server time.
+Each bucket expires on its own once it's older than the retention, so nothing
+ever has to walk the index to clean it up, and a whole poll is checked in a
+single pipeline.
+"""
+
+import logging
+import time
+from typing import Iterable
+
+import redis
+
+from rcon.types import StructuredLogLineWithMetaData
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 60
+RETENTION_SECONDS = 180 * 60
+# The single set every line used to be added to
+LEGACY_KEY = "unique_logs"
+
+
+def log_line_id(log: StructuredLogLineWithMetaData) -> str:
+    return f"{log['timestamp_ms']}|{log['line_without_time']}"
+
+
+class LogDedupIndex:
+    def __init__(
+        self,
+        red: redis.Redis,
+        prefix: str = "unique_logs",
+        bucket_seconds: int = BUCKET_SECONDS,
+        retention_seconds: int = RETENTION_SECONDS,
+    ):
+        self.red = red
+        self.prefix = prefix
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+
+    def bucket(self, timestamp_ms: int) -> int:
+        return timestamp_ms // 1000 // self.bucket_seconds
+
+    def bucket_key(self, bucket: int) -> str:
+        return f"{self.prefix}:{bucket}"
+
+    def bucket_expires_at(self, bucket: int) -> int:
+        """Unix time at which every line of `bucket` is past the retention"""
+        return (bucket + 1) * self.bucket_seconds + self.retention_seconds
+
+    def add_many(self, logs: Iterable[StructuredLogLineWithMetaData]) -> list[bool]:
+        """Add the lines to the index, True for each one that wasn't there yet"""
+        return self._add_ids((log["timestamp_ms"], log_line_id(log)) for log in logs)
+
+    def _add_ids(self, line_ids: Iterable[tuple[int, str]]) -> list[bool]:
+        line_ids = list(line_ids)
+        if not line_ids:
+            return []
+
+        pipe = self.red.pipeline(transaction=False)
+        buckets: set[int] = set()
+        for timestamp_ms, line_id in line_ids:
+            bucket = self.bucket(timestamp_ms)
+            buckets.add(bucket)
+            pipe.sadd(self.bucket_key(bucket), line_id)
+        for bucket in buckets:
+            pipe.expireat(self.bucket_key(bucket), self.bucket_expires_at(bucket))
+        results = pipe.execute()
+        return [bool(added) for added in results[: len(line_ids)]]
+
+    def add(self, log: StructuredLogLineWithMetaData) -> bool:
+        return self.add_many([log])[0]
+
+    def drop_legacy_index(self, batch_size: int = 1000) -> None:
+        """Remove the set used before lines were bucketed, it never expires
+
+        The lines still within the retention are added to their buckets first,
+        otherwise the first poll after an upgrade would record them again.
+        """
+        if not self.red.exists(LEGACY_KEY):
+            return
+
+        cutoff_ms = int((time.time() - self.retention_seconds) * 1000)
+        seeded = 0
+        batch: list[tuple[int, str]] = []
+        for member in self.red.sscan_iter(LEGACY_KEY, count=batch_size):
+            line_id = member.decode() if isinstance(member, bytes) else member
+            timestamp, _, _ = line_id.partition("|")
+            if not timestamp.isdigit() or int(timestamp) < cutoff_ms:
+                continue
+            batch.append((int(timestamp), line_id))
+            if len(batch) >= batch_size:
+                seeded += len(self._add_ids(batch))
+                batch = []
+        seeded += len(self._add_ids(batch))
+
+        self.red.unlink(LEGACY_KEY)
+        logger.info(
+            "Removed the legacy %s set, %d recent lines moved to buckets",
+            LEGACY_KEY,
+            seeded,
+        )
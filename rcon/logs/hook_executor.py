@@ -0,0 +1,214 @@
+"""Runs the log line hooks off the log loop thread
+
+`LogLoop.process_hooks` used to run every hook of every line one after the
+other, so one slow hook (a Discord webhook, a Steam call...) held up all the
+lines logged after it. `HookExecutor` runs them on a bounded thread pool:
+
+- the hooks of lines of the same player run one at a time, in the order the
+  lines were logged, e.g. the connect hooks always finish before the
+  disconnect ones start. Lines without a player are ordered together.
+- a hook running longer than its timeout is reported and stops holding up
+  the next lines of its player. Threads can't be killed, it still runs to
+  completion in the background and counts against its `max_concurrency`
+  until then. The timeout starts when the hook does, not when it's queued.
+- a hook can cap how many instances of it run at once, see `hook_options`
+- at most `max_pending` hooks are queued, `submit` waits past that so a
+  stuck hook slows log ingestion down instead of growing the queue forever
+
+The latency, errors and timeouts of each hook are recorded in the
+`log_hooks` performance statistics.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+
+from rcon.perf_statistics import PerformanceStatistics
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 8
+MAX_PENDING = 10_000
+DEFAULT_TIMEOUT_SECONDS = 30
+SLOW_HOOK_SECONDS = 5
+
+Hook = Callable[[Any, Mapping[str, Any]], Any]
+
+
+def hook_options(timeout: float | None = None, max_concurrency: int | None = None):
+    """Override how long a hook may hold up the lines of its player and how
+    many instances of it may run at once (unlimited by default)"""
+
+    def wrapper(func):
+        if timeout is not None:
+            func.hook_timeout = timeout
+        if max_concurrency is not None:
+            func.hook_max_concurrency = max_concurrency
+        return func
+
+    return wrapper
+
+
+def hook_name(hook: Hook) -> str:
+    return f"{hook.__module__}.{getattr(hook, '__name__', repr(hook))}"
+
+
+def _hook_option(hook: Hook, option: str, default: Any) -> Any:
+    # Options set on a function apply to its partials, see `load_generic_hooks`
+    if isinstance(hook, partial) and not hasattr(hook, option):
+        hook = hook.func
+    return getattr(hook, option, default)
+
+
+class _Job:
+    __slots__ = ("hook", "log", "key", "name", "timeout", "started", "released")
+
+    def __init__(
+        self, hook: Hook, log: Mapping[str, Any], key: Hashable, timeout: float
+    ):
+        self.hook = hook
+        self.log = log
+        self.key = key
+        self.name = hook_name(hook)
+        self.timeout = _hook_option(hook, "hook_timeout", timeout)
+        self.started = 0.0
+        self.released = False
+
+    @property
+    def max_concurrency(self) -> int | None:
+        return _hook_option(self.hook, "hook_max_concurrency", None)
+
+
+class HookExecutor:
+    def __init__(
+        self,
+        rcon,
+        max_workers: int = MAX_WORKERS,
+        max_pending: int = MAX_PENDING,
+        default_timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        stats: PerformanceStatistics | None = None,
+    ):
+        self.rcon = rcon
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.stats = stats or PerformanceStatistics("log_hooks")
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="log_hooks")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._mu = threading.Lock()
+        self._idle = threading.Condition(self._mu)
+        # Jobs not started yet per ordering key, a key is present as long as
+        # one of its jobs is queued or running
+        self._queues: dict[Hashable, deque[_Job]] = {}
+        # Scheduled jobs per hook until their worker returns, and the keys
+        # waiting for one to finish
+        self._running: dict[str, int] = {}
+        self._waiting: dict[str, deque[Hashable]] = {}
+        # Started jobs still holding up their key
+        self._in_flight: set[_Job] = set()
+
+    @staticmethod
+    def ordering_key(log: Mapping[str, Any]) -> Hashable:
+        return log.get("player_id_1") or log.get("player_name_1")
+
+    def submit(self, hooks: Iterable[Hook], log: Mapping[str, Any]) -> None:
+        """Queue the hooks of a line, they run after the ones of the previous
+        lines of the same player"""
+        key = self.ordering_key(log)
+        for hook in hooks:
+            while not self._slots.acquire(timeout=1):
+                logger.warning(
+                    "%d hooks pending, waiting for some to complete", self.max_pending
+                )
+                self.expire()
+
+            job = _Job(hook, log, key, self.default_timeout)
+            with self._mu:
+                queue = self._queues.get(key)
+                if queue is None:
+                    self._queues[key] = deque([job])
+                    self._schedule(key)
+                else:
+                    queue.append(job)
+        self.expire()
+
+    def expire(self) -> None:
+        """Stop waiting on the hooks that run for longer than their timeout"""
+        now = time.monotonic()
+        with self._mu:
+            expired = [j for j in self._in_flight if now - j.started > j.timeout]
+            for job in expired:
+                self._release_key(job)
+        for job in expired:
+            logger.warning(
+                "Hook %s timed out after %ss on %s, running the next ones",
+                job.name,
+                job.timeout,
+                job.log.get("raw"),
+            )
+            self.stats.increment(f"timeouts::{job.name}")
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until every submitted hook completed or timed out"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _schedule(self, key: Hashable) -> None:
+        job = self._queues[key][0]
+        limit = job.max_concurrency
+        if limit is not None and self._running.get(job.name, 0) >= limit:
+            self._waiting.setdefault(job.name, deque()).append(key)
+            return
+
+        self._queues[key].popleft()
+        self._running[job.name] = self._running.get(job.name, 0) + 1
+        self._pool.submit(self._run, job)
+
+    def _release_key(self, job: _Job) -> None:
+        """Let the next job of the same key start"""
+        job.released = True
+        self._in_flight.discard(job)
+        if self._queues[job.key]:
+            self._schedule(job.key)
+        else:
+            del self._queues[job.key]
+            if not self._queues:
+                self._idle.notify_all()
+
+    def _finish(self, job: _Job) -> None:
+        self._running[job.name] -= 1
+        self._slots.release()
+        if waiting := self._waiting.get(job.name):
+            self._schedule(waiting.popleft())
+        if not job.released:
+            self._release_key(job)
+
+    def _run(self, job: _Job) -> None:
+        with self._mu:
+            job.started = time.monotonic()
+            self._in_flight.add(job)
+        raw = job.log.get("raw")
+        logger.info("Triggered %s on %s", job.name, raw)
+        started = time.perf_counter()
+        try:
+            job.hook(self.rcon, job.log)
+        except Exception as e:
+            logger.exception(
+                "Hook '%s' for '%s' returned an error: %s", job.name, job.log, e
+            )
+            self.stats.increment(f"errors::{job.name}")
+        finally:
+            duration = time.perf_counter() - started
+            self.stats.observe_latency(job.name, duration)
+            if duration >= SLOW_HOOK_SECONDS:
+                logger.warning("Slow hook %.3fs %s on %s", duration, job.name, raw)
+            logger.debug("Ran in %.4f seconds %s on %s", duration, job.name, raw)
+            with self._mu:
+                self._finish(job)
@@ -0,0 +1,215 @@
+"""Secondary indexes over `LogsHistory`, maintained as lines are added
+
+Every line pushed to the history gets a sequence number, so a line's position
+in the list is `latest - seq`. Sorted sets of sequence numbers are kept per
+action and per player name, plus one ordered by time, which lets
+`rcon.game_logs.get_recent_logs` read only the lines it returns instead of
+scanning the whole history.
+
+Names and actions are matched against the registries of the ones currently
+in the history, so searches keep their substring/prefix semantics.
+
+The history is only written by `LogLoop`, sequence numbers assume a single
+writer.
+"""
+
+import logging
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import redis
+import redis.client
+import redis.exceptions
+
+logger = logging.getLogger(__name__)
+
+# Stale name/action indexes are dropped every that many lines
+PRUNE_EVERY = 1000
+WATCH_RETRIES = 3
+
+
+def _member(seq: int) -> str:
+    # Zero padded so equal scores sort in sequence order
+    return f"{seq:020}"
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LogIndex:
+    def __init__(self, red: redis.Redis, key: str, max_len: int):
+        self.red = red
+        self.key = key
+        self.max_len = max_len
+        self.prefix = f"{key}:index"
+        self.seq_key = f"{self.prefix}:seq"
+        self.latest_key = f"{self.prefix}:latest"
+        self.first_key = f"{self.prefix}:first"
+        self.time_key = f"{self.prefix}:time"
+        self.names_key = f"{self.prefix}:names"
+        self.actions_key = f"{self.prefix}:actions"
+
+    def name_key(self, name: str) -> str:
+        return f"{self.prefix}:name:{name}"
+
+    def action_key(self, action: str) -> str:
+        return f"{self.prefix}:action:{action}"
+
+    def add(self, log: Mapping[str, Any], payload: bytes | str) -> None:
+        """Push `payload` to the history and index `log` in one transaction"""
+        seq = self.red.incr(self.seq_key)
+        member = _member(seq)
+        oldest = seq - self.max_len
+
+        pipe = self.red.pipeline(transaction=True)
+        pipe.lpush(self.key, payload)
+        pipe.ltrim(self.key, 0, self.max_len - 1)
+        pipe.set(self.latest_key, seq)
+        pipe.setnx(self.first_key, seq)
+        pipe.zadd(self.time_key, {member: log["timestamp_ms"]})
+        pipe.zremrangebyrank(self.time_key, 0, -self.max_len - 1)
+
+        names = {log["player_name_1"], log["player_name_2"]} - {None, ""}
+        for name in names:
+            pipe.zadd(self.name_key(name), {member: seq})
+            pipe.zremrangebyscore(self.name_key(name), "-inf", oldest)
+        if names:
+            pipe.zadd(self.names_key, {name: seq for name in names})
+
+        action = log["action"]
+        pipe.zadd(self.action_key(action), {member: seq})
+        pipe.zremrangebyscore(self.action_key(action), "-inf", oldest)
+        pipe.zadd(self.actions_key, {action: seq})
+        pipe.execute()
+
+        if seq % PRUNE_EVERY == 0:
+            self.prune(oldest)
+
+    def prune(self, oldest: int) -> None:
+        """Drop the indexes of names and actions no longer in the history"""
+        for registry, key_for in (
+            (self.names_key, self.name_key),
+            (self.actions_key, self.action_key),
+        ):
+            stale = [
+                _decode(v) for v in self.red.zrangebyscore(registry, "-inf", oldest)
+            ]
+            if not stale:
+                continue
+            pipe = self.red.pipeline(transaction=False)
+            pipe.delete(*(key_for(v) for v in stale))
+            pipe.zrem(registry, *stale)
+            pipe.execute()
+
+    def clear(self) -> None:
+        keys = list(self.red.scan_iter(match=f"{self.prefix}:*", count=1000))
+        if keys:
+            self.red.delete(*keys)
+
+    def query(
+        self,
+        start: int,
+        end: int,
+        min_timestamp: float | None = None,
+        name_matches: Callable[[str], Any] | None = None,
+        action_matches: Callable[[str], Any] | None = None,
+    ) -> tuple[list[bytes | str], set[str], set[str]] | None:
+        """The lines at positions [start, end) matching the filters, newest first
+
+        `name_matches` selects lines where either player matches, and
+        `action_matches` lines whose action matches, both if both are given.
+        The player names and actions of every line in the window are returned
+        too. Returns None when the window isn't fully indexed, e.g. right after
+        an upgrade, and the history has to be scanned instead.
+        """
+        for _ in range(WATCH_RETRIES):
+            with self.red.pipeline(transaction=True) as pipe:
+                try:
+                    # Fail the final read if a line is added in the meantime
+                    pipe.watch(self.latest_key)
+                    return self._query(
+                        pipe, start, end, min_timestamp, name_matches, action_matches
+                    )
+                except redis.exceptions.WatchError:
+                    continue
+        logger.warning("Logs history changed while querying it, scanning instead")
+        return None
+
+    def _query(
+        self,
+        pipe: redis.client.Pipeline,
+        start: int,
+        end: int,
+        min_timestamp: float | None,
+        name_matches: Callable[[str], Any] | None,
+        action_matches: Callable[[str], Any] | None,
+    ) -> tuple[list[bytes | str], set[str], set[str]] | None:
+        latest, first = pipe.mget(self.latest_key, self.first_key)
+        if latest is None or first is None:
+            return None
+        latest, first = int(latest), int(first)
+        length = pipe.llen(self.key)
+
+        # Sequence numbers in (low, high]
+        high = latest - start
+        low = latest - min(end, length)
+        if min_timestamp:
+            # Lines are added in time order, see LogLoop.record_line
+            older = pipe.zrevrangebyscore(
+                self.time_key, f"({min_timestamp * 1000}", "-inf", start=0, num=1
+            )
+            if older:
+                low = max(low, int(older[0]))
+        if low < first - 1:
+            # Part of the window was added before the index existed
+            return None
+        if high <= low:
+            return [], set(), set()
+
+        window = (f"({low}", high)
+        reads = self.red.pipeline(transaction=False)
+        reads.zrangebyscore(self.names_key, f"({low}", "+inf")
+        reads.zrangebyscore(self.actions_key, f"({low}", "+inf")
+        names, actions = ([_decode(v) for v in r] for r in reads.execute())
+        for name in names:
+            reads.zcount(self.name_key(name), *window)
+        for action in actions:
+            reads.zcount(self.action_key(action), *window)
+        counts = reads.execute()
+        window_players = {n for n, c in zip(names, counts[: len(names)]) if c}
+        window_actions = {a for a, c in zip(actions, counts[len(names) :]) if c}
+
+        if name_matches is None and action_matches is None:
+            pipe.multi()
+            pipe.lrange(self.key, start, latest - low - 1)
+            (lines,) = pipe.execute()
+            return lines, window_players, window_actions
+
+        # Only the lines of the matching names and actions are read
+        matched_names = [n for n in window_players if name_matches and name_matches(n)]
+        matched_actions = [
+            a for a in window_actions if action_matches and action_matches(a)
+        ]
+        for name in matched_names:
+            reads.zrangebyscore(self.name_key(name), *window)
+        for action in matched_actions:
+            reads.zrangebyscore(self.action_key(action), *window)
+        members = reads.execute()
+        by_name = members[: len(matched_names)]
+        by_action = members[len(matched_names) :]
+
+        selected: set | None = None
+        if name_matches is not None:
+            selected = set().union(*by_name)
+        if action_matches is not None:
+            matching = set().union(*by_action)
+            selected = matching if selected is None else selected & matching
+
+        seqs = sorted((int(m) for m in selected), reverse=True)
+        if not seqs:
+            return [], window_players, window_actions
+        pipe.multi()
+        for seq in seqs:
+            pipe.lindex(self.key, latest - seq)
+        return pipe.execute(), window_players, window_actions
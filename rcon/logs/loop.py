@@ -1,18 +1,25 @@
 import datetime
 import logging
 import re
-import sys
 import time
 from collections import defaultdict
 from functools import partial
 from typing import Callable, Dict, Iterable, DefaultDict
 
 import discord_webhook
+import orjson
 from discord.utils import escape_markdown
 from rcon.cache_utils import get_redis_client, ttl_cache
 from rcon.connection import HLLServerError
 from rcon.discord import make_hook
+from rcon.logs.cursor import LogCursor
+from rcon.logs import parser as log_parser
+from rcon.logs.bus import LogBus
+from rcon.logs.dedup import LogDedupIndex, log_line_id
+from rcon.logs.hook_executor import HookExecutor, hook_options
+from rcon.logs.record import LogRecord
 from rcon.maps import GameMode, Team as MapTeam, get_theoretical_match_time
+from rcon.perf_statistics import PerformanceStatistics
 from rcon.rcon import get_rcon
 from rcon.types import AllLogTypes, GameStateType, GetDetailedPlayers, MapInfo, MapScore, UnitHistoryEntry, StructuredLogLineWithMetaData, PlayerStat, WorldPositionType
 from rcon.user_config.log_line_webhooks import LogLineWebhookUserConfig
@@ -162,6 +169,8 @@ def make_allowed_mentions(mentions: Iterable[str]) -> defaultdict[str, list[str]
     return allowed_mentions
 
 
+# Discord rate limits webhooks, don't flood it when a lot of lines match
+@hook_options(timeout=10, max_concurrency=2)
 def send_log_line_webhook_message(
         webhook: DiscordMentionWebhook,
         _,
@@ -227,24 +236,34 @@ class LogLoop:
     def __init__(self):
         self.rcon = get_rcon()
         self.red = get_redis_client()
-        self.duplicate_guard_key = "unique_logs"
+        self.dedup_index = LogDedupIndex(self.red)
         self.log_history = self.get_log_history_list()
+        self.log_cursor = LogCursor(self.red)
+        self.log_bus = LogBus(self.red)
+        self.hook_executor = HookExecutor(
+            self.rcon,
+            stats=PerformanceStatistics(
+                "log_hooks", self.rcon.performance_stats_interval() > 0
+            ),
+        )
+        self.current_map_key = None
         self.ACTIVE_MAP_INDEX = 0
         self.RECORD_STATS = 30 # 0.5 minute
         self.RECORD_PLAYER_STATS_DELAY = 120 # 2 minutes
-        self.GET_LOGS_SINCE_MIN = 180 # 3 hours
-        self.CLEANUP_MIN = 180 # 3 hours
         self.CURR_MAP_END = 0
         self.now = 0
+        # The player stats of the current match, see get_player_stats
+        self.player_stats_key: str | None = None
+        self.player_stats: dict[str, PlayerStat] = {}
+        self.saved_player_stats: dict[str, bytes] = {}
         logger.info("Registered hooks: %s", HOOKS)
 
     @staticmethod
     def get_log_history_list():
         return LogsHistory()
 
-    def run(self, loop_frequency_secs=2, cleanup_frequency_minutes=10):
-        self.GET_LOGS_SINCE_MIN = 180
-        last_cleanup_time = datetime.datetime.now(tz=datetime.UTC)
+    def run(self, loop_frequency_secs=2):
+        self.dedup_index.drop_legacy_index()
         prev_map_time_elapsed = 0
 
         while True:
@@ -258,7 +277,8 @@ class LogLoop:
                 # which in turn restarts this service
                 # Let's log it and prevent restarting the service
                 logger.warning("Connection error: %s", str(e))
-            last_cleanup_time = self.cleanup(last_cleanup_time, cleanup_frequency_minutes)
+                self.log_cursor.reset()
+            self.hook_executor.expire()
             time.sleep(loop_frequency_secs)
 
     # GENERAL
@@ -283,6 +303,9 @@ class LogLoop:
             logger.info("[MATCH UNKNOWN] No map seems to be running: %s", current_map)
             return prev_map_time_elapsed
         
+        # Only written back if it changed
+        cached_map = orjson.dumps(current_map)
+
         map_start = current_map["start"]
         if map_start is None:
             logger.info("[MATCH START MISSING] Probably a very old map record: %s", current_map)
@@ -337,26 +360,74 @@ class LogLoop:
                 "RCON map/player polling completed in %.3fs",
                 time.perf_counter() - started,
             )
-            self.record_player_stats(current_map, curr_map_time_elapsed, dp)
-
-        maps_history.update(self.ACTIVE_MAP_INDEX, current_map)
+            player_stats = self.get_player_stats(maps_history, current_map)
+            self.record_player_stats(current_map, player_stats, curr_map_time_elapsed, dp)
+            self.save_player_stats(maps_history, current_map)
+            # Recorded before the player stats had their own hash
+            current_map["player_stats"] = {}
+
+        if orjson.dumps(current_map) != cached_map:
+            maps_history.update(self.ACTIVE_MAP_INDEX, current_map)
         return curr_map_time_elapsed
 
+    def get_player_stats(self, maps_history: MapsHistory, current_map: MapInfo) -> dict[str, PlayerStat]:
+        """The player stats of the current match, only read when the match changes"""
+        key = maps_history.player_stats_key(current_map)
+        if key != self.player_stats_key:
+            self.player_stats_key = key
+            self.player_stats = maps_history.get_player_stats(current_map)
+            # Written again once, if they were in the map info
+            self.saved_player_stats = {}
+        return self.player_stats
+
+    def save_player_stats(self, maps_history: MapsHistory, current_map: MapInfo):
+        """Write the stats of the players that changed since the last time"""
+        changed = {}
+        for player_id, player_stats in self.player_stats.items():
+            serialized = orjson.dumps(player_stats)
+            if self.saved_player_stats.get(player_id) != serialized:
+                changed[player_id] = serialized
+        if changed:
+            maps_history.save_player_stats(current_map, changed)
+            self.saved_player_stats.update(changed)
+
     def process_logs(self):
+        maps_history = MapsHistory()
+        current_map = maps_history.get_current_map()
+        map_key = (current_map["name"], current_map["start"]) if current_map else None
+        if map_key != self.current_map_key:
+            # Catch up on anything logged around the map change
+            self.current_map_key = map_key
+            self.log_cursor.reset()
+
         started = time.perf_counter()
-        logs = self.rcon.get_structured_logs(since_min_ago=self.GET_LOGS_SINCE_MIN)
+        since_min_ago = self.log_cursor.window_minutes()
+        raw_logs = self.rcon.get_logs(since_min_ago=since_min_ago)
+        # Only lines newer than the cursor are parsed and deduplicated
+        new_raw_logs = self.log_cursor.advance(raw_logs)
+        logs = log_parser.parse_log_records(new_raw_logs)
         logger.info(
-            "RCON log fetch completed in %.3fs (%d logs)",
+            "RCON log fetch completed in %.3fs (%d new of %d logs, %.1f min window)",
             time.perf_counter() - started,
-            len(logs["logs"]),
+            len(logs),
+            len(raw_logs),
+            since_min_ago,
         )
-        self.GET_LOGS_SINCE_MIN = 5
-        current_map = MapsHistory().get_current_map()
-        name_to_id = self._get_name_to_id(current_map) if current_map else {} 
-        for log in reversed(logs["logs"]):
-            line = self.record_line(log, name_to_id)
+        name_to_id = self._get_name_to_id(self.get_player_stats(maps_history, current_map)) if current_map else {} 
+        ordered_logs = list(reversed(logs))
+        is_new = self.dedup_index.add_many(ordered_logs)
+        recorded: list[LogRecord] = []
+        for log, new in zip(ordered_logs, is_new):
+            if not new:
+                # logger.debug("Skipping duplicate: %s", log_line_id(log))
+                continue
+            line = self.record_line(log, name_to_id, current_map)
             if line:
+                recorded.append(line)
                 self.process_hooks(line)
+        if recorded:
+            # For the log recorder and log stream, see rcon.logs.bus
+            self.log_bus.publish(recorded)
 
     def get_detailed_players(self) -> GetDetailedPlayers:
         started = time.perf_counter()
@@ -402,7 +473,7 @@ class LogLoop:
             logger.debug("[MATCH SCORE] - New cap flip recorded %d:%d", gs["allied_score"], gs["axis_score"])
             cap_flips.append(MapScore(allied_score=gs["allied_score"], axis_score=gs["axis_score"], ts=sec_from_start))
 
-    def record_player_stats(self, current_map: MapInfo, sec_from_start: int, dp: GetDetailedPlayers):
+    def record_player_stats(self, current_map: MapInfo, map_cached_stats: dict[str, PlayerStat], sec_from_start: int, dp: GetDetailedPlayers):
         # skip_caching_stats = current_map["start"] + self.RECORD_STATS >= self.now
         if current_map["start"] is None:
             return
@@ -420,8 +491,6 @@ class LogLoop:
             MapTeam.AXIS.value: 2,
         }
 
-        map_cached_stats = current_map.setdefault("player_stats", dict())
-
         # Compare cached player stats with live player stats
         # if player not online, append UNASSIGNED role
         # that will be eventually used to calc accurate times each role was played 
@@ -574,12 +643,12 @@ class LogLoop:
         map_end = datetime.datetime.fromtimestamp(map["end"], tz=datetime.UTC)
         return map_start <= log_time and log_time <= map_end
         
-    def _get_name_to_id(self, map: MapInfo) -> dict[str, str]:
+    def _get_name_to_id(self, player_stats: dict[str, PlayerStat]) -> dict[str, str]:
         # if one player with name 'foo' disconnects and another player with
         # the same name connects the online player takes preference
         # when name collision happens
         name_to_id: dict[str, str] = {}
-        for id, player in map["player_stats"].items():
+        for id, player in player_stats.items():
             for name in player["names"]:
                 existing_id = name_to_id.get(name)
                 if not existing_id:
@@ -591,26 +660,20 @@ class LogLoop:
                     name_to_id[name] = id
         return name_to_id
 
-    def record_line(self, log: StructuredLogLineWithMetaData, name_to_id: dict[str, str] = {}):
-        id_ = f"{log['timestamp_ms']}|{log['line_without_time']}"
-        if not self.red.sadd(self.duplicate_guard_key, id_):
-            # logger.debug("Skipping duplicate: %s", id_)
-            return None
-
-        logger.info("Caching line: %s", id_)
+    def record_line(self, log: LogRecord, name_to_id: dict[str, str] = {}, current_map: MapInfo | None = None):
+        logger.info("Caching line: %s", log_line_id(log))
         try:
             last_line = self.log_history[0]
         except IndexError:
             last_line = None
 
-        if not isinstance(last_line, dict):
+        if not isinstance(last_line, LogRecord):
             logger.error("Can't check against last_line, invalid_format\nLast line: %s\nCurrent log: %s", last_line, log)
         elif last_line and last_line["timestamp_ms"] > log["timestamp_ms"]:
             logger.warning("Received old log record, ignoring\nLast line: %s\nCurrent log: %s", last_line, log)
             return None
 
         if self._is_log_player_related(log):
-            current_map = MapsHistory().get_current_map()
             if current_map and self._is_log_from_map(log, current_map):
                 for slot in (1, 2):
                     player_name: str | None = log.get(f"player_name_{slot}", None)
@@ -638,65 +701,15 @@ class LogLoop:
         self.log_history.add(log)
         return log
 
-    def cleanup(self, last_cleanup_time: datetime.datetime, cleanup_frequency_minutes: int) -> datetime.datetime:
-        now = datetime.datetime.now(tz=datetime.UTC)
-        if (now - last_cleanup_time).total_seconds() < cleanup_frequency_minutes * 60:
-            return last_cleanup_time
-
-        logger.info("Starting cleanup")
-        for k in self.red.sscan_iter(self.duplicate_guard_key):
-            try:
-                ts, _ = k.decode().split("|", 1)
-            except ValueError:
-                logger.exception("Invalid key %s", k)
-                continue
-            t = datetime.datetime.fromtimestamp(int(ts) / 1000, tz=datetime.UTC)
-            if (datetime.datetime.now(tz=datetime.UTC) - t).total_seconds() > self.CLEANUP_MIN * 60:
-                logger.debug("Older than %d min, removing: %s", self.CLEANUP_MIN, k)
-                self.red.srem(self.duplicate_guard_key, k)
-        logger.info("Cleanup done")
-        return now
-
-    def process_hooks(self, log: StructuredLogLineWithMetaData):
+    def process_hooks(self, log: LogRecord | StructuredLogLineWithMetaData):
         logger.debug("Processing %s", f"{log['action']} | {log['message']}")
-        hooks = []
-        started_total = time.time()
-        for action_hook, funcs in HOOKS.items():
-            if log["action"] == action_hook:
-                hooks += funcs
+        hooks = HOOKS.get(log["action"])
+        if not hooks:
+            return
 
-        for hook in hooks:
-            try:
-                logger.info(
-                    "Triggered %s.%s on %s", hook.__module__, hook.__name__, log["raw"]
-                )
-                started = time.time()
-                hook(self.rcon, log)
-                duration = time.time() - started
-                if duration >= 5:
-                    logger.warning(
-                        "Slow hook %.3fs %s.%s on %s",
-                        duration,
-                        hook.__module__,
-                        hook.__name__,
-                        log["raw"],
-                    )
-                logger.debug(
-                    "Ran in %.4f seconds %s.%s on %s",
-                    duration,
-                    hook.__module__,
-                    hook.__name__,
-                    log["raw"],
-                    )
-            except KeyboardInterrupt:
-                sys.exit(0)
-            except Exception as e:
-                logger.exception(
-                    f"Hook '{hook.__module__}.{hook.__name__}' for '{log}' returned an error: {e}"
-                )
-        logger.debug(
-            "Processed %s hooks in %.4f for: %s",
-            len(hooks),
-            time.time() - started_total,
-            f"{log['action']}{log['message']}",
-            )
+        if isinstance(log, LogRecord):
+            # Hooks get the plain dict they have always been given
+            log = log.to_dict()
+
+        # Run in the background, in order for each player
+        self.hook_executor.submit(list(hooks), log)
@@ -0,0 +1,440 @@
+"""Parse the game server admin log (`GetAdminLog`)
+
+A line is classified by its first three characters with a single dict lookup
+instead of trying each prefix in turn, and every pattern is compiled once.
+`parse_logs` handles a whole payload in one pass and only builds the final
+dict for each line, `parse_log_records` builds compact `LogRecord`s instead.
+"""
+
+import logging
+import re
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+
+from rcon.logs.record import LogRecord
+from rcon.types import (
+    ParsedLogsType,
+    StructuredLogLineType,
+    StructuredLogLineWithMetaData,
+)
+
+logger = logging.getLogger(__name__)
+
+# [12:34 min (1700000000)] KILL: ...
+RAW_LINE_PATTERN = re.compile(r"^(\[.+? \((\d+)\)\]) ([\w\W]*)$", re.MULTILINE)
+CHAT_PATTERN = re.compile(r"CHAT\[(Team|Unit)\]\[(.*)\((Allies|Axis)/(.*)\)\]: (.*)")
+CONNECT_DISCONNECT_PATTERN = re.compile(r"(.+) \((.*)\)")
+KILL_TEAMKILL_PATTERN = re.compile(
+    r"(.*)\((?:Allies|Axis)\/(.*)\) -> (.*)\((?:Allies|Axis)\/(.*)\) with (.*)"
+)
+CAMERA_PATTERN = re.compile(r"\[(.*) \((.*)\)\] (.*)")
+TEAMSWITCH_PATTERN = re.compile(r"TEAMSWITCH\s(.*)\s\((.*\s>\s.*)\)")
+KICK_BAN_PATTERN = re.compile(
+    r"(KICK|BAN): \[(.*)\] (.*\[(KICKED|BANNED|PERMANENTLY|YOU|Host|Anti-Cheat|[^\]]*)[^\]]*)(?:\])*"
+)
+VOTE_PATTERN = re.compile(r"VOTESYS: Player \[(.*)\] voted \[.*\] for VoteID\[\d+\]")
+VOTE_STARTED_PATTERN = re.compile(
+    r"VOTESYS: Player \[(.*)\] Started a vote of type \(.*\) against \[(.*)\]. VoteID: \[\d+\]"
+)
+VOTE_COMPLETE_PATTERN = re.compile(r"VOTESYS: Vote \[\d+\] completed. Result: (.*)")
+VOTE_EXPIRED_PATTERN = re.compile(r"VOTESYS: Vote \[\d+\] (expired|prematurely)")
+VOTE_PASSED_PATTERN = re.compile(r"VOTESYS: (Vote Kick \{(.*)\} .*\[(.*)\])")
+# Need the DOTALL flag to allow `.` to capture newlines in multi line messages
+MESSAGE_PATTERN = re.compile(
+    r"MESSAGE: player \[(.+)\((.*)\)\], content \[(.+)\]", re.DOTALL
+)
+
+KICK_BAN_TYPES = {
+    "PERMANENTLY": "PERMA BANNED",
+    "YOU": "IDLE",
+    "Host": "",
+    "Anti-Cheat": "ANTI-CHEAT",
+    "KICKED": "KICKED",
+    "BANNED": "BANNED",
+}
+
+# action, player_name_1, player_id_1, player_name_2, player_id_2, weapon,
+# message, sub_content
+LineFields = tuple[
+    str,
+    str | None,
+    str | None,
+    str | None,
+    str | None,
+    str | None,
+    str,
+    str | None,
+]
+
+
+def _unknown(raw_line: str) -> ValueError:
+    return ValueError(f"Unknown type line: '{raw_line}'")
+
+
+def _unparsable(raw_line: str) -> ValueError:
+    return ValueError(f"Unable to parse line: {raw_line}")
+
+
+def _parse_kill(raw_line: str) -> LineFields:
+    # KILL: Muctar(Axis/71234567891234567) -> Chris(Allies/71234567891234576) with GEWEHR 43
+    # TEAM KILL: SonofJack(Allies/71234567891234567) -> Joseph Cannon(Allies/71234567891234576) with M1 GARAND
+    action, content = raw_line.split(": ", 1)
+    if match := KILL_TEAMKILL_PATTERN.match(content):
+        player, player_id_1, player2, player_id_2, weapon = match.groups()
+        return action, player, player_id_1, player2, player_id_2, weapon, content, None
+    raise _unparsable(raw_line)
+
+
+def _parse_kill_prefix(raw_line: str) -> LineFields:
+    if not raw_line.startswith("KILL"):
+        raise _unknown(raw_line)
+    return _parse_kill(raw_line)
+
+
+def _parse_team_prefix(raw_line: str) -> LineFields:
+    if raw_line.startswith("TEAM KILL"):
+        return _parse_kill(raw_line)
+    if not raw_line.upper().startswith("TEAMSWITCH"):
+        raise _unknown(raw_line)
+    # TEAMSWITCH Plebs_23 (Axis > None)
+    # TEAMSWITCH SupremeOneechan (None > Allies)
+    if match := TEAMSWITCH_PATTERN.match(raw_line):
+        player, sub_content = match.groups()
+        return "TEAMSWITCH", player, None, None, None, None, raw_line, sub_content
+    raise _unparsable(raw_line)
+
+
+def _parse_connection(raw_line: str) -> LineFields:
+    if not raw_line.startswith(("DISCONNECTED", "CONNECTED")):
+        raise _unknown(raw_line)
+    action, name_and_player_id = raw_line.split(" ", 1)
+    if match := CONNECT_DISCONNECT_PATTERN.match(name_and_player_id):
+        player, player_id_1 = match.groups()
+        return action, player, player_id_1, None, None, None, name_and_player_id, None
+    raise _unparsable(raw_line)
+
+
+def _parse_chat(raw_line: str) -> LineFields:
+    # CHAT[Team][Azure(Allies/71234567891234567)]: supply truck bot hq for nodes
+    # CHAT[Unit][dominguez1987(Axis/71234567891234567)]: back
+    if raw_line.startswith("CHAT") and (match := CHAT_PATTERN.match(raw_line)):
+        scope, player, side, player_id_1, sub_content = match.groups()
+        return (
+            f"CHAT[{side}][{scope}]",
+            player,
+            player_id_1,
+            None,
+            None,
+            None,
+            f"{player}: {sub_content} ({player_id_1})",
+            sub_content,
+        )
+    raise _unknown(raw_line)
+
+
+def _parse_kick_ban(raw_line: str) -> LineFields:
+    if not raw_line.startswith(("KICK", "BAN")):
+        raise _unknown(raw_line)
+    if match := KICK_BAN_PATTERN.match(raw_line):
+        _action, player, sub_content, type_ = match.groups()
+    else:
+        raise _unparsable(raw_line)
+
+    type_ = KICK_BAN_TYPES.get(type_, "MISC")
+    action = f"ADMIN {type_}".strip()
+    if "FOR TEAM KILLING" in raw_line:
+        action = f"TK AUTO {type_}"
+
+    # Reconstruct the log line without the newlines and tack on the trailing ] we lose
+    content = f"{_action}: [{player}] {sub_content}"
+    if content[-1] != "]":
+        content += "]"
+        sub_content = sub_content + "]" if sub_content else ""
+    return action, player, None, None, None, None, content, sub_content
+
+
+def _parse_vote(raw_line: str) -> LineFields:
+    if not raw_line.startswith("VOTE"):
+        raise _unknown(raw_line)
+    _, sub_content = raw_line.split("VOTESYS: ", 1)
+    content = sub_content
+
+    # VOTESYS: Player [Dingbat252] voted [PV_Favour] for VoteID[2]
+    if match := VOTE_PATTERN.match(raw_line):
+        return "VOTE", match.group(1), None, None, None, None, content, sub_content
+    # VOTESYS: Player [NoodleArms] Started a vote of type (PVR_Kick_Abuse) against [buscÃ´O-sensei]. VoteID: [2]
+    if match := VOTE_STARTED_PATTERN.match(raw_line):
+        player, player2 = match.groups()
+        return "VOTE STARTED", player, None, player2, None, None, content, sub_content
+    # VOTESYS: Vote [2] completed. Result: PVR_Passed
+    if VOTE_COMPLETE_PATTERN.match(raw_line):
+        return "VOTE COMPLETED", None, None, None, None, None, content, sub_content
+    # VOTESYS: Vote [1] expired before completion.
+    if VOTE_EXPIRED_PATTERN.match(raw_line):
+        return "VOTE EXPIRED", None, None, None, None, None, content, sub_content
+    # VOTESYS: Vote Kick {buscÃ´O-sensei} successfully passed. [For: 2/1 - Against: 0]
+    if match := VOTE_PASSED_PATTERN.match(raw_line):
+        content, player, sub_content = match.groups()
+        return "VOTE PASSED", player, None, None, None, None, content, sub_content
+    raise _unparsable(raw_line)
+
+
+def _parse_camera(raw_line: str) -> LineFields:
+    if not raw_line.upper().startswith("PLAYER"):
+        raise _unknown(raw_line)
+    # Player [Fachi (71234567891234567)] Entered Admin Camera
+    _, content = raw_line.split(" ", 1)
+    if match := CAMERA_PATTERN.match(content):
+        player, player_id_1, sub_content = match.groups()
+        return "CAMERA", player, player_id_1, None, None, None, content, sub_content
+    raise _unparsable(raw_line)
+
+
+def _parse_match(raw_line: str) -> LineFields:
+    upper = raw_line.upper()
+    if upper.startswith("MATCH START"):
+        # MATCH START UTAH BEACH WARFARE
+        _, sub_content = raw_line.split("MATCH START ")
+        return "MATCH START", None, None, None, None, None, raw_line, sub_content
+    if upper.startswith("MATCH ENDED"):
+        # MATCH ENDED `Kharkov WARFARE` ALLIED (0 - 5) AXIS
+        _, sub_content = raw_line.split("MATCH ENDED ")
+        return "MATCH ENDED", None, None, None, None, None, raw_line, sub_content
+    raise _unknown(raw_line)
+
+
+def _parse_message(raw_line: str) -> LineFields:
+    if not raw_line.upper().startswith("MESSAGE"):
+        raise _unknown(raw_line)
+    raw_line = raw_line.replace("\n", " ")
+    if match := MESSAGE_PATTERN.match(raw_line):
+        player, player_id_1, message_content = match.groups()
+        content = f"{player}({player_id_1}): {message_content}"
+        return (
+            "MESSAGE",
+            player,
+            player_id_1,
+            None,
+            None,
+            None,
+            content,
+            message_content,
+        )
+    raise _unparsable(raw_line)
+
+
+# Keyed by the first three characters of a line, uppercased; each parser then
+# checks the full prefix it handles
+_PARSERS: dict[str, Callable[[str], LineFields]] = {
+    "KIL": _parse_kill_prefix,
+    "TEA": _parse_team_prefix,
+    "DIS": _parse_connection,
+    "CON": _parse_connection,
+    "CHA": _parse_chat,
+    "KIC": _parse_kick_ban,
+    "BAN": _parse_kick_ban,
+    "VOT": _parse_vote,
+    "PLA": _parse_camera,
+    "MAT": _parse_match,
+    "MES": _parse_message,
+}
+
+
+def parse_line_fields(raw_line: str) -> LineFields:
+    """Parse a single log event (without its time) or raise a ValueError"""
+    parser = _PARSERS.get(raw_line[:3].upper())
+    if parser is None:
+        raise _unknown(raw_line)
+    return parser(raw_line)
+
+
+def parse_log_line(raw_line: str) -> StructuredLogLineType:
+    """Parse a single raw RCON log event or raise a ValueError"""
+    (
+        action,
+        player,
+        player_id_1,
+        player2,
+        player_id_2,
+        weapon,
+        content,
+        sub_content,
+    ) = parse_line_fields(raw_line)
+    return {
+        "action": action,
+        "player_name_1": player,
+        "player_id_1": player_id_1,
+        "player_name_2": player2,
+        "player_id_2": player_id_2,
+        "weapon": weapon,
+        "message": content,
+        "sub_content": sub_content,
+    }
+
+
+def split_raw_log_lines(raw_logs: Iterable[str]) -> Iterable[tuple[str, str, str]]:
+    """Split raw game server logs into the relative time, timestamp and content"""
+    for raw_log in raw_logs:
+        log = RAW_LINE_PATTERN.match(raw_log)
+        if log is None:
+            logger.error("Unable to parse log line: '%s'", raw_log)
+            continue
+
+        raw_relative_time, raw_timestamp, raw_log_line = log.groups()
+        yield raw_relative_time, raw_timestamp, raw_log_line.strip()
+
+
+def parse_logs(
+    raw_logs: Iterable[str],
+    filter_action: str | None = None,
+    filter_player: str | None = None,
+    synthetic_actions: Iterable[str] = (),
+) -> ParsedLogsType:
+    """Parse a whole `GetAdminLog` payload, newest line first
+
+    `synthetic_actions` are always reported in `actions`, whether or not a
+    line has them.
+    """
+    now = datetime.now(tz=UTC)
+    parsed_log_lines: list[StructuredLogLineWithMetaData] = []
+    actions: set[str] = set(synthetic_actions)
+    players: set[str] = set()
+    # Consecutive lines mostly share their second
+    last_raw_timestamp = None
+    timestamp_ms = 0
+    event_time = now
+    relative_time_ms = 0.0
+
+    for raw_log in raw_logs:
+        log = RAW_LINE_PATTERN.match(raw_log)
+        if log is None:
+            logger.error("Unable to parse log line: '%s'", raw_log)
+            continue
+
+        raw_relative_time, raw_timestamp, raw_log_line = log.groups()
+        raw_log_line = raw_log_line.strip()
+        if filter_player and filter_player not in raw_log_line:
+            continue
+
+        try:
+            (
+                action,
+                player,
+                player_id_1,
+                player2,
+                player_id_2,
+                weapon,
+                content,
+                sub_content,
+            ) = parse_line_fields(raw_log_line)
+        except ValueError:
+            logger.error(
+                "Unable to parse line: '%s %s %s'",
+                raw_relative_time,
+                raw_timestamp,
+                raw_log_line,
+            )
+            continue
+
+        if filter_action and not action.startswith(filter_action):
+            continue
+
+        if raw_timestamp != last_raw_timestamp:
+            last_raw_timestamp = raw_timestamp
+            timestamp = int(raw_timestamp)
+            timestamp_ms = timestamp * 1000
+            event_time = datetime.fromtimestamp(timestamp, tz=UTC)
+            relative_time_ms = (event_time - now).total_seconds() * 1000
+        parsed_log_lines.append(
+            {
+                "version": 1,
+                "timestamp_ms": timestamp_ms,
+                "event_time": event_time,
+                "relative_time_ms": relative_time_ms,
+                "raw": raw_relative_time + " " + raw_log_line,
+                "line_without_time": raw_log_line,
+                "action": action,
+                "player_name_1": player,
+                "player_id_1": player_id_1,
+                "player_name_2": player2,
+                "player_id_2": player_id_2,
+                "weapon": weapon,
+                "message": content,
+                "sub_content": sub_content,
+            }
+        )
+
+        if player:
+            players.add(player)
+        if player2:
+            players.add(player2)
+        actions.add(action)
+
+    parsed_log_lines.reverse()
+
+    return {
+        "actions": list(actions),
+        "players": list(players),
+        "logs": parsed_log_lines,
+    }
+
+
+def parse_log_records(raw_logs: Iterable[str]) -> list[LogRecord]:
+    """Parse a whole `GetAdminLog` payload into compact records, newest line first"""
+    now = datetime.now(tz=UTC)
+    records: list[LogRecord] = []
+    last_raw_timestamp = None
+    timestamp_ms = 0
+    relative_time_ms = 0.0
+
+    for raw_log in raw_logs:
+        log = RAW_LINE_PATTERN.match(raw_log)
+        if log is None:
+            logger.error("Unable to parse log line: '%s'", raw_log)
+            continue
+
+        raw_relative_time, raw_timestamp, raw_log_line = log.groups()
+        raw_log_line = raw_log_line.strip()
+        try:
+            (
+                action,
+                player,
+                player_id_1,
+                player2,
+                player_id_2,
+                weapon,
+                content,
+                sub_content,
+            ) = parse_line_fields(raw_log_line)
+        except ValueError:
+            logger.error(
+                "Unable to parse line: '%s %s %s'",
+                raw_relative_time,
+                raw_timestamp,
+                raw_log_line,
+            )
+            continue
+
+        if raw_timestamp != last_raw_timestamp:
+            last_raw_timestamp = raw_timestamp
+            timestamp_ms = int(raw_timestamp) * 1000
+            relative_time_ms = (timestamp_ms / 1000 - now.timestamp()) * 1000
+        records.append(
+            LogRecord(
+                timestamp_ms=timestamp_ms,
+                raw_prefix=raw_relative_time,
+                line_without_time=raw_log_line,
+                action=action,
+                player_name_1=player,
+                player_id_1=player_id_1,
+                player_name_2=player2,
+                player_id_2=player_id_2,
+                weapon=weapon,
+                message=content,
+                sub_content=sub_content,
+                relative_time_ms=relative_time_ms,
+            )
+        )
+
+    records.reverse()
+    return records
@@ -0,0 +1,316 @@
+"""Monthly partitions of the log_lines table
+
+log_lines is partitioned by month of `event_time` (see the 0206040781f1
+migration): `log_lines_pYYYY_MM` holds the lines of a month and
+`log_lines_default` the ones no partition covers yet.
+
+`maintain_partitions` is run every day (see config/crontab). It:
+
+- creates the partitions of the next months before lines are recorded in
+  them, and moves the lines that ended up in the default partition to their
+  month's partition
+- applies the retention policy: the partitions older than `retention_months`
+  full months are detached from log_lines, exported to a gzipped CSV file and
+  dropped. `import_archive` records the lines of such a file again.
+"""
+
+import datetime
+import gzip
+import logging
+import os
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TABLE = "log_lines"
+PARTITION_PREFIX = "log_lines_p"
+DEFAULT_PARTITION = "log_lines_default"
+MONTHS_AHEAD = 2
+# Every server runs the maintenance, only one at a time does the work
+ADVISORY_LOCK_ID = 0x4C4F475F50415254
+# The log_lines columns of the archives, raw_hash is computed on import
+ARCHIVE_COLUMNS = (
+    "id",
+    "version",
+    "creation_time",
+    "event_time",
+    "type",
+    "player1_name",
+    "player1_steamid",
+    "player2_name",
+    "player2_steamid",
+    "weapon",
+    "raw",
+    "content",
+    "server",
+    "game",
+)
+IMPORT_TABLE = "log_lines_import"
+
+_BOUNDS = re.compile(r"FROM \('(?P<start>[^']+)'\) TO \('(?P<end>[^']+)'\)")
+
+
+def month_start(value: datetime.datetime | datetime.date) -> datetime.datetime:
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+@dataclass
+class Partition:
+    name: str
+    # None for the default partition
+    start: datetime.datetime | None = None
+    end: datetime.datetime | None = None
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None
+
+
+def _now() -> datetime.datetime:
+    # log_lines timestamps are UTC without a timezone, see UTCDateTime
+    return datetime.datetime.now(tz=datetime.UTC).replace(tzinfo=None)
+
+
+def list_partitions(sess: Session) -> list[Partition]:
+    """The partitions attached to log_lines, oldest first then the default one"""
+    rows = sess.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": TABLE},
+    )
+    partitions = []
+    for name, bounds in rows:
+        if match := _BOUNDS.search(bounds):
+            partitions.append(
+                Partition(
+                    name,
+                    datetime.datetime.fromisoformat(match["start"]),
+                    datetime.datetime.fromisoformat(match["end"]),
+                )
+            )
+        else:
+            partitions.append(Partition(name))
+    return sorted(partitions, key=lambda p: (p.is_default, p.start))
+
+
+def create_partition(sess: Session, month: datetime.datetime) -> Partition:
+    """Create the partition of `month`, moving its lines out of the default
+    partition. Attaching a partition fails while the default one holds lines
+    of its range, so the default one is detached in the meantime."""
+    start = month_start(month)
+    partition = Partition(partition_name(start), start, add_months(start, 1))
+    bounds = {"start": partition.start, "end": partition.end}
+    in_range = "event_time >= :start AND event_time < :end"
+
+    has_default = any(p.is_default for p in list_partitions(sess))
+    moving = (
+        has_default
+        and sess.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"),
+            bounds,
+        ).scalar()
+    )
+    if moving:
+        sess.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+
+    sess.execute(
+        text(
+            f"CREATE TABLE {partition.name} PARTITION OF {TABLE} "
+            "FOR VALUES FROM (:start) TO (:end)"
+        ),
+        bounds,
+    )
+
+    if moving:
+        columns = ", ".join(ARCHIVE_COLUMNS)
+        moved = sess.execute(
+            text(
+                f"INSERT INTO {TABLE} ({columns}) "
+                f"SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_range}"
+            ),
+            bounds,
+        ).rowcount
+        sess.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+        sess.execute(
+            text(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+        )
+        logger.info("Moved %d lines to %s", moved, partition.name)
+
+    logger.info("Created log_lines partition %s", partition.name)
+    return partition
+
+
+def ensure_partitions(
+    sess: Session,
+    months_ahead: int = MONTHS_AHEAD,
+    now: datetime.datetime | None = None,
+    months: Iterable[datetime.datetime] = (),
+) -> list[Partition]:
+    """Create the missing partitions of this month, the next `months_ahead`
+    ones, `months` and the months of the lines in the default partition"""
+    partitions = list_partitions(sess)
+    existing = {p.start for p in partitions if not p.is_default}
+
+    current = month_start(now or _now())
+    wanted = {add_months(current, i) for i in range(months_ahead + 1)}
+    wanted.update(month_start(month) for month in months)
+    if any(p.is_default for p in partitions):
+        wanted.update(
+            month
+            for (month,) in sess.execute(
+                text(
+                    "SELECT DISTINCT date_trunc('month', event_time) "
+                    f"FROM {DEFAULT_PARTITION}"
+                )
+            )
+        )
+    return [create_partition(sess, month) for month in sorted(wanted - existing)]
+
+
+def expired_partitions(
+    partitions: Iterable[Partition],
+    retention_months: int,
+    now: datetime.datetime | None = None,
+) -> list[Partition]:
+    """The partitions that only hold lines older than the current month and the
+    `retention_months` previous ones"""
+    cutoff = add_months(month_start(now or _now()), -retention_months)
+    return [p for p in partitions if not p.is_default and p.end <= cutoff]
+
+
+def archive_path(directory: Path, partition: Partition) -> Path:
+    return directory / f"{partition.name}.csv.gz"
+
+
+def archive_partition(
+    sess: Session, partition: Partition, directory: Path, drop: bool = True
+) -> Path:
+    """Detach the partition and export its lines to `directory`
+
+    Nothing changes if the export fails, the partition is only detached once
+    the session is committed.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = archive_path(directory, partition)
+    partial_path = path.with_name(f"{path.name}.partial")
+
+    sess.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {partition.name}"))
+    columns = ", ".join(ARCHIVE_COLUMNS)
+    cursor = sess.connection().connection.cursor()
+    try:
+        with gzip.open(partial_path, "wb") as f:
+            cursor.copy_expert(
+                f"COPY {partition.name} ({columns}) TO STDOUT WITH (FORMAT csv, HEADER)",
+                f,
+            )
+    except Exception:
+        partial_path.unlink(missing_ok=True)
+        raise
+    finally:
+        cursor.close()
+    os.replace(partial_path, path)
+
+    if drop:
+        sess.execute(text(f"DROP TABLE {partition.name}"))
+    logger.info("Archived log_lines partition %s to %s", partition.name, path)
+    return path
+
+
+def import_archive(sess: Session, path: Path) -> int:
+    """Record the lines of an archive again, returns how many weren't already"""
+    columns = ", ".join(ARCHIVE_COLUMNS)
+    sess.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {IMPORT_TABLE} ON COMMIT DROP "
+            f"AS SELECT {columns} FROM {TABLE} WITH NO DATA"
+        )
+    )
+    cursor = sess.connection().connection.cursor()
+    try:
+        with gzip.open(path, "rb") as f:
+            cursor.copy_expert(
+                f"COPY {IMPORT_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER)",
+                f,
+            )
+    finally:
+        cursor.close()
+
+    months = [
+        month
+        for (month,) in sess.execute(
+            text(f"SELECT DISTINCT date_trunc('month', event_time) FROM {IMPORT_TABLE}")
+        )
+    ]
+    ensure_partitions(sess, months=months)
+    imported = sess.execute(
+        text(
+            f"INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {IMPORT_TABLE} "
+            "ON CONFLICT DO NOTHING"
+        )
+    ).rowcount
+    sess.execute(text(f"TRUNCATE {IMPORT_TABLE}"))
+    logger.info("Imported %d log lines from %s", imported, path)
+    return imported
+
+
+def maintain_partitions(
+    sess: Session,
+    retention_months: int | None = None,
+    archive_directory: Path | None = None,
+    months_ahead: int = MONTHS_AHEAD,
+    now: datetime.datetime | None = None,
+) -> tuple[list[Partition], list[Path]] | None:
+    """Create the upcoming partitions and archive the expired ones
+
+    Lines are kept forever when `retention_months` is None. Returns the
+    partitions created and the archives written, or None if another server is
+    already maintaining the partitions.
+    """
+    if retention_months is not None and archive_directory is None:
+        raise ValueError("An archive directory is required to apply a retention")
+    if not _try_lock(sess):
+        logger.info("log_lines partitions are already being maintained")
+        return None
+
+    created = ensure_partitions(sess, months_ahead, now)
+    # The partitions have to be there for the lines being recorded
+    sess.commit()
+
+    archives = []
+    if retention_months is None:
+        return created, archives
+    for partition in expired_partitions(list_partitions(sess), retention_months, now):
+        # One transaction per partition, not to lose the ones already exported
+        # if a later one fails
+        if not _try_lock(sess):
+            break
+        archives.append(archive_partition(sess, partition, archive_directory))
+        sess.commit()
+    return created, archives
+
+
+def _try_lock(sess: Session) -> bool:
+    """Lock the maintenance until the end of the transaction"""
+    return sess.execute(
+        text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID}
+    ).scalar()
@@ -0,0 +1,248 @@
+"""A compact, read mostly representation of a parsed log line
+
+The log services hold a lot of lines at once (`LogsHistory` keeps 100k of
+them) and used to keep each as a 15 key dict. `LogRecord` stores the same
+information in slots:
+
+- `raw` and `message` are mostly slices of `line_without_time`, so only
+  what can't be rebuilt from it is stored
+- actions, weapons and player names/ids are interned, a busy log repeats
+  them thousands of times
+- `event_time` is only turned into a `datetime` when it's read
+
+It can be read like the dict it replaces (`log["action"]`, `log.get(...)`,
+`dict(log)`) and is turned back into one with `to_dict()` when it leaves
+the log services, e.g. for the API or the hooks.
+"""
+
+import sys
+from collections.abc import Iterator, Mapping
+from datetime import UTC, datetime
+from typing import Any
+
+import orjson
+
+from rcon.types import StructuredLogLineWithMetaData
+
+# In the order of `StructuredLogLineWithMetaData`
+KEYS = (
+    "version",
+    "timestamp_ms",
+    "event_time",
+    "relative_time_ms",
+    "raw",
+    "line_without_time",
+    "action",
+    "player_name_1",
+    "player_id_1",
+    "player_name_2",
+    "player_id_2",
+    "weapon",
+    "message",
+    "sub_content",
+)
+_INTERNED = frozenset(
+    ("action", "player_name_1", "player_id_1", "player_name_2", "player_id_2", "weapon")
+)
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _to_datetime(value: Any) -> Any:
+    """The same conversion `rcon.utils.logs_deserializer` does"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=UTC)
+    if isinstance(value, str):
+        event_time = datetime.fromisoformat(value)
+        return (
+            event_time.replace(tzinfo=UTC) if event_time.tzinfo is None else event_time
+        )
+    return value
+
+
+class LogRecord(Mapping):
+    __slots__ = (
+        "version",
+        "timestamp_ms",
+        "relative_time_ms",
+        "line_without_time",
+        "action",
+        "player_name_1",
+        "player_id_1",
+        "player_name_2",
+        "player_id_2",
+        "weapon",
+        "sub_content",
+        # The relative time `raw` starts with, or the whole of `raw`
+        "_raw_prefix",
+        "_raw_is_prefix",
+        # Where `message` starts in `line_without_time`, or the message
+        "_message",
+        # None until read, see `event_time`
+        "_event_time",
+    )
+
+    def __init__(
+        self,
+        timestamp_ms: int,
+        raw_prefix: str,
+        line_without_time: str,
+        action: str,
+        player_name_1: str | None = None,
+        player_id_1: str | None = None,
+        player_name_2: str | None = None,
+        player_id_2: str | None = None,
+        weapon: str | None = None,
+        message: str = "",
+        sub_content: str | None = None,
+        relative_time_ms: float | None = None,
+        version: int = 1,
+    ):
+        self.version = version
+        self.timestamp_ms = timestamp_ms
+        self.relative_time_ms = relative_time_ms
+        self.line_without_time = line_without_time
+        self.action = sys.intern(action)
+        self.player_name_1 = _intern(player_name_1)
+        self.player_id_1 = _intern(player_id_1)
+        self.player_name_2 = _intern(player_name_2)
+        self.player_id_2 = _intern(player_id_2)
+        self.weapon = _intern(weapon)
+        self.sub_content = sub_content
+        self._raw_prefix = raw_prefix
+        self._raw_is_prefix = True
+        self._event_time = None
+        self.message = message
+
+    @property
+    def event_time(self) -> datetime:
+        if self._event_time is None:
+            self._event_time = datetime.fromtimestamp(self.timestamp_ms // 1000, tz=UTC)
+        elif not isinstance(self._event_time, datetime):
+            self._event_time = _to_datetime(self._event_time)
+        return self._event_time
+
+    @event_time.setter
+    def event_time(self, value: Any) -> None:
+        self._event_time = value
+
+    @property
+    def raw(self) -> str:
+        if self._raw_is_prefix:
+            return self._raw_prefix + " " + self.line_without_time
+        return self._raw_prefix
+
+    @raw.setter
+    def raw(self, value: str) -> None:
+        suffix = " " + self.line_without_time
+        self._raw_is_prefix = value.endswith(suffix)
+        self._raw_prefix = value[: -len(suffix)] if self._raw_is_prefix else value
+
+    @property
+    def message(self) -> str:
+        if isinstance(self._message, int):
+            return self.line_without_time[self._message :]
+        return self._message
+
+    @message.setter
+    def message(self, value: str) -> None:
+        line = self.line_without_time
+        if value and line.endswith(value):
+            self._message = len(line) - len(value)
+        else:
+            self._message = value
+
+    @classmethod
+    def from_dict(cls, log: Mapping[str, Any]) -> "LogRecord":
+        record = cls(
+            timestamp_ms=log["timestamp_ms"],
+            raw_prefix="",
+            line_without_time=log.get("line_without_time") or "",
+            action=log["action"],
+            player_name_1=log.get("player_name_1"),
+            player_id_1=log.get("player_id_1"),
+            player_name_2=log.get("player_name_2"),
+            player_id_2=log.get("player_id_2"),
+            weapon=log.get("weapon"),
+            message=log.get("message", ""),
+            sub_content=log.get("sub_content"),
+            relative_time_ms=log.get("relative_time_ms"),
+            version=log.get("version", 1),
+        )
+        record.raw = log.get("raw", "")
+        # Kept as is until it's read
+        record._event_time = log.get("event_time")
+        return record
+
+    @classmethod
+    def loads(cls, data: bytes | str) -> "LogRecord | Any":
+        """Deserialize a `LogsHistory` entry, anything but a log line is returned as is"""
+        obj = orjson.loads(data)
+        if isinstance(obj, dict) and "timestamp_ms" in obj and "action" in obj:
+            return cls.from_dict(obj)
+        return obj
+
+    def dumps(self) -> bytes:
+        return orjson.dumps(self.to_dict())
+
+    def to_dict(self) -> StructuredLogLineWithMetaData:
+        return {
+            "version": self.version,
+            "timestamp_ms": self.timestamp_ms,
+            "event_time": self.event_time,
+            "relative_time_ms": self.relative_time_ms,
+            "raw": self.raw,
+            "line_without_time": self.line_without_time,
+            "action": self.action,
+            "player_name_1": self.player_name_1,
+            "player_id_1": self.player_id_1,
+            "player_name_2": self.player_name_2,
+            "player_id_2": self.player_id_2,
+            "weapon": self.weapon,
+            "message": self.message,
+            "sub_content": self.sub_content,
+        }
+
+    def copy(self) -> StructuredLogLineWithMetaData:
+        return self.to_dict()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in KEYS:
+            raise KeyError(key)
+        if key in _INTERNED:
+            value = _intern(value)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(KEYS)
+
+    def __len__(self) -> int:
+        return len(KEYS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in KEYS
+
+    def __repr__(self) -> str:
+        return f"LogRecord({self.raw!r})"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        other = LogRecord.from_dict(state)
+        for slot in LogRecord.__slots__:
+            setattr(self, slot, getattr(other, slot))
+
+
+def dumps_log(log: "LogRecord | Mapping[str, Any]") -> bytes:
+    """Serialize a log line for `LogsHistory`, whatever its representation"""
+    if isinstance(log, LogRecord):
+        return log.dumps()
+    return orjson.dumps(log)
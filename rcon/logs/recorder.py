@@ -1,24 +1,153 @@
+import csv
 import datetime
+import io
 import logging
-import os
 import time
+from collections.abc import Mapping
 from typing import Callable, Iterable
 
-from django.template.context_processors import tz
-from sqlalchemy import desc
-from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+import orjson
+import redis
+from sqlalchemy import func, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from rcon.cache_utils import get_redis_client
 from rcon.game.registry import GAME_ID
+from rcon.logs.bus import LogBusConsumer
 from rcon.logs.loop import LogLoop
-from rcon.models import LogLine, PlayerID, enter_session
-from rcon.player_history import _get_set_player
+from rcon.models import LogLine, enter_session
+from rcon.player_history import get_or_create_player_ids
 from rcon.types import StructuredLogLineWithMetaData
-from rcon.utils import get_server_number
+from rcon.utils import LogsHistory, get_server_number
 
 logger = logging.getLogger(__name__)
 
+BUS_GROUP = "log_recorder"
+BUS_BATCH_SIZE = 5000
+HIGH_WATER_MARK_KEY = "log_recorder_high_water_mark"
+STAGING_TABLE = "log_lines_staging"
+# The log_lines columns written with COPY, in order
+COPY_COLUMNS = (
+    "version",
+    "creation_time",
+    "event_time",
+    "type",
+    "player1_name",
+    "player1_steamid",
+    "player2_name",
+    "player2_steamid",
+    "weapon",
+    "raw",
+    "content",
+    "server",
+    "game",
+)
+
+
+def _strip_time(raw: str) -> str:
+    return raw.split("] ", 1)[-1]
+
+
+def _line_without_time(log: Mapping) -> str:
+    return log.get("line_without_time") or _strip_time(log["raw"])
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    # The log_lines timestamps are stored without a timezone, see UTCDateTime
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.UTC).replace(tzinfo=None)
+
+
+def _copy_buffer(rows: list[dict], creation_time: datetime.datetime) -> io.StringIO:
+    """The rows as COPY ... WITH (FORMAT csv) input, in `COPY_COLUMNS` order"""
+    buffer = io.StringIO()
+    # Only NULLs are left unquoted, COPY tells them from empty strings
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+    creation_time = _naive_utc(creation_time)
+    for row in rows:
+        writer.writerow(
+            (
+                row["version"],
+                creation_time,
+                _naive_utc(row["event_time"]),
+                row["type"],
+                row["player1_name"],
+                row["player1_player_id"],
+                row["player2_name"],
+                row["player2_player_id"],
+                row["weapon"],
+                row["raw"],
+                row["content"],
+                row["server"],
+                row["game"],
+            )
+        )
+    buffer.seek(0)
+    return buffer
+
+
+class HighWaterMark:
+    """The time of the most recent recorded lines and which lines those are
+
+    Lines logged before it, or at the same time and already recorded, don't
+    need to be recorded again. It's kept in Redis so the recorder doesn't
+    have to look the last line up in the database.
+    """
+
+    def __init__(self, timestamp_ms: int = 0, lines: Iterable[str] = ()):
+        self.timestamp_ms = timestamp_ms
+        self.lines = set(lines)
+
+    def covers(self, log: Mapping) -> bool:
+        timestamp_ms = log["timestamp_ms"]
+        return timestamp_ms < self.timestamp_ms or (
+            timestamp_ms == self.timestamp_ms and _line_without_time(log) in self.lines
+        )
+
+    def advance(self, logs: Iterable[Mapping]) -> None:
+        for log in logs:
+            if log["timestamp_ms"] > self.timestamp_ms:
+                self.timestamp_ms = log["timestamp_ms"]
+                self.lines = set()
+            if log["timestamp_ms"] == self.timestamp_ms:
+                self.lines.add(_line_without_time(log))
+
+    @classmethod
+    def from_db(cls, sess: Session, server_id: str) -> "HighWaterMark":
+        last_event_time = (
+            sess.query(func.max(LogLine.event_time))
+            .filter(LogLine.server == server_id)
+            .scalar()
+        )
+        if last_event_time is None:
+            return cls()
+        raws = (
+            sess.query(LogLine.raw)
+            .filter(LogLine.server == server_id, LogLine.event_time == last_event_time)
+            .all()
+        )
+        return cls(
+            int(last_event_time.timestamp()) * 1000,
+            (_strip_time(raw) for (raw,) in raws),
+        )
+
+    @classmethod
+    def load(cls, red: redis.Redis) -> "HighWaterMark | None":
+        data = red.get(HIGH_WATER_MARK_KEY)
+        if data is None:
+            return None
+        mark = orjson.loads(data)
+        return cls(mark["timestamp_ms"], mark["lines"])
+
+    def save(self, red: redis.Redis) -> None:
+        red.set(
+            HIGH_WATER_MARK_KEY,
+            orjson.dumps({"timestamp_ms": self.timestamp_ms, "lines": list(self.lines)}),
+        )
+
+
 class LogRecorder:
     def __init__(self, dump_frequency_seconds=10, log_history_fn: Callable[[], Iterable[StructuredLogLineWithMetaData]] = LogLoop.get_log_history_list):
         self.dump_frequency_seconds = dump_frequency_seconds
@@ -27,69 +156,46 @@ class LogRecorder:
         if not self.server_id:
             raise ValueError("SERVER_NUMBER is not set, can't record logs")
 
-    def _get_new_logs(self, sess: Session):
+    def _get_new_logs(self, sess: Session, mark: HighWaterMark | None = None):
+        if mark is None:
+            mark = HighWaterMark.from_db(sess, self.server_id)
+        logger.info("Getting new logs from %s", mark.timestamp_ms)
+        history = self.log_history_fn()
+        if isinstance(history, LogsHistory):
+            # Only the lines logged since the mark are read
+            history = history.since(mark.timestamp_ms)
+
         to_store: list[StructuredLogLineWithMetaData] = []
-        last_log = (
-            sess.query(LogLine)
-            .filter(LogLine.server == self.server_id)
-            .order_by(desc(LogLine.event_time))
-            .limit(1)
-            .one_or_none()
-        )
-        logger.info("Getting new logs from %s", last_log.event_time if last_log else 0)
         log: StructuredLogLineWithMetaData
-        for log in self.log_history_fn():
-            if not isinstance(log, dict):
+        for log in history:
+            if not isinstance(log, Mapping):
                 logger.warning("Log is invalid, not a dict: %s", log)
                 continue
-            if last_log and log["event_time"] == last_log.event_time and '] ' + log["line_without_time"] in last_log.raw:
-                logger.debug("This log is the same as the last saved log, skipping saving the rest of the logs\n%s", log)
-                break
-            to_store.append(log)
+            if not mark.covers(log):
+                to_store.append(log)
         return to_store
 
-    def _collect_player_ids(self, sess: Session, logs: list[StructuredLogLineWithMetaData]) -> dict[str, PlayerID | None]:
-        players: dict[str, PlayerID | None] = {}
+    def _collect_player_ids(self, sess: Session, logs: list[StructuredLogLineWithMetaData]) -> dict[str, int]:
+        # NOTE potential race condition if this player id collection runs before
+        # the player id is stored in the db
+        # or the logs did not arrive in chronological order e.g. KILL log before CONNECTED log
+        # where PlayerID is only created on CONNECTED log trigger
         names: dict[str, str | None] = {}
         for log in logs:
             for i in [1, 2]:
                 if log[f"player_id_{i}"] is not None:
-                    players.setdefault(log[f"player_id_{i}"], None)
                     names.setdefault(log[f"player_id_{i}"], log[f"player_name_{i}"])
-        if not players:
-            return players
+        return get_or_create_player_ids(sess, names)
 
-        # NOTE potential race condition if this player id collection runs before
-        # the player id is stored in the db
-        # or the logs did not arrive in chronological order e.g. KILL log before CONNECTED log
-        # where PlayerID is only created on CONNECTED log trigger
-        unique_player_ids = set(players.keys( ))
-        pid_query = sess.query(PlayerID).filter(PlayerID.player_id.in_(list(players.keys())))
-        for pid in pid_query:
-            players[pid.player_id] = pid
-            unique_player_ids.remove(pid.player_id)
-        if len(unique_player_ids) != 0:
-            logger.info("[MISSING PlayerID Records] - Creating PlayerID records\nMissing: %s", unique_player_ids)
-            for player_id in unique_player_ids:
-                pid = _get_set_player(sess, player_id, names[player_id])
-                players[pid.player_id] = pid
-        return players
-
-    def _save_logs(self, sess, to_store: list[StructuredLogLineWithMetaData]):
+    def _save_logs(self, sess, to_store: list[StructuredLogLineWithMetaData]) -> bool:
+        """Add the lines to the session, returns whether they could be"""
         if not to_store:
-            return
+            return True
 
         players = self._collect_player_ids(sess, to_store)
         rows = []
 
         for log in to_store:
-            player_1: PlayerID | None = None
-            player_2: PlayerID | None = None
-            if log["player_id_1"]:
-                player_1 = players[log["player_id_1"]]
-            if log["player_id_2"]:
-                player_2 = players[log["player_id_2"]]
-
             logger.debug("Saving log: [%d] -> %s", log["timestamp_ms"], log["raw"])
             rows.append(
                 {
@@ -98,8 +204,8 @@ class LogRecorder:
                     "type": log["action"],
                     "player1_name": log["player_name_1"],
                     "player2_name": log["player_name_2"],
-                    "player1_player_id": player_1.id if player_1 else None,
-                    "player2_player_id": player_2.id if player_2 else None,
+                    "player1_player_id": players.get(log["player_id_1"]),
+                    "player2_player_id": players.get(log["player_id_2"]),
                     "raw": log["raw"],
                     "content": log["message"],
                     "server": self.server_id,
@@ -108,24 +214,99 @@ class LogRecorder:
                 }
             )
 
-
         try:
             if sess.get_bind().dialect.name == "postgresql":
-                statement = postgresql_insert(LogLine).values(rows)
-                statement = statement.on_conflict_do_nothing(
-                    constraint="unique_log_line",
-                )
-                sess.execute(statement)
+                self._copy_rows(sess, rows)
             else:
                 sess.add_all(LogLine(**row) for row in rows)
                 sess.flush()
         except IntegrityError:
             sess.rollback()
             logger.exception("Unable to record log batch")
+            return False
+        return True
+
+    def _copy_rows(self, sess: Session, rows: list[dict]):
+        """COPY the rows to a staging table and merge them into log_lines
+
+        Lines already recorded are skipped by the unique_log_line constraint.
+        """
+        buffer = _copy_buffer(rows, datetime.datetime.now(tz=datetime.UTC))
+        columns = ", ".join(COPY_COLUMNS)
+        sess.execute(
+            text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DROP "
+                f"AS SELECT {columns} FROM log_lines WITH NO DATA"
+            )
+        )
+        cursor = sess.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+        result = sess.execute(
+            text(
+                f"INSERT INTO log_lines ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+                "ON CONFLICT ON CONSTRAINT unique_log_line DO NOTHING"
+            )
+        )
+        sess.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+        logger.info("Recorded %d of %d log lines", result.rowcount, len(rows))
+
+    def _catch_up(self, mark: HighWaterMark | None = None):
+        with enter_session() as sess:
+            to_store = self._get_new_logs(sess, mark)
+            logger.info("%s log lines to record", len(to_store))
+
+            self._save_logs(sess, to_store)
+        return to_store
+
+    def _record_from_bus(self, consumer: LogBusConsumer, mark: HighWaterMark, red: redis.Redis):
+        # Drain what was published since the last run, in batches
+        while entries := consumer.read(count=BUS_BATCH_SIZE):
+            to_store = [log for _, log in entries if log is not None and not mark.covers(log)]
+            logger.info("%s log lines to record", len(to_store))
+            # enter_session logs and swallows some database errors, the batch
+            # is only acknowledged once its commit went through
+            committed = False
+            try:
+                with enter_session() as sess:
+                    if self._save_logs(sess, to_store):
+                        sess.commit()
+                        committed = True
+            except Exception:
+                consumer.retry_pending()
+                raise
+            if not committed:
+                # Left pending, it's read again on the next run
+                consumer.retry_pending()
+                return
+            consumer.ack(id_ for id_, _ in entries)
+            mark.advance(to_store)
+            mark.save(red)
 
     def run(self, run_immediately=False, one_off=False):
+        if one_off:
+            self._catch_up()
+            return
+
+        # New lines are read from the log bus, what was logged while the
+        # recorder was down is caught up on from the logs history, lines
+        # recorded twice are ignored by the unique_log_line constraint
+        red = get_redis_client()
+        consumer = LogBusConsumer(BUS_GROUP)
+        consumer.setup()
+        mark = HighWaterMark.load(red)
+        if mark is None:
+            with enter_session() as sess:
+                mark = HighWaterMark.from_db(sess, self.server_id)
+        mark.advance(self._catch_up(mark))
+        mark.save(red)
+
         last_run = datetime.datetime.now(tz=datetime.UTC)
-        if run_immediately or one_off:
+        if run_immediately:
             last_run = last_run - datetime.timedelta(seconds=self.dump_frequency_seconds + 1)
 
         while True:
@@ -134,12 +315,5 @@ class LogRecorder:
                 logger.debug("Not due for recording yet")
                 time.sleep(5)
                 continue
-            with enter_session() as sess:
-                to_store = self._get_new_logs(sess)
-                logger.info("%s log lines to record", len(to_store))
-
-                self._save_logs(sess, to_store)
-
-                last_run = datetime.datetime.now(tz=datetime.UTC)
-            if one_off:
-                break
+            self._record_from_bus(consumer, mark, red)
+            last_run = datetime.datetime.now(tz=datetime.UTC)
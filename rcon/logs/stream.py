@@ -1,99 +1,109 @@
-import datetime
 import logging
 import time
-from collections import defaultdict
 
 import redis
 
 from rcon.cache_utils import get_redis_client
-from rcon.rcon import Rcon, get_rcon
+from rcon.logs.bus import LogBusConsumer
+from rcon.logs.dedup import log_line_id
+from rcon.logs.record import LogRecord
 from rcon.types import StructuredLogLineWithMetaData
 from rcon.user_config.log_stream import LogStreamUserConfig
-from rcon.utils import Stream, StreamOlderElement, StreamID, StreamNoElements
+from rcon.utils import LogsHistory, Stream, StreamOlderElement, StreamID, StreamNoElements
 
 logger = logging.getLogger(__name__)
 
+BUS_GROUP = "log_stream"
+
 class LogStream:
     # Each CRCON uses its own redis database, no need for keys to be unique across servers
     def __init__(
             self,
-            rcon: Rcon | None = None,
             red: redis.StrictRedis | None = None,
             key="log_stream",
             maxlen: int | None = None,
     ) -> None:
         config = LogStreamUserConfig.load_from_db()
-        self.rcon = rcon or get_rcon()
         self.red = red or get_redis_client()
         self.log_history_key = key
         self.log_stream = Stream(key=key, maxlen=maxlen or config.stream_size)
+        self._last_timestamp: int | None = None
+        self._last_second_lines: set[str] = set()
 
     def clear(self):
         logger.info("Clearing stream")
         self.red.delete(self.log_history_key)
 
-    def bucket_by_timestamp(self, logs: list[StructuredLogLineWithMetaData]):
-        """Organize logs by their game server timestamp
-
-        Redis streams must be in sequential order, we use custom keys that are the
-        unix timestamp of the time the log occurred on the game server, but each
-        timestamp can have multiple logs.
+    def _stream_id(self, log: LogRecord) -> str | None:
+        """The `{timestamp}-{index}` stream ID of a line, None if already added
 
-        Return each unique timestamp and the logs that occured at that time
+        Lines logged during the same second are numbered in the order they
+        are added, whichever batch they come in.
         """
-        # logs has the newest logs first, oldest last
-        buckets: dict[datetime.datetime, list[StructuredLogLineWithMetaData]] = (
-            defaultdict(list)
-        )
-
-        ordered_logs: list[
-            tuple[datetime.datetime, list[StructuredLogLineWithMetaData]]
-        ] = []
-
-        for log in reversed(logs):
-            timestamp = datetime.datetime.fromtimestamp(log["timestamp_ms"] / 1000, tz=datetime.UTC)
-            buckets[timestamp].append(log)
-
-        for timestamp in buckets.keys():
-            ordered_logs.append((timestamp, buckets[timestamp]))
-
-        return ordered_logs
+        timestamp = log["timestamp_ms"] // 1000
+        if timestamp != self._last_timestamp:
+            self._last_timestamp = timestamp
+            self._last_second_lines = set()
+        line_id = log_line_id(log)
+        if line_id in self._last_second_lines:
+            return None
+        self._last_second_lines.add(line_id)
+        return f"{timestamp}-{len(self._last_second_lines) - 1}"
+
+    def _add(self, logs: list[LogRecord]) -> int:
+        """Add the lines, oldest first, to the stream"""
+        new_logs = 0
+        last_seen_id = None
+        for log in logs:
+            if (stream_id := self._stream_id(log)) is None:
+                continue
+            try:
+                last_seen_id = self.log_stream.add(custom_id=stream_id, obj=log)
+                new_logs += 1
+            except StreamOlderElement:
+                continue
+        if new_logs:
+            logger.info(f"Added {new_logs} new logs {last_seen_id=}")
+        return new_logs
 
     def run(
             self,
             loop_frequency_secs: int | None = None,
             initial_since_min: int | None = None,
-            active_since_min: int | None = None,
     ):
-        """Poll the game server and add new logs to the stream"""
+        """Add the new logs published on the log bus to the stream
+
+        The stream starts with the last `initial_since_min` minutes of the
+        logs history.
+        """
 
         config = LogStreamUserConfig.load_from_db()
 
+        consumer = LogBusConsumer(BUS_GROUP)
+        consumer.setup()
+        # What was published while the stream was down is in the history
+        consumer.skip_to_latest()
+
         since_min = initial_since_min or config.startup_since_mins
-        logs = self.rcon.get_structured_logs(since_min_ago=since_min)["logs"]
-        since_min = active_since_min or config.refresh_since_mins
+        since_ms = int((time.time() - since_min * 60) * 1000)
+        # The history is newest first
+        self._add(list(reversed(LogsHistory().since(since_ms))))
 
-        last_seen_id = None
         while True:
             config = LogStreamUserConfig.load_from_db()
             if not config.enabled:
                 break
-            ordered_logs = self.bucket_by_timestamp(logs)
-            new_logs = 0
-            for timestamp, log_bucket in ordered_logs:
-                for idx, log in enumerate(log_bucket):
-                    timestamp_ms = log["timestamp_ms"] // 1000
-                    stream_id = f"{timestamp_ms}-{idx}"
-                    try:
-                        last_seen_id = self.log_stream.add(custom_id=stream_id, obj=log)
-                        new_logs += 1
-                    except StreamOlderElement:
-                        continue
-
-            if new_logs:
-                logger.info(f"Added {new_logs} new logs {last_seen_id=}")
-            time.sleep(loop_frequency_secs or config.refresh_frequency_sec)
-            logs = self.rcon.get_structured_logs(since_min_ago=since_min)["logs"]
+            block_ms = int((loop_frequency_secs or config.refresh_frequency_sec) * 1000)
+            try:
+                entries = consumer.read(block_ms=block_ms)
+            except redis.exceptions.RedisError as e:
+                logger.warning("Unable to read the log bus: %s", e)
+                # A read that was retried may have been delivered already
+                consumer.retry_pending()
+                time.sleep(1)
+                continue
+            self._add([log for _, log in entries if log is not None])
+            consumer.ack(id_ for id_, _ in entries)
 
     def logs_since(
             self, last_seen: StreamID | None = None, block_ms=500
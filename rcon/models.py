@@ -2,6 +2,7 @@ import logging
 import os
 import re
 import sys
+import uuid
 from collections import defaultdict
 from collections.abc import Generator, Sequence
 from contextlib import contextmanager
@@ -12,6 +13,7 @@ import pydantic
 from sqlalchemy import (
     JSON,
     TIMESTAMP,
+    Computed,
     Engine,
     Enum,
     ForeignKey,
@@ -22,7 +24,7 @@ from sqlalchemy import (
     select,
     text,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.exc import InvalidRequestError, ProgrammingError
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
@@ -731,15 +733,38 @@ class PlayersAction(Base):
         }
 
 
+def get_log_line_weapon(type_: str | None, weapon: str | None, raw: str) -> str | None:
+    if weapon:
+        return weapon
+    # Backward compatibility for logs before weapon was added
+    if type_ and type_.lower() in ("kill", "team kill"):
+        try:
+            return raw.rsplit(" with ", 1)[-1]
+        except:  # noqa
+            logger.exception("Unable to extract weapon")
+
+    return None
+
+
 class LogLine(Base):
+    """A recorded log line
+
+    The table is partitioned by month of `event_time`, see rcon.logs.partitions
+    """
+
     __tablename__ = "log_lines"
-    __table_args__ = (UniqueConstraint("event_time", "raw", name="unique_log_line"),)
+    __table_args__ = (
+        # Also the index of the event_time lookups
+        UniqueConstraint("event_time", "raw_hash", name="unique_log_line"),
+        {"postgresql_partition_by": "RANGE (event_time)"},
+    )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     version: Mapped[int] = mapped_column(default=1)
     creation_time: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow)
+    # Part of the primary key as it's the partition key
     event_time: Mapped[datetime] = mapped_column(
-        UTCDateTime, nullable=False, index=True
+        UTCDateTime, primary_key=True, nullable=False
     )
     type: Mapped[str] = mapped_column(nullable=True)
     player1_name: Mapped[str] = mapped_column(nullable=True)
@@ -752,6 +777,10 @@ class LogLine(Base):
     )
     weapon: Mapped[str] = mapped_column()
     raw: Mapped[str] = mapped_column(nullable=False)
+    # A fixed size key to dedup lines on, indexing raw itself was costly
+    raw_hash: Mapped[uuid.UUID] = mapped_column(
+        UUID, Computed("md5(raw)::uuid", persisted=True)
+    )
     content: Mapped[str] = mapped_column()
     player_1: Mapped[PlayerID] = relationship(foreign_keys=[player1_player_id])
     player_2: Mapped[PlayerID] = relationship(foreign_keys=[player2_player_id])
@@ -761,16 +790,7 @@ class LogLine(Base):
     )
 
     def get_weapon(self) -> str | None:
-        if self.weapon:
-            return self.weapon
-        # Backward compatibility for logs before weapon was added
-        if self.type and self.type.lower() in ("kill", "team kill"):
-            try:
-                return self.raw.rsplit(" with ", 1)[-1]
-            except:  # noqa
-                logger.exception("Unable to extract weapon")
-
-        return None
+        return get_log_line_weapon(self.type, self.weapon, self.raw)
 
     def to_dict(self) -> DBLogLineType:
         # TODO: Fix typing
@@ -1,19 +1,92 @@
+import bisect
 import logging
+import threading
+import time
+from collections import Counter
+
+import redis
+import redis.exceptions
 
 from rcon.cache_utils import get_redis_client
 
 logger = logging.getLogger(__name__)
 
+FLUSH_INTERVAL_SECONDS = 5
+# Upper bounds of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+)
+LATENCY_PREFIX = "latency::"
+PERCENTILES = (50, 95, 99)
+
+
+def latency_bucket(seconds: float) -> str:
+    """The histogram bucket (its upper bound in ms) a latency falls in"""
+    index = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+    return str(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else "inf"
+
+
+def percentiles_from_buckets(buckets: dict[str, int]) -> dict[str, float | int]:
+    """Estimate latency percentiles (in ms) from histogram bucket counts
+
+    A percentile is reported as the upper bound of the bucket it falls in, so
+    it's an overestimate by at most one bucket.
+    """
+    ordered = sorted(
+        ((float(bound), int(count)) for bound, count in buckets.items()),
+        key=lambda b: b[0],
+    )
+    total = sum(count for _, count in ordered)
+    result: dict[str, float | int] = {"count": total}
+    for percentile in PERCENTILES:
+        if not total:
+            continue
+        threshold = total * percentile / 100
+        seen = 0
+        for bound, count in ordered:
+            seen += count
+            if seen >= threshold:
+                result[f"p{percentile}_ms"] = bound
+                break
+    return result
+
 
 class PerformanceStatistics:
     """
     Provides a way to persist performance-related metrics over multiple service (instances).
+
+    Metrics are accumulated in memory and added to Redis in a single pipeline
+    at most every `flush_interval` seconds, so recording them never waits on Redis.
     """
 
-    def __init__(self, namespace: str, enabled: bool = False):
-        self.red = get_redis_client()
+    def __init__(
+        self,
+        namespace: str,
+        enabled: bool = False,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        red: redis.Redis | None = None,
+    ):
+        self.red = red or get_redis_client()
         self.namespace = namespace
         self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._counters: Counter[str] = Counter()
+        self._latencies: dict[str, Counter[str]] = {}
+        self._mu = threading.Lock()
+        self._flush_mu = threading.Lock()
+        self._last_flush = time.monotonic()
 
     def metric_key(self, metric: str) -> str:
         return self.namespace + "::" + metric
@@ -21,22 +94,85 @@ class PerformanceStatistics:
     def increment(self, metric: str, value: int = 1):
         if not self.enabled:
             return
-        self.red.incr(self.metric_key(metric), value)
+        with self._mu:
+            self._counters[metric] += value
+        self._maybe_flush()
+
+    def observe_latency(self, command: str, seconds: float):
+        """Record how long a RCON command took, per command name"""
+        if not self.enabled:
+            return
+        bucket = latency_bucket(seconds)
+        with self._mu:
+            self._latencies.setdefault(command, Counter())[bucket] += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        # Only one thread flushes, the others carry on
+        if not self._flush_mu.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            self.flush()
+        finally:
+            self._flush_mu.release()
 
-    def dump(self) -> dict[str, int]:
+    def flush(self):
+        with self._mu:
+            counters, self._counters = self._counters, Counter()
+            latencies, self._latencies = self._latencies, {}
+        if not counters and not latencies:
+            return
+
+        pipe = self.red.pipeline(transaction=False)
+        for metric, value in counters.items():
+            pipe.incrby(self.metric_key(metric), value)
+        for command, buckets in latencies.items():
+            key = self.metric_key(LATENCY_PREFIX + command)
+            for bucket, count in buckets.items():
+                pipe.hincrby(key, bucket, count)
+        try:
+            pipe.execute()
+        except redis.exceptions.RedisError:
+            logger.exception("Unable to flush performance statistics")
+
+    def dump(self) -> dict[str, int | dict[str, float | int]]:
         """
         Returns the current set of metrics collected for the configured namespace. This will also indicate the
         start of a new time-window for metrics to be collected. All already existing metrics, after calling dump,
         will be reset to 0.
+
+        Latencies are returned per command as `latency::<command>` with their
+        count and estimated p50/p95/p99 in milliseconds.
         :return:
         """
-        keys = self.red.keys(self.metric_key("*"), decode_responses=True)
+        self.flush()
+        prefix = self.namespace + "::"
+        keys = [
+            k.decode() if isinstance(k, bytes) else k
+            for k in self.red.scan_iter(match=self.metric_key("*"), count=1000)
+        ]
+        counter_keys = [k for k in keys if not k.startswith(prefix + LATENCY_PREFIX)]
+        latency_keys = [k for k in keys if k.startswith(prefix + LATENCY_PREFIX)]
+
         p = self.red.pipeline()
-        for k in keys:
+        for k in counter_keys:
             p.set(k, 0, get=True)
+        for k in latency_keys:
+            p.hgetall(k)
+            p.delete(k)
         a = p.execute()
 
-        res = {}
-        for idx, k in enumerate(keys):
-            res[k.decode().replace(self.namespace + "::", "")] = int(a[idx])
+        res: dict[str, int | dict[str, float | int]] = {}
+        for idx, k in enumerate(counter_keys):
+            res[k.replace(prefix, "", 1)] = int(a[idx] or 0)
+        for idx, k in enumerate(latency_keys):
+            raw = a[len(counter_keys) + idx * 2]
+            buckets = {
+                (b.decode() if isinstance(b, bytes) else b): int(c)
+                for b, c in raw.items()
+            }
+            res[k.replace(prefix, "", 1)] = percentiles_from_buckets(buckets)
         return res
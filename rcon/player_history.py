@@ -2,11 +2,13 @@ import datetime
 import logging
 import math
 import unicodedata
+from collections.abc import Iterable
 from datetime import UTC
 from functools import cmp_to_key
 
 from dateutil import parser
 from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.orm import Session, contains_eager, selectinload
 from sqlalchemy.sql.functions import ReturnTypeFromArgs
 
@@ -53,6 +55,15 @@ def get_player(sess: Session, player_id: str) -> PlayerID | None:
     return sess.query(PlayerID).filter(PlayerID.player_id == player_id).one_or_none()
 
 
+def get_player_ids(sess: Session, player_ids: Iterable[str]) -> dict[str, int]:
+    """The database ID of each player ID that has a record"""
+    return dict(
+        sess.query(PlayerID.player_id, PlayerID.id).filter(
+            PlayerID.player_id.in_(list(player_ids))
+        )
+    )
+
+
 def get_player_profile(player_id: str, nb_sessions: int):
     nb_sessions = int(nb_sessions)
 
@@ -131,6 +142,74 @@ def _get_set_player(
     return player
 
 
+def get_or_create_player_ids(
+    sess: Session,
+    names: dict[str, str | None],
+    timestamp: float | None = None,
+) -> dict[str, int]:
+    """The database ID of each player ID, creating the missing players in bulk
+
+    `names` maps player IDs to the name they were seen with, saved as the
+    alias of the players that are created. Other databases than PostgreSQL
+    create them one by one with `_get_set_player`.
+    """
+    if not names:
+        return {}
+
+    ids = get_player_ids(sess, names)
+    missing = [player_id for player_id in names if player_id not in ids]
+    if not missing:
+        return ids
+
+    logger.info("Creating %d missing PlayerID records: %s", len(missing), missing)
+    if sess.get_bind().dialect.name != "postgresql":
+        for player_id in missing:
+            ids[player_id] = _get_set_player(
+                sess, player_id, names[player_id], timestamp
+            ).id
+        return ids
+
+    seen = datetime.datetime.fromtimestamp(
+        timestamp or datetime.datetime.now(tz=UTC).timestamp(), tz=UTC
+    )
+    created = sess.execute(
+        postgresql_insert(PlayerID)
+        .values([{"player_id": player_id} for player_id in missing])
+        .on_conflict_do_nothing(index_elements=[PlayerID.player_id])
+        .returning(PlayerID.player_id, PlayerID.id)
+    ).all()
+    new_ids = dict(created)
+    if len(new_ids) != len(missing):
+        # Created concurrently, e.g. by a connect hook
+        ids.update(
+            sess.query(PlayerID.player_id, PlayerID.id).filter(
+                PlayerID.player_id.in_([p for p in missing if p not in new_ids])
+            )
+        )
+    ids.update(new_ids)
+
+    if new_ids:
+        for model in (PlayerAccount, PlayerSoldier):
+            sess.execute(
+                postgresql_insert(model)
+                .values([{"player_id_id": id_} for id_ in new_ids.values()])
+                .on_conflict_do_nothing(index_elements=[model.player_id_id])
+            )
+        aliases = [
+            {"player_id_id": id_, "name": names[player_id], "last_seen": seen}
+            for player_id, id_ in new_ids.items()
+            if names[player_id]
+        ]
+        if aliases:
+            sess.execute(
+                postgresql_insert(PlayerName)
+                .values(aliases)
+                .on_conflict_do_nothing(constraint="unique_name_steamid")
+            )
+    sess.commit()
+    return ids
+
+
 def remove_accent(s):
     return unicodedata.normalize("NFD", s).encode("ascii", "ignore").decode("utf-8")
 
@@ -3,7 +3,6 @@ import logging
 import os
 import pickle
 import re
-import time
 from collections.abc import Callable, Iterable, Mapping
 from dataclasses import dataclass
 from datetime import UTC
@@ -12,7 +11,11 @@ from typing import TypedDict
 from hllrcon import HLLTeam
 
 from rcon.cache_utils import get_redis_client
-from rcon.game_logs import get_historical_logs_records, get_recent_logs
+from rcon.game_logs import (
+    get_historical_logs_columns,
+    get_historical_logs_records,
+    get_recent_logs,
+)
 from rcon.maps import parse_layer
 from rcon.models import enter_session
 from rcon.player_history import _get_profiles, get_player_profile_by_player_ids
@@ -29,7 +32,6 @@ from rcon.types import (
     PlayerStatsType,
     StructuredLogLineWithMetaData,
 )
-from rcon.user_config.rcon_server_settings import RconServerSettingsUserConfig
 from rcon.utils import MapsHistory, get_default_player_stats
 
 logger = logging.getLogger(__name__)
@@ -149,7 +151,7 @@ class BaseStats:
             for log in player_logs:
                 self._process_log(player_stats, player, log)
                 self._calc_streaks(player_stats, player, log, streaks)
-                self._calc_computed_stats(player_stats)
+            self._calc_computed_stats(player_stats)
 
             # Use player_id as the mapping key so a name change does not create duplicates
             pid_key = player.get("player_id") or player.get("name")
@@ -448,7 +450,7 @@ class LiveStats(BaseStats):
                 now - datetime.timedelta(seconds=oldest_session_seconds)
             ).timestamp()
             logger.debug("Min timestamp: %s", min_timestamp)
-            logs = get_recent_logs(min_timestamp=min_timestamp)
+            logs = get_recent_logs(min_timestamp=min_timestamp, as_records=True)
 
             logger.info("%s log lines to process", len(logs["logs"]))
 
@@ -465,8 +467,9 @@ class LiveStats(BaseStats):
 
             # Enrich the log-derived stats with the richer per-unit stats stored on the current map.
             # This mirrors the behavior of `current_game_stats()`.
+            maps_history = MapsHistory()
             try:
-                current_map = MapsHistory()[0]
+                current_map = maps_history.with_player_stats(maps_history[0])
             except IndexError:
                 logger.error("No maps information available")
                 return stats
@@ -682,21 +685,13 @@ class TimeWindowStats(BaseStats):
         server_number = server_number or os.getenv("SERVER_NUMBER")
         with enter_session() as sess:
             # Get the logs from the database for the given time range
-            rows = get_historical_logs_records(
-                sess,
-                from_=from_,
-                till=until,
-                time_sort="asc",
-                server_filter=server_number,
-                limit=99999999,
+            logs = get_historical_logs_columns(
+                sess, from_=from_, till=until, server_filter=server_number
             )
 
-            return self._get_players_stats_from_logs(
-                [row.compatible_dict() for row in rows],
-                from_,
-                until,
-                cached_players=cached_players,
-            )
+        return self._get_players_stats_from_logs(
+            logs, from_, until, cached_players=cached_players
+        )
 
     def map_result(self, from_, until, server_number=None) -> dict[str, int]:
         server_number = server_number or os.getenv("SERVER_NUMBER")
@@ -722,7 +717,7 @@ class TimeWindowStats(BaseStats):
     ):
         if cached_players is None:
             cached_players = {}
-        logs = get_recent_logs(min_timestamp=from_timestamp)
+        logs = get_recent_logs(min_timestamp=from_timestamp, as_records=True)
         return self._get_players_stats_from_logs(
             reversed(logs.get("logs", [])),
             datetime.datetime.fromtimestamp(from_timestamp, datetime.UTC),
@@ -732,64 +727,16 @@ class TimeWindowStats(BaseStats):
         )
 
 
-def live_stats_loop():
-    live = LiveStats()
-    config = RconServerSettingsUserConfig.load_from_db()
-    last_loop_session = datetime.datetime(year=2020, month=1, day=1, tzinfo=UTC)
-    last_loop_game = datetime.datetime(year=2020, month=1, day=1, tzinfo=UTC)
-    live_session_sleep_seconds = config.live_stats_refresh_seconds
-    live_game_sleep_seconds = config.live_stats_refresh_seconds
-    logger.debug(f"live_session_sleep_seconds: {live_session_sleep_seconds}")
-    logger.debug(f"live_game_sleep_seconds: {live_game_sleep_seconds}")
-    red = get_redis_client()
-
-    while True:
-        # Keep track of session and game timers seperately
-        last_loop_session_seconds = (
-            datetime.datetime.now(tz=UTC) - last_loop_session
-        ).total_seconds()
-        last_loop_game_seconds = (
-            datetime.datetime.now(tz=UTC) - last_loop_game
-        ).total_seconds()
-
-        if last_loop_session_seconds >= live_session_sleep_seconds:
-            last_loop_session = datetime.datetime.now(tz=UTC)
-            try:
-                live.set_live_stats()
-                logger.debug("Refreshed set_live_stats")
-            except Exception:
-                logger.exception("Error while producing stats")
-
-        if last_loop_game_seconds >= live_game_sleep_seconds:
-            last_loop_game = datetime.datetime.now(tz=UTC)
-            try:
-                snapshot_ts = datetime.datetime.now(tz=UTC).timestamp()
-                stats = current_game_stats()
-                logger.debug("Refreshed current_game_stats")
-                red.set(
-                    "LIVE_GAME_STATS",
-                    pickle.dumps(
-                        {
-                            "snapshot_timestamp": snapshot_ts,
-                            "stats": list[PlayerStatsType](stats.values()),
-                            "refresh_interval_sec": live_game_sleep_seconds,
-                        }
-                    ),
-                )
-            except Exception:
-                logger.exception("Failed to compute live game stats")
-
-        time.sleep(0.1)
-
-
 def current_game_stats():
-    current_map = MapsHistory().get_current_map()
+    maps_history = MapsHistory()
+    current_map = maps_history.get_current_map()
     if not current_map:
         logger.error("Unable to get current game stats [no map information available]")
         return {}
     if current_map["start"] is None:
         logger.error("Unable to get current game stats [missing map start information]")
         return {}
+    maps_history.with_player_stats(current_map)
 
     stats = TimeWindowStats().get_players_stats_from_time(
         current_map["start"], current_map["player_stats"]
@@ -804,7 +751,8 @@ def _apply_current_map_player_stats(
 ) -> None:
     """Override/augment stats using the richer per-unit values stored on map history.
 
-    `player_stats` is `MapsHistory()[0]["player_stats"]` and keys are player IDs.
+    `player_stats` is the current map's, see `MapsHistory.with_player_stats`, and
+    keys are player IDs.
     """
     player_stats = current_map.get("player_stats", {})
     map_layer = parse_layer(current_map["name"])
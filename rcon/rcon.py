@@ -14,6 +14,7 @@ from dateutil import parser
 
 import rcon.settings
 import rcon.steam_utils
+from rcon.cache_codecs import CompressedCodec, PickleCodec
 from rcon.cache_utils import get_redis_client, invalidates, ttl_cache
 from rcon.commands import (
     HLLCommandFailedError,
@@ -23,6 +24,7 @@ from rcon.commands import (
     VipId,
 )
 from rcon.connection import HLLCommandError
+from rcon.logs import parser as log_parser
 from rcon.maps import UNKNOWN_MAP_NAME, Layer, is_server_loading_map
 from rcon.models import GameLayout, PlayerID, PlayerVIP, enter_session
 from rcon.perf_statistics import PerformanceStatistics
@@ -50,7 +52,7 @@ from rcon.types import (
     SlotsType,
     StatusType,
     StructuredLogLineType,
-    StructuredLogLineWithMetaData,
+    StructuredLogLineWithMetaData,  # noqa: F401 re-exported for rcon.hooks
     VipIdType,
 )
 from rcon.user_config.rcon_connection_settings import RconConnectionSettingsUserConfig
@@ -191,32 +193,22 @@ class Rcon(ServerCtl):
     )
     MAX_SERV_NAME_LEN = 1024  # I totally made up that number. Unable to test
     map_regexp = re.compile(r"^(\w+_?)+$")
-    chat_regexp = re.compile(r"CHAT\[(Team|Unit)\]\[(.*)\((Allies|Axis)/(.*)\)\]: (.*)")
+    chat_regexp = log_parser.CHAT_PATTERN
     player_info_pattern = r"(.*)\(((Allies)|(Axis))/(\d+)\)"
     player_info_regexp = re.compile(r"(.*)\(((Allies)|(Axis))/(\d+)\)")
     log_time_regexp = re.compile(r".*\((\d+)\).*")
-    connect_disconnect_pattern = re.compile(r"(.+) \((.*)\)")
-    kill_teamkill_pattern = re.compile(
-        r"(.*)\((?:Allies|Axis)\/(.*)\) -> (.*)\((?:Allies|Axis)\/(.*)\) with (.*)"
-    )
-    camera_pattern = re.compile(r"\[(.*) \((.*)\)\] (.*)")
-    teamswitch_pattern = re.compile(r"TEAMSWITCH\s(.*)\s\((.*\s>\s.*)\)")
-    kick_ban_pattern = re.compile(
-        r"(KICK|BAN): \[(.*)\] (.*\[(KICKED|BANNED|PERMANENTLY|YOU|Host|Anti-Cheat|[^\]]*)[^\]]*)(?:\])*"
-    )
-    vote_pattern = re.compile(
-        r"VOTESYS: Player \[(.*)\] voted \[.*\] for VoteID\[\d+\]"
-    )
-    vote_started_pattern = re.compile(
-        r"VOTESYS: Player \[(.*)\] Started a vote of type \(.*\) against \[(.*)\]. VoteID: \[\d+\]"
-    )
-    vote_complete_pattern = re.compile(r"VOTESYS: Vote \[\d+\] completed. Result: (.*)")
-    vote_expired_pattern = re.compile(r"VOTESYS: Vote \[\d+\] (expired|prematurely)")
-    vote_passed_pattern = re.compile(r"VOTESYS: (Vote Kick \{(.*)\} .*\[(.*)\])")
-    # Need the DOTALL flag to allow `.` to capture newlines in multi line messages
-    message_pattern = re.compile(
-        r"MESSAGE: player \[(.+)\((.*)\)\], content \[(.+)\]", re.DOTALL
-    )
+    # The log patterns live in rcon.logs.parser
+    connect_disconnect_pattern = log_parser.CONNECT_DISCONNECT_PATTERN
+    kill_teamkill_pattern = log_parser.KILL_TEAMKILL_PATTERN
+    camera_pattern = log_parser.CAMERA_PATTERN
+    teamswitch_pattern = log_parser.TEAMSWITCH_PATTERN
+    kick_ban_pattern = log_parser.KICK_BAN_PATTERN
+    vote_pattern = log_parser.VOTE_PATTERN
+    vote_started_pattern = log_parser.VOTE_STARTED_PATTERN
+    vote_complete_pattern = log_parser.VOTE_COMPLETE_PATTERN
+    vote_expired_pattern = log_parser.VOTE_EXPIRED_PATTERN
+    vote_passed_pattern = log_parser.VOTE_PASSED_PATTERN
+    message_pattern = log_parser.MESSAGE_PATTERN
 
     def __init__(self, *args, pool_size: bool | None = None, **kwargs):
         environment_info = ServerInfo.from_env()
@@ -244,6 +236,7 @@ class Rcon(ServerCtl):
             perf_stats=PerformanceStatistics(
                 "rcon", config.performance_statistics_enabled
             ),
+            multiplexed_connections=config.multiplexed_connections,
         )
         if pool_size is not None:
             self.pool_size = pool_size
@@ -287,18 +280,25 @@ class Rcon(ServerCtl):
 
     # TODO
     # When returns value from the cache it is always {}
-    @ttl_cache(ttl=5)
+    @ttl_cache(ttl=5, local_ttl=1, stale_ttl=10, codec=CompressedCodec(PickleCodec()))
     def get_players(self) -> list[GetPlayersType]:
+        # Both lists are requested back to back so we only wait on one round trip
+        players_response, vips_response = self.exchange_many(
+            [
+                ("GetServerInformation", 2, {"Name": "players", "Value": ""}),
+                ("GetServerInformation", 2, {"Name": "vipplayers", "Value": ""}),
+            ]
+        )
         player_ids = {
-            player_id: {NAME: name, PLAYER_ID: player_id}
-            for name, player_id in self.get_player_ids()
+            p["iD"]: {NAME: p["name"], PLAYER_ID: p["iD"]}
+            for p in players_response.content_dict["players"]
         }
         # can't pickle dict keys object
         steam_profiles = rcon.steam_utils.get_steam_profiles_mult_players(
             steam_id_64s=[k for k in player_ids]
         )
 
-        vip_player_ids = {v[PLAYER_ID] for v in super().get_vip_ids()}
+        vip_player_ids = {v["iD"] for v in vips_response.content_dict["vipPlayers"]}
         profiles = {
             p[PLAYER_ID]: p
             for p in get_profiles([player_id for player_id in player_ids])
@@ -364,7 +364,13 @@ class Rcon(ServerCtl):
             "fail_count": fail_count,
         }
 
-    @ttl_cache(ttl=2, cache_falsy=False)
+    @ttl_cache(
+        ttl=2,
+        cache_falsy=False,
+        local_ttl=1,
+        stale_ttl=5,
+        codec=CompressedCodec(PickleCodec()),
+    )
     def get_team_view(self):
         teams = {}
         detailed_players = self.get_detailed_players()
@@ -429,7 +435,7 @@ class Rcon(ServerCtl):
 
         return dict(fail_count=fail_count, **game)
 
-    @ttl_cache(ttl=1)
+    @ttl_cache(ttl=1, hashed_keys=True)
     def get_structured_logs(
         self,
         since_min_ago: int,
@@ -444,7 +450,7 @@ class Rcon(ServerCtl):
         return super().get_admin_groups()
 
     def get_logs(
-        self, since_min_ago: int, filter_: str = "", by: str = ""
+        self, since_min_ago: int | float, filter_: str = "", by: str = ""
     ) -> list[str]:
         """Returns raw text logs from the game server with no parsing performed
 
@@ -540,7 +546,7 @@ class Rcon(ServerCtl):
             "steam_bans": profile.get("bans") if profile else None,
         }
 
-    @ttl_cache(ttl=2, cache_falsy=False)
+    @ttl_cache(ttl=2, cache_falsy=False, hashed_keys=True)
     def get_detailed_player_info(
         self, player_id: str, player: GetPlayersType | None = None
     ) -> GetDetailedPlayer:
@@ -802,7 +808,7 @@ class Rcon(ServerCtl):
             )
         return res
 
-    @ttl_cache(ttl=2, cache_falsy=False)
+    @ttl_cache(ttl=2, cache_falsy=False, local_ttl=1)
     def get_gamestate(self) -> GameStateType:
         """
         Returns player counts, team scores, remaining match time and current/next map
@@ -996,12 +1002,12 @@ class Rcon(ServerCtl):
         super().set_broadcast(formatted)
         return prev.decode() if prev else ""
 
-    @ttl_cache(ttl=5)
+    @ttl_cache(ttl=5, local_ttl=1)
     def get_slots(self) -> SlotsType:
         """Return the current number of connected players and max players allowed"""
         return super().get_slots()
 
-    @ttl_cache(ttl=5, cache_falsy=False)
+    @ttl_cache(ttl=5, cache_falsy=False, local_ttl=1)
     def get_status(self) -> StatusType:
         config = RconServerSettingsUserConfig.load_from_db()
         slots = self.get_slots()
@@ -1404,163 +1410,12 @@ class Rcon(ServerCtl):
     @staticmethod
     def parse_log_line(raw_line: str) -> StructuredLogLineType:
         """Parse a single raw RCON log event or raise a ValueError"""
-
-        player: str | None = None
-        player2: str | None = None
-        player_id_1: str | None = None
-        player_id_2: str | None = None
-        weapon: str | None = None
-        action: str | None = None
-        content: str = raw_line
-        sub_content: str | None = None
-
-        if raw_line.startswith(("KILL", "TEAM KILL")):
-            # KILL: Muctar(Axis/71234567891234567) -> Chris(Allies/71234567891234576) with GEWEHR 43
-            # TEAM KILL: SonofJack(Allies/71234567891234567) -> Joseph Cannon(Allies/71234567891234576) with M1 GARAND
-            action, content = raw_line.split(": ", 1)
-            if match := re.match(Rcon.kill_teamkill_pattern, content):
-                player, player_id_1, player2, player_id_2, weapon = match.groups()
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-        elif raw_line.startswith(("DISCONNECTED", "CONNECTED")):
-            action, name_and_player_id = raw_line.split(" ", 1)
-            if match := re.match(Rcon.connect_disconnect_pattern, name_and_player_id):
-                player, player_id_1 = match.groups()
-                content = name_and_player_id
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-        elif raw_line.startswith("CHAT"):
-            # CHAT[Team][Azure(Allies/71234567891234567)]: supply truck bot hq for nodes
-            # CHAT[Unit][dominguez1987(Axis/71234567891234567)]: back
-            if match := Rcon.chat_regexp.match(raw_line):
-                scope, player, side, player_id_1, sub_content = match.groups()
-                action = f"CHAT[{side}][{scope}]"
-                content = f"{player}: {sub_content} ({player_id_1})"
-        elif raw_line.upper().startswith("TEAMSWITCH"):
-            # TEAMSWITCH Plebs_23 (Axis > None)
-            # TEAMSWITCH SupremeOneechan (None > Allies)
-            action = "TEAMSWITCH"
-            if match := re.match(Rcon.teamswitch_pattern, raw_line):
-                player, sub_content = match.groups()
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-        elif raw_line.startswith(("KICK", "BAN")):
-            if match := re.match(Rcon.kick_ban_pattern, raw_line):
-                _action, player, sub_content, type_ = match.groups()
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-
-            if type_ == "PERMANENTLY":
-                type_ = "PERMA BANNED"
-            elif type_ == "YOU":
-                type_ = "IDLE"
-            elif type_ == "Host":
-                type_ = ""
-            elif type_ == "Anti-Cheat":
-                type_ = "ANTI-CHEAT"
-            elif type_ == "KICKED":
-                type_ = "KICKED"
-            elif type_ == "BANNED":
-                type_ = "BANNED"
-            else:
-                type_ = "MISC"
-
-            action = f"ADMIN {type_}".strip()
-
-            if "FOR TEAM KILLING" in raw_line:
-                action = f"TK AUTO {type_}"
-
-            # Reconstruct the log line without the newlines and tack on the trailing ] we lose
-            content = f"{_action}: [{player}] {sub_content}"
-            if content[-1] != "]":
-                content += "]"
-                sub_content = sub_content + "]" if sub_content else ""
-        elif raw_line.startswith("VOTE"):
-            action = "VOTE"
-
-            _, sub_content = raw_line.split("VOTESYS: ", 1)
-            content = sub_content
-
-            # VOTESYS: Player [Dingbat252] voted [PV_Favour] for VoteID[2]
-            if match := re.match(Rcon.vote_pattern, raw_line):
-                player = match.groups()[0]
-            # VOTESYS: Player [NoodleArms] Started a vote of type (PVR_Kick_Abuse) against [buscÃ´O-sensei]. VoteID: [2]
-            elif match := re.match(
-                Rcon.vote_started_pattern,
-                raw_line,
-            ):
-                action = "VOTE STARTED"
-                player, player2 = match.groups()
-            # VOTESYS: Vote [2] completed. Result: PVR_Passed
-            elif match := re.match(Rcon.vote_complete_pattern, raw_line):
-                action = "VOTE COMPLETED"
-            # VOTESYS: Vote [1] expired before completion.
-            elif match := re.match(Rcon.vote_expired_pattern, raw_line):
-                action = "VOTE EXPIRED"
-            # VOTESYS: Vote Kick {buscÃ´O-sensei} successfully passed. [For: 2/1 - Against: 0]
-            elif match := re.match(Rcon.vote_passed_pattern, raw_line):
-                action = "VOTE PASSED"
-                content, player, sub_content = match.groups()
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-
-        elif raw_line.upper().startswith("PLAYER"):
-            # Player [Fachi (71234567891234567)] Entered Admin Camera
-            action = "CAMERA"
-            _, content = raw_line.split(" ", 1)
-
-            if match := re.match(Rcon.camera_pattern, content):
-                player, player_id_1, sub_content = match.groups()
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-
-        elif raw_line.upper().startswith("MATCH START"):
-            # MATCH START UTAH BEACH WARFARE
-            action = "MATCH START"
-            _, sub_content = raw_line.split("MATCH START ")
-            content = raw_line
-        elif raw_line.upper().startswith("MATCH ENDED"):
-            # MATCH ENDED `Kharkov WARFARE` ALLIED (0 - 5) AXIS
-            action = "MATCH ENDED"
-            _, sub_content = raw_line.split("MATCH ENDED ")
-        elif raw_line.upper().startswith("MESSAGE"):
-            action = "MESSAGE"
-            raw_line = raw_line.replace("\n", " ")
-            content = raw_line
-            if match := re.match(Rcon.message_pattern, raw_line):
-                player, player_id_1, message_content = match.groups()
-                content = f"{player}({player_id_1}): {message_content}"
-                sub_content = message_content
-            else:
-                raise ValueError(f"Unable to parse line: {raw_line}")
-
-        if action is None:
-            raise ValueError(f"Unknown type line: '{raw_line}'")
-
-        return {
-            "action": action,
-            "player_name_1": player,
-            "player_id_1": player_id_1,
-            "player_name_2": player2,
-            "player_id_2": player_id_2,
-            "weapon": weapon,
-            "message": content,
-            "sub_content": sub_content,
-        }
+        return log_parser.parse_log_line(raw_line)
 
     @staticmethod
     def split_raw_log_lines(raw_logs: list[str]) -> Iterable[tuple[str, str, str]]:
         """Split raw game server logs into the relative time, timestamp and content"""
-        for raw_log in raw_logs:
-            log = re.match(
-                r"^(\[.+? \((\d+)\)\]) ([\w\W]*)$", raw_log, flags=re.MULTILINE
-            )
-            if log is None:
-                logger.error(f"Unable to parse log line: '{raw_log}'")
-                continue
-
-            (raw_relative_time, raw_timestamp, raw_log_line) = log.groups()
-            yield raw_relative_time, raw_timestamp, raw_log_line.strip()
+        return log_parser.split_raw_log_lines(raw_logs)
 
     @staticmethod
     def parse_logs(
@@ -1569,66 +1424,12 @@ class Rcon(ServerCtl):
         filter_player: str | None = None,
     ) -> ParsedLogsType:
         """Parse a chunk of raw gameserver RCON logs"""
-        synthetic_actions = LOG_ACTIONS
-        now = datetime.now(tz=UTC)
-        parsed_log_lines: list[StructuredLogLineWithMetaData] = []
-        actions: set[str] = set()
-        players: set[str] = set()
-
-        for raw_relative_time, raw_timestamp, raw_log_line in Rcon.split_raw_log_lines(
-            raw_logs
-        ):
-            time = Rcon._extract_time(raw_timestamp)
-            try:
-                log_line = Rcon.parse_log_line(raw_log_line)
-
-                if filter_action and not log_line["action"].startswith(filter_action):
-                    continue
-
-                if filter_player and filter_player not in raw_log_line:
-                    continue
-
-                parsed_log_lines.append(
-                    {
-                        "version": 1,
-                        "timestamp_ms": int(time.timestamp() * 1000),
-                        "event_time": datetime.fromtimestamp(
-                            int(raw_timestamp), tz=UTC
-                        ),
-                        "relative_time_ms": (time - now).total_seconds() * 1000,
-                        "raw": raw_relative_time + " " + raw_log_line,
-                        "line_without_time": raw_log_line,
-                        "action": log_line["action"],
-                        "player_name_1": log_line["player_name_1"],
-                        "player_id_1": log_line["player_id_1"],
-                        "player_name_2": log_line["player_name_2"],
-                        "player_id_2": log_line["player_id_2"],
-                        "weapon": log_line["weapon"],
-                        "message": log_line["message"],
-                        "sub_content": log_line["sub_content"],
-                    }
-                )
-            except ValueError:
-                logger.error(
-                    f"Unable to parse line: '{raw_relative_time} {raw_timestamp} {raw_log_line}'"
-                )
-                continue
-
-            if player := log_line["player_name_1"]:
-                players.add(player)
-
-            if player2 := log_line["player_name_2"]:
-                players.add(player2)
-
-            actions.add(log_line["action"])
-
-        parsed_log_lines.reverse()
-
-        return {
-            "actions": list(actions | set(synthetic_actions)),
-            "players": list(players),
-            "logs": parsed_log_lines,
-        }
+        return log_parser.parse_logs(
+            raw_logs,
+            filter_action=filter_action,
+            filter_player=filter_player,
+            synthetic_actions=LOG_ACTIONS,
+        )
 
 
 class HLLRcon(Rcon, HLLServerCtl):
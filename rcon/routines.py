@@ -46,6 +46,9 @@ def dump_rcon_performance_stats():
     d = pl.dump()
     for k, v in d.items():
         logger.info(f"{k}: {v}")
+    # Recorded by the log loop, see rcon.logs.hook_executor
+    for k, v in PerformanceStatistics("log_hooks", True).dump().items():
+        logger.info(f"log_hooks::{k}: {v}")
 
 
 def run():
@@ -0,0 +1,345 @@
+"""Continuously refresh steam profiles/bans, most recently active players first
+
+`enrich_db_users` refreshes every outdated player in one daily burst, which
+spends most of its steam API calls on players that haven't played in years
+while online players' VAC/game bans can be almost a month old.
+
+This service instead spreads a daily API budget evenly over the day and
+spends it in priority order: online players, then players by how recently
+they were last seen. Players that haven't been seen for a long time are
+skipped entirely.
+"""
+
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from datetime import UTC, timedelta
+
+import orjson
+import redis
+import redis.exceptions
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, joinedload
+
+from rcon.cache_utils import get_redis_client
+from rcon.models import PlayerID, PlayerSession, SteamInfo, enter_session
+from rcon.steam_utils import (
+    STEAM_API_MAX_STEAM_IDS,
+    get_steam_api_calls_per_day,
+    update_db_player_info,
+)
+from rcon.user_config.steam import SteamUserConfig
+
+logger = logging.getLogger(__name__)
+
+STEAM_REFRESH_METRICS_KEY = "steam_refresh_metrics"
+# A batch of up to 100 players costs one profile and one ban API call
+API_CALLS_PER_BATCH = 2
+TICK_SECONDS = 30
+METRICS_INTERVAL_SECONDS = 60 * 10
+
+
+@dataclass(frozen=True)
+class RefreshTier:
+    name: str
+    # Players last seen within this window belong to this tier, None is
+    # reserved for the players currently on the server
+    last_seen_within: timedelta | None
+    # How old a player's steam info may get before it is refreshed
+    max_age: timedelta
+
+
+ONLINE_TIER = RefreshTier("online", None, timedelta(days=1))
+
+
+def get_refresh_tiers(dormant_after_days: int) -> list[RefreshTier]:
+    """Return the tiers in the order they should be refreshed"""
+    dormant_after = timedelta(days=dormant_after_days)
+    tiers = [
+        ONLINE_TIER,
+        RefreshTier("active", timedelta(days=7), timedelta(days=3)),
+        RefreshTier("recent", timedelta(days=30), timedelta(days=14)),
+        RefreshTier("occasional", dormant_after, timedelta(days=30)),
+    ]
+    # Drop the tiers made redundant by a short dormancy window
+    return [
+        tier
+        for tier in tiers
+        if tier.last_seen_within is None or tier.last_seen_within <= dormant_after
+    ]
+
+
+def _last_seen_subquery():
+    return (
+        select(
+            PlayerSession.player_id_id.label("player_id_id"),
+            func.max(
+                func.coalesce(
+                    PlayerSession.end, PlayerSession.start, PlayerSession.created
+                )
+            ).label("last_seen"),
+        )
+        .group_by(PlayerSession.player_id_id)
+        .subquery()
+    )
+
+
+def _is_stale(now: datetime.datetime, tier: RefreshTier):
+    return or_(
+        SteamInfo.id.is_(None),
+        SteamInfo.updated.is_(None),
+        SteamInfo.updated <= now - tier.max_age,
+    )
+
+
+def _tier_filter(
+    tier: RefreshTier,
+    now: datetime.datetime,
+    last_seen,
+    online_player_ids: list[str],
+    newer_tier: RefreshTier | None,
+):
+    if tier.last_seen_within is None:
+        return PlayerID.player_id.in_(online_player_ids)
+
+    conditions = [
+        last_seen.c.last_seen >= now - tier.last_seen_within,
+        PlayerID.player_id.notin_(online_player_ids),
+    ]
+    if newer_tier is not None and newer_tier.last_seen_within is not None:
+        conditions.append(last_seen.c.last_seen < now - newer_tier.last_seen_within)
+    return and_(*conditions)
+
+
+def select_stale_players(
+    sess: Session,
+    tiers: list[RefreshTier],
+    online_player_ids: list[str],
+    limit: int,
+    now: datetime.datetime | None = None,
+) -> list[tuple[RefreshTier, PlayerID]]:
+    """Pick up to `limit` players whose steam info is outdated for their tier
+
+    Higher priority tiers are exhausted first, and the oldest information is
+    refreshed first within a tier.
+    """
+    if now is None:
+        now = datetime.datetime.now(tz=UTC)
+
+    last_seen = _last_seen_subquery()
+    selected: list[tuple[RefreshTier, PlayerID]] = []
+    previous_tier: RefreshTier | None = None
+    for tier in tiers:
+        remaining = limit - len(selected)
+        if remaining <= 0:
+            break
+        if tier.last_seen_within is None and not online_player_ids:
+            previous_tier = tier
+            continue
+
+        stmt = (
+            select(PlayerID)
+            .options(joinedload(PlayerID.steaminfo))
+            .outerjoin(SteamInfo)
+            .outerjoin(last_seen, last_seen.c.player_id_id == PlayerID.id)
+            .where(func.length(PlayerID.player_id) == 17)
+            .where(_tier_filter(tier, now, last_seen, online_player_ids, previous_tier))
+            .where(_is_stale(now, tier))
+            .order_by(SteamInfo.updated.asc().nullsfirst())
+            .limit(remaining)
+        )
+        selected.extend((tier, player) for player in sess.scalars(stmt).unique())
+        previous_tier = tier
+
+    return selected
+
+
+def get_freshness_by_tier(
+    sess: Session,
+    tiers: list[RefreshTier],
+    online_player_ids: list[str],
+    now: datetime.datetime | None = None,
+) -> dict[str, dict[str, int | float | None]]:
+    """Count players and how up to date their steam info is, for each tier"""
+    if now is None:
+        now = datetime.datetime.now(tz=UTC)
+
+    last_seen = _last_seen_subquery()
+    metrics: dict[str, dict[str, int | float | None]] = {}
+    previous_tier: RefreshTier | None = None
+    for tier in tiers:
+        stmt = (
+            select(
+                func.count(PlayerID.id),
+                func.count(PlayerID.id).filter(_is_stale(now, tier)),
+                func.min(SteamInfo.updated),
+            )
+            .select_from(PlayerID)
+            .outerjoin(SteamInfo)
+            .outerjoin(last_seen, last_seen.c.player_id_id == PlayerID.id)
+            .where(func.length(PlayerID.player_id) == 17)
+            .where(_tier_filter(tier, now, last_seen, online_player_ids, previous_tier))
+        )
+        total, stale, oldest = sess.execute(stmt).one()
+        metrics[tier.name] = {
+            "players": total,
+            "stale": stale,
+            "fresh_ratio": round((total - stale) / total, 4) if total else None,
+            "oldest_age_hours": (
+                round((now - oldest).total_seconds() / 3600, 1) if oldest else None
+            ),
+            "max_age_hours": tier.max_age.total_seconds() / 3600,
+        }
+        previous_tier = tier
+
+    return metrics
+
+
+def get_online_player_ids() -> list[str]:
+    # Imported here, the RCON module depends on the steam utilities
+    from rcon.rcon import get_rcon
+
+    try:
+        return [player_id for _, player_id in get_rcon().get_player_ids()]
+    except Exception:
+        logger.exception("Unable to fetch online players, skipping the online tier")
+        return []
+
+
+class SteamRefreshScheduler:
+    """Refresh steam info continuously under a daily API budget
+
+    API calls are rationed with a token bucket that fills at
+    `daily_api_budget / 24h`, so the budget is spent evenly over the day
+    instead of in a single burst.
+    """
+
+    def __init__(
+        self,
+        red: redis.Redis | None = None,
+        tick_seconds: float = TICK_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.red = red or get_redis_client()
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self.tokens = 0.0
+        self.last_fill = clock()
+        self.last_metrics = 0.0
+
+    def fill_tokens(self, daily_api_budget: int) -> None:
+        now = self.clock()
+        rate = daily_api_budget / (24 * 60 * 60)
+        # Never let more than a couple of batches worth of calls pile up
+        capacity = max(API_CALLS_PER_BATCH * 2, rate * self.tick_seconds)
+        self.tokens = min(capacity, self.tokens + (now - self.last_fill) * rate)
+        self.last_fill = now
+
+    def batches_available(self) -> int:
+        return int(self.tokens // API_CALLS_PER_BATCH)
+
+    def tick(self, config: SteamUserConfig) -> int:
+        """Refresh as many outdated players as the budget allows, returns the count"""
+        self.fill_tokens(config.refresh_daily_api_budget)
+        batches = self.batches_available()
+        if not batches:
+            return 0
+
+        tiers = get_refresh_tiers(config.refresh_dormant_after_days)
+        online_player_ids = get_online_player_ids()
+        refreshed = 0
+        with enter_session() as sess:
+            selected = select_stale_players(
+                sess,
+                tiers,
+                online_player_ids,
+                limit=batches * STEAM_API_MAX_STEAM_IDS,
+            )
+            for start in range(0, len(selected), STEAM_API_MAX_STEAM_IDS):
+                chunk = selected[start : start + STEAM_API_MAX_STEAM_IDS]
+                players = [player for _, player in chunk]
+                self.tokens -= API_CALLS_PER_BATCH
+                num_profiles, num_bans = update_db_player_info(sess, players=players)
+                if not num_profiles and not num_bans:
+                    # Most likely an API error, try these players again later
+                    logger.warning(
+                        "No steam info returned for %s players", len(players)
+                    )
+                    break
+                self.mark_checked(sess, players)
+                refreshed += len(players)
+                logger.info(
+                    "Refreshed steam info for %s players (%s)",
+                    len(players),
+                    ", ".join(sorted({tier.name for tier, _ in chunk})),
+                )
+
+        return refreshed
+
+    @staticmethod
+    def mark_checked(sess: Session, players: list[PlayerID]) -> None:
+        """Record when players were last checked, even if steam had nothing new
+
+        Otherwise deleted or unreachable profiles would stay at the head of the
+        queue and be retried on every tick.
+        """
+        now = datetime.datetime.now(tz=UTC)
+        for player in players:
+            if player.steaminfo is None:
+                player.steaminfo = SteamInfo(player=player)
+                sess.add(player.steaminfo)
+            player.steaminfo.updated = now
+
+    def publish_metrics(self, config: SteamUserConfig) -> dict:
+        tiers = get_refresh_tiers(config.refresh_dormant_after_days)
+        with enter_session() as sess:
+            freshness = get_freshness_by_tier(sess, tiers, get_online_player_ids())
+        metrics = {
+            "freshness": freshness,
+            "api_calls_per_day": get_steam_api_calls_per_day(),
+            "daily_api_budget": config.refresh_daily_api_budget,
+        }
+        try:
+            self.red.set(STEAM_REFRESH_METRICS_KEY, orjson.dumps(metrics))
+        except redis.exceptions.RedisError:
+            logger.exception("Unable to store steam refresh metrics")
+        for tier_name, values in freshness.items():
+            logger.info("Steam info freshness for %s players: %s", tier_name, values)
+        return metrics
+
+    def run(self):
+        while True:
+            config = SteamUserConfig.load_from_db()
+            if config.refresh_enabled and config.api_key:
+                try:
+                    self.tick(config)
+                except Exception:
+                    logger.exception("Steam refresh failed")
+
+                if self.clock() - self.last_metrics >= METRICS_INTERVAL_SECONDS:
+                    try:
+                        self.publish_metrics(config)
+                    except Exception:
+                        logger.exception("Unable to compute steam refresh metrics")
+                    self.last_metrics = self.clock()
+            else:
+                # Don't accumulate a burst of calls while disabled
+                self.tokens = 0.0
+                self.last_fill = self.clock()
+
+            time.sleep(self.tick_seconds)
+
+
+def get_steam_refresh_metrics(red: redis.Redis | None = None) -> dict | None:
+    """Return the last metrics published by the refresh service"""
+    raw = (red or get_redis_client()).get(STEAM_REFRESH_METRICS_KEY)
+    return orjson.loads(raw) if raw else None
+
+
+def run():
+    SteamRefreshScheduler().run()
+
+
+if __name__ == "__main__":
+    run()
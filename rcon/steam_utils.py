@@ -7,6 +7,7 @@ from datetime import UTC
 from functools import wraps
 from typing import Any
 
+import redis.exceptions
 import steam.exceptions
 from sqlalchemy import or_, select
 from sqlalchemy.dialects.postgresql import JSONB
@@ -14,7 +15,7 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.sql.expression import func
 from steam.webapi import WebAPI
 
-from rcon.cache_utils import ttl_cache
+from rcon.cache_utils import get_redis_client, ttl_cache
 from rcon.models import PlayerID, SteamInfo, enter_session
 from rcon.types import SteamBansType, SteamInfoType, SteamPlayerSummaryType
 from rcon.user_config.steam import SteamUserConfig
@@ -25,6 +26,8 @@ last_steam_api_key_warning = datetime.datetime.now(tz=UTC)
 
 STEAM_API_MAX_STEAM_IDS = 100
 STEAM_API_TIMEOUT_SECONDS = 10
+STEAM_API_CALLS_KEY = "steam_api_calls"
+STEAM_API_CALLS_RETENTION_DAYS = 30
 
 STEAM_API: WebAPI | None = None
 
@@ -55,6 +58,32 @@ def get_steam_api_key() -> str | None:
     return config.api_key
 
 
+def _steam_api_calls_key(day: datetime.date) -> str:
+    return f"{STEAM_API_CALLS_KEY}:{day.isoformat()}"
+
+
+def record_steam_api_calls(count: int = 1) -> None:
+    """Count steam API calls per (UTC) day, this is only used for metrics"""
+    key = _steam_api_calls_key(datetime.datetime.now(tz=UTC).date())
+    try:
+        with get_redis_client().pipeline() as pipe:
+            pipe.incrby(key, count)
+            pipe.expire(key, STEAM_API_CALLS_RETENTION_DAYS * 24 * 60 * 60)
+            pipe.execute()
+    except redis.exceptions.RedisError:
+        logger.exception("Unable to record steam API calls")
+
+
+def get_steam_api_calls_per_day(days: int = 7) -> dict[str, int]:
+    """Return the number of steam API calls made for each of the last `days` days"""
+    today = datetime.datetime.now(tz=UTC).date()
+    dates = [today - datetime.timedelta(days=offset) for offset in range(days)]
+    values = get_redis_client().mget([_steam_api_calls_key(day) for day in dates])
+    return {
+        day.isoformat(): int(value) if value else 0 for day, value in zip(dates, values)
+    }
+
+
 def is_steam_id_64(player_id: str) -> bool:
     """Test if an ID is a steam_id_64 or a windows store ID"""
     return len(player_id) == 17 and player_id.isdigit()
@@ -148,6 +177,7 @@ def fetch_steam_player_summary_mult_players(
             try:
                 logger.info("Fetching player summaries for %s steam IDs", len(chunk))
                 started = time.perf_counter()
+                record_steam_api_calls()
                 try:
                     raw_result = api.ISteamUser.GetPlayerSummaries(
                         steamids=chunk_steam_ids
@@ -198,6 +228,7 @@ def fetch_steam_bans_mult_players(
                 chunk_steam_ids = ",".join(chunk)
                 logger.info("Fetching player bans for %s steam IDs", len(chunk))
                 started = time.perf_counter()
+                record_steam_api_calls()
                 try:
                     raw_result = api.ISteamUser.GetPlayerBans(  # type: ignore
                         steamids=chunk_steam_ids
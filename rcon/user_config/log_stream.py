@@ -20,6 +20,8 @@ class LogStreamUserConfig(BaseUserConfig):
     stream_size: int = Field(ge=1, le=100_000, default=1000)
     startup_since_mins: int = Field(default=2)
     refresh_frequency_sec: int = Field(default=1)
+    # Ignored since the stream reads new lines from the log bus, kept so
+    # saved configs still validate
     refresh_since_mins: int = Field(default=2)
 
     @staticmethod
@@ -9,6 +9,7 @@ class RconConnectionSettingsType(TypedDict):
     thread_pool_size: int
     performance_statistics_enabled: bool
     performance_statistics_interval_seconds: int
+    multiplexed_connections: int
 
 
 class RconConnectionSettingsUserConfig(BaseUserConfig):
@@ -19,6 +20,9 @@ class RconConnectionSettingsUserConfig(BaseUserConfig):
     thread_pool_size: int = Field(ge=1, le=100, default=20)
     performance_statistics_enabled: bool = Field(default=False)
     performance_statistics_interval_seconds: int = Field(default=30)
+    # 0 keeps one blocking socket per thread, otherwise every thread shares
+    # this many pipelined sockets
+    multiplexed_connections: int = Field(ge=0, le=10, default=0)
 
     @staticmethod
     def save_to_db(values: RconConnectionSettingsType, dry_run=False):
@@ -34,6 +38,7 @@ class RconConnectionSettingsUserConfig(BaseUserConfig):
             performance_statistics_interval_seconds=values.get(
                 "performance_statistics_interval_seconds"
             ),
+            multiplexed_connections=values.get("multiplexed_connections"),
         )
 
         if not dry_run:
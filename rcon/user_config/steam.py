@@ -1,16 +1,28 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
+
+from pydantic import Field
 
 from rcon.user_config.utils import BaseUserConfig, key_check, set_user_config
 
 
 class SteamType(TypedDict):
     api_key: str | None
+    refresh_enabled: NotRequired[bool]
+    refresh_daily_api_budget: NotRequired[int]
+    refresh_dormant_after_days: NotRequired[int]
 
 
 class SteamUserConfig(BaseUserConfig):
     NAME = "SteamUserConfig"
 
     api_key: str | None = None
+    # Continuously refresh steam profiles/bans, most recently active players first
+    refresh_enabled: bool = Field(default=True)
+    # Steam API calls the refresh service may make per day, each batch of up to
+    # 100 players costs 2 calls (profiles and bans)
+    refresh_daily_api_budget: int = Field(ge=2, le=100_000, default=5_000)
+    # Players that haven't been seen on the server for this long are not refreshed
+    refresh_dormant_after_days: int = Field(ge=1, default=180)
 
     @staticmethod
     def save_to_db(values: SteamType, dry_run=False):
@@ -18,7 +30,17 @@ class SteamUserConfig(BaseUserConfig):
             SteamType.__required_keys__, SteamType.__optional_keys__, values.keys()
         )
 
-        validated_conf = SteamUserConfig(api_key=values.get("api_key"))
+        defaults = SteamUserConfig()
+        validated_conf = SteamUserConfig(
+            api_key=values.get("api_key"),
+            refresh_enabled=values.get("refresh_enabled", defaults.refresh_enabled),
+            refresh_daily_api_budget=values.get(
+                "refresh_daily_api_budget", defaults.refresh_daily_api_budget
+            ),
+            refresh_dormant_after_days=values.get(
+                "refresh_dormant_after_days", defaults.refresh_dormant_after_days
+            ),
+        )
 
         if not dry_run:
             set_user_config(SteamUserConfig.NAME, validated_conf)
@@ -2,16 +2,25 @@ import enum
 import logging
 import os
 import re
+import threading
+import time
 from collections.abc import Iterable
 from contextlib import contextmanager
 from contextvars import ContextVar
 from typing import Any, ClassVar, Self
 
 import pydantic
+import redis
+import redis.exceptions
 from pydantic import ValidationInfo
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from rcon.cache_utils import (
+    get_redis_client,
+    publish_invalidation,
+    register_local_cache,
+)
 from rcon.game import get_game_profile
 from rcon.game.base import GameProfile
 from rcon.models import UserConfig, enter_session
@@ -23,6 +32,12 @@ USER_CONFIG_KEY_FORMAT = "{server}_{cls_name}"
 USER_CONFIG_IDENTITY_FORMAT = "{game}_{server}_{name}"
 DISCORD_AUDIT_FORMAT = "changed values: `{differences}`"
 
+# Validated user configs are kept in-process, see `UserConfigCache`
+USER_CONFIG_CACHE_PREFIX = "user_config"
+USER_CONFIG_VERSIONS_KEY = "user_config_versions"
+USER_CONFIG_VERSION_CHECK_SECONDS = 5
+USER_CONFIG_MAX_AGE_SECONDS = 60
+
 GameSelector = GameEnum | GameIntEnum | str | int
 UserConfigScope = tuple[GameIntEnum, int]
 
@@ -237,6 +252,130 @@ class InvalidKeysConfigurationError(Exception):
         }
 
 
+class _CachedUserConfig:
+    __slots__ = ("model", "version", "loaded_at", "checked_at")
+
+    def __init__(self, model: "BaseUserConfig", version: int, loaded_at: float):
+        self.model = model
+        self.version = version
+        self.loaded_at = loaded_at
+        self.checked_at = loaded_at
+
+
+class UserConfigCache:
+    """The validated user configs loaded by this process, by identity
+
+    Saving a config bumps its version in redis and publishes an invalidation
+    (see `bump_user_config_version`), every process drops its copy when it
+    receives it. In case one is missed (e.g. while the listener reconnects),
+    the cached version is also compared with the one in redis every
+    `check_seconds`. A version that couldn't be bumped goes unnoticed, so
+    configs are reloaded after `max_age_seconds` regardless.
+    """
+
+    def __init__(
+        self,
+        check_seconds: float = USER_CONFIG_VERSION_CHECK_SECONDS,
+        red: redis.Redis | None = None,
+        max_age_seconds: float = USER_CONFIG_MAX_AGE_SECONDS,
+    ):
+        self.check_seconds = check_seconds
+        self.max_age_seconds = max_age_seconds
+        self._red = red
+        self._entries: dict[str, _CachedUserConfig] = {}
+        # Bumped on every invalidation, a config loaded while one happened
+        # may be outdated already and isn't cached
+        self._generation = 0
+        self._mu = threading.Lock()
+
+    @property
+    def red(self) -> redis.Redis:
+        if self._red is None:
+            # Shared by every server, one may save the config of another
+            self._red = get_redis_client(global_pool=True)
+        return self._red
+
+    def get(self, cls: type["BaseUserConfig"], identity: str):
+        entry = self._entries.get(identity)
+        if entry is None or type(entry.model) is not cls:
+            return None
+
+        now = time.monotonic()
+        if now - entry.loaded_at >= self.max_age_seconds:
+            self.pop(identity)
+            return None
+        if now - entry.checked_at >= self.check_seconds:
+            if self.version(identity) != entry.version:
+                self.pop(identity)
+                return None
+            entry.checked_at = now
+        return entry.model
+
+    def version(self, identity: str) -> int | None:
+        """The version of the config, None if redis is unavailable"""
+        try:
+            return int(self.red.hget(USER_CONFIG_VERSIONS_KEY, identity) or 0)
+        except (redis.exceptions.RedisError, ValueError):
+            # ValueError: the redis host isn't configured
+            logger.exception("Unable to get the version of %s", identity)
+            return None
+
+    def reserve(self, identity: str) -> tuple[int, int | None]:
+        """Call before loading the config from the database, see `set`"""
+        try:
+            register_local_cache(USER_CONFIG_CACHE_PREFIX, self, self.red)
+        except ValueError:
+            logger.exception("Unable to cache %s", identity)
+            return self._generation, None
+        return self._generation, self.version(identity)
+
+    def set(
+        self,
+        identity: str,
+        model: "BaseUserConfig",
+        reservation: tuple[int, int | None],
+    ) -> None:
+        generation, version = reservation
+        with self._mu:
+            if version is None or generation != self._generation:
+                return
+            self._entries[identity] = _CachedUserConfig(
+                model, version, time.monotonic()
+            )
+
+    def pop(self, identity: str | bytes) -> None:
+        if isinstance(identity, bytes):
+            identity = identity.decode(errors="replace")
+        with self._mu:
+            self._generation += 1
+            self._entries.pop(identity, None)
+
+    def clear(self) -> None:
+        with self._mu:
+            self._generation += 1
+            self._entries.clear()
+
+
+_user_config_cache = UserConfigCache()
+
+
+def bump_user_config_version(identity: str) -> None:
+    """Make every process reload the config, once it's saved
+
+    The config is already saved, if the version can't be bumped the other
+    processes keep their copy until it's `USER_CONFIG_MAX_AGE_SECONDS` old.
+    """
+    _user_config_cache.pop(identity)
+    try:
+        red = _user_config_cache.red
+        red.hincrby(USER_CONFIG_VERSIONS_KEY, identity, 1)
+    except (redis.exceptions.RedisError, ValueError):
+        # ValueError: the redis host isn't configured
+        logger.exception("Unable to bump the version of %s", identity)
+        return
+    publish_invalidation(red, USER_CONFIG_CACHE_PREFIX, identity)
+
+
 class BaseUserConfig(pydantic.BaseModel):
     """The interface UI config settings should adhere to in addition to pydantic.BaseModel"""
 
@@ -250,11 +389,21 @@ class BaseUserConfig(pydantic.BaseModel):
         game: GameSelector | None = None,
         server_number: int | str | None = None,
     ) -> Self:
+        """The validated config, cached until it's saved again
+
+        The instance is shared by every caller of the process, use
+        `model_copy` to get one to modify.
+        """
         # This should never happen in production, but allows tests to run
         if not os.getenv("HLL_DB_URL"):
             logger.warning("HLL_DB_URL not set, returning a default instance")
             return cls()
 
+        identity = cls.identity(game=game, server_number=server_number)
+        if (cached := _user_config_cache.get(cls, identity)) is not None:
+            return cached
+        reservation = _user_config_cache.reserve(identity)
+
         # If the cache is unavailable, it will fall back to creating a default
         # model instance, but will not persist it to the database and overwrite settings
         conf = get_user_config(
@@ -265,17 +414,19 @@ class BaseUserConfig(pydantic.BaseModel):
         )
         if conf is not None:
             try:
-                return cls.model_validate(
+                model = cls.model_validate(
                     conf,
                     context=user_config_validation_context(
                         game=game,
                         server_number=server_number,
                     ),
                 )
+                _user_config_cache.set(identity, model, reservation)
+                return model
             except pydantic.ValidationError as e:
                 if default_on_validation_error:
                     logger.error(
-                        f"Error loading {cls.identity(game=game, server_number=server_number)}, "
+                        f"Error loading {identity}, "
                         "returning defaults, validation errors:"
                     )
                     logger.error(e)
@@ -293,10 +444,7 @@ class BaseUserConfig(pydantic.BaseModel):
             # Now models are only persisted to the database when they're either explicitly seeded
             # during backend startup, or if the `save_to_db` method is explicitly called, for
             # instance through the API, or CLI
-            logger.error(
-                "%s not found, returning defaults",
-                cls.identity(game=game, server_number=server_number),
-            )
+            logger.error("%s not found, returning defaults", identity)
 
         return cls()
 
@@ -422,6 +570,11 @@ def _remove_conf(
         )
         sess.delete(conf)
         sess.commit()
+        bump_user_config_version(
+            USER_CONFIG_IDENTITY_FORMAT.format(
+                game=conf.game, server=conf.server_number, name=conf.name
+            )
+        )
 
 
 def _set_default(
@@ -484,6 +637,7 @@ def set_user_config(
             )
         else:
             conf.value = object_
+    bump_user_config_version(identity)
 
 
 def validate_user_config(
@@ -2,7 +2,7 @@ import inspect
 import logging
 import os
 import secrets
-from collections.abc import Callable, Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from datetime import UTC, datetime, timedelta
 from itertools import islice
 from typing import (
@@ -19,6 +19,8 @@ import redis.exceptions
 from rcon.cache_utils import get_redis_pool
 from rcon.game.base import GameProfile
 from rcon.game.registry import game_switch
+from rcon.logs.index import LogIndex
+from rcon.logs.record import LogRecord, dumps_log
 from rcon.maps import (
     UNKNOWN_MAP_NAME,
     Layer,
@@ -254,6 +256,9 @@ class Stream[T]:
 
 
 class FixedLenList[T]:
+    # Number of elements read per round trip when iterating
+    page_size: int = 1000
+
     def __init__(
         self,
         key: str,
@@ -319,16 +324,53 @@ class FixedLenList[T]:
             raise IndexError("Index out of bound")
         self.red.lrem(self.key, 1, val)
 
+    def _read_range(self, start: int, end: int, state: Any) -> tuple[list, Any]:
+        """LRANGE start..end (inclusive), `state` is carried from page to page
+
+        Subclasses use it to keep positions stable while elements are pushed.
+        """
+        return self.red.lrange(self.key, start, end), state
+
+    def _iter_raw_pages(
+        self,
+        start: int = 0,
+        end: int | None = None,
+        page_size: int | None = None,
+        state: Any = None,
+    ) -> Iterator[list[bytes | str]]:
+        page_size = page_size or self.page_size
+        while end is None or start < end:
+            page_end = start + page_size if end is None else min(start + page_size, end)
+            page, state = self._read_range(start, page_end - 1, state)
+            if page:
+                yield page
+            if len(page) < page_end - start:
+                return
+            start = page_end
+
+    def iter_pages(
+        self, start: int = 0, end: int | None = None, page_size: int | None = None
+    ) -> Iterator[list[T]]:
+        """Lazily read the elements [start, end) `page_size` at a time"""
+        for page in self._iter_raw_pages(start, end, page_size):
+            yield [self.deserializer(o) for o in page]
+
     def __iter__(self) -> Iterator[T]:
-        for o in self.red.lrange(self.key, 0, -1):
-            yield self.deserializer(o)
+        # Paged so that readers that stop early don't transfer the whole list
+        for page in self.iter_pages():
+            yield from page
 
     def __len__(self) -> int:
         return self.red.llen(self.key)
 
     def __contains__(self, obj: T) -> bool:
-        # Note: this is O(N) – fine for modest max_len
-        return self.serializer(obj) in self.red.lrange(self.key, 0, -1)
+        # Note: this is O(N), but stops at the first page holding obj
+        serialized = self.serializer(obj)
+        # The pool may decode responses
+        candidates = {serialized}
+        if isinstance(serialized, bytes):
+            candidates.add(serialized.decode())
+        return any(not candidates.isdisjoint(page) for page in self._iter_raw_pages())
 
     def clear(self) -> None:
         self.red.delete(self.key)
@@ -355,15 +397,146 @@ def logs_deserializer(data: bytes | str) -> StructuredLogLineWithMetaData:
     return obj
 
 
-class LogsHistory(FixedLenList[StructuredLogLineWithMetaData]):
+class LogsHistory(FixedLenList[LogRecord]):
     def __init__(self, key: str = "logs_history", max_len: int = 100_000):
-        super().__init__(key, max_len, deserializer=logs_deserializer)
+        super().__init__(
+            key, max_len, serializer=dumps_log, deserializer=LogRecord.loads
+        )
+        self.index = LogIndex(self.red, key, max_len)
+
+    def add(self, obj: LogRecord) -> None:
+        """Push to the left, trim to max_len and index the line."""
+        self.index.add(obj, self.serializer(obj))
+
+    def clear(self) -> None:
+        super().clear()
+        self.index.clear()
+
+    def _read_range(
+        self, start: int, end: int, state: tuple[int, int] | None
+    ) -> tuple[list, tuple[int, int] | None]:
+        """Read positions as they were on the first read
+
+        Lines are pushed to the left while the history is paged through, which
+        shifts every position. The sequence number of the latest line is read
+        with each page and the range moved by the number of lines pushed since
+        the first one.
+        """
+        anchor, shift = state if state is not None else (None, 0)
+        while True:
+            pipe = self.red.pipeline(transaction=True)
+            pipe.get(self.index.latest_key)
+            pipe.lrange(self.key, start + shift, end + shift)
+            latest, page = pipe.execute()
+            if latest is None:
+                # Not indexed yet, positions can't be tracked
+                return page, state
+            latest = int(latest)
+            if anchor is None:
+                anchor = latest
+            if latest - anchor == shift:
+                return page, (anchor, shift)
+            shift = latest - anchor
+
+    def _is_older(
+        self, position: int, timestamp_ms: int, state: Any
+    ) -> tuple[bool, Any]:
+        page, state = self._read_range(position, position, state)
+        if not page:
+            # Past the end of the list
+            return True, state
+        line = self.deserializer(page[0])
+        if not isinstance(line, Mapping):
+            return False, state
+        return line["timestamp_ms"] < timestamp_ms, state
+
+    def since(self, timestamp_ms: int, page_size: int | None = None) -> list[LogRecord]:
+        """The lines logged at or after `timestamp_ms`, newest first
+
+        The history is ordered newest first (see `LogLoop.record_line`), so the
+        first older line is found with an exponential then a binary search,
+        and only the lines before it are read.
+        """
+        state = None
+        # Probe 0, 1, 3, 7... until an older line, the newer ones are before it
+        newer, older = -1, 0
+        while True:
+            is_older, state = self._is_older(older, timestamp_ms, state)
+            if is_older:
+                break
+            newer, older = older, older * 2 + 1
+
+        while older - newer > 1:
+            middle = (newer + older) // 2
+            is_older, state = self._is_older(middle, timestamp_ms, state)
+            if is_older:
+                older = middle
+            else:
+                newer = middle
+
+        lines: list[LogRecord] = []
+        for page in self._iter_raw_pages(0, older, page_size, state):
+            lines.extend(
+                line
+                for line in map(self.deserializer, page)
+                if isinstance(line, Mapping)
+            )
+        return lines
 
 
 class MapsHistory(FixedLenList[MapInfo]):
+    """The last maps played, newest first
+
+    The player stats of a match are not kept in its `MapInfo`, they change
+    every few seconds. They are in the `{key}:player_stats:{start}` hash, one
+    field per player ID, so that only the players whose stats changed are
+    written (see `LogLoop.update_maps_history`). Maps recorded before still
+    have theirs in `player_stats`.
+    """
+
+    # The stats are recorded in the database once the match is over
+    PLAYER_STATS_TTL_SECONDS = 30 * 24 * 60 * 60
+
     def __init__(self, key="maps_history", max_len=500):
         super().__init__(key, max_len)
 
+    def player_stats_key(self, map_info: MapInfo) -> str | None:
+        if map_info["start"] is None:
+            return None
+        return f"{self.key}:player_stats:{map_info['start']}"
+
+    def get_player_stats(self, map_info: MapInfo) -> dict[str, PlayerStat]:
+        key = self.player_stats_key(map_info)
+        if key is not None and (raw_stats := self.red.hgetall(key)):
+            return {
+                (
+                    player_id.decode() if isinstance(player_id, bytes) else player_id
+                ): orjson.loads(stat)
+                for player_id, stat in raw_stats.items()
+            }
+        return dict(map_info.get("player_stats") or {})
+
+    def with_player_stats(self, map_info: MapInfo) -> MapInfo:
+        """The map with its player stats, for the readers that need them"""
+        map_info["player_stats"] = self.get_player_stats(map_info)
+        return map_info
+
+    def save_player_stats(
+        self, map_info: MapInfo, player_stats: Mapping[str, bytes]
+    ) -> None:
+        """Write the already serialized stats of some players of the map"""
+        key = self.player_stats_key(map_info)
+        if key is None or not player_stats:
+            return
+        with self.red.pipeline() as pipe:
+            pipe.hset(key, mapping=player_stats)
+            pipe.expire(key, self.PLAYER_STATS_TTL_SECONDS)
+            pipe.execute()
+
+    def clear_player_stats(self, map_info: MapInfo) -> None:
+        if key := self.player_stats_key(map_info):
+            self.red.delete(key)
+
     def get_current_map(self) -> MapInfo | None:
         try:
             return self[0]
@@ -643,33 +816,7 @@ TEMP_FIELDS: dict[str, str | None] = {
 
 def get_temp_default_stats(existing: PlayerStatsType | None) -> PlayerStat:
     """Return temp stat defaults (p_* [shortly for prev] fields reset to 0)."""
-    if existing is not None:
-        return {
-            "combat": existing.combat,
-            "p_combat": 0,
-            "offense": existing.offense,
-            "p_offense": 0,
-            "defense": existing.defense,
-            "p_defense": 0,
-            "support": existing.support,
-            "p_support": 0,
-            "vehicle_kills": existing.vehicle_kills,
-            "p_vehicle_kills": 0,
-            "vehicles_destroyed": existing.vehicles_destroyed,
-            "p_vehicles_destroyed": 0,
-            "kills_and_assists": existing.kills,
-            "p_kills_and_assists": 0,
-            "deaths_and_redeploys": existing.deaths,
-            "p_deaths_and_redeploys": 0,
-            "units": existing.units,
-            "p_unit": existing.p_unit,
-            "level": existing.level,
-            "p_coord": existing.p_coord,
-            "has_spawned": existing.has_spawned,
-            "names": existing.names,
-            "status": existing.status,
-        }
-    return {
+    defaults: PlayerStat = {
         "combat": 0,
         "p_combat": 0,
         "offense": 0,
@@ -694,6 +841,21 @@ def get_temp_default_stats(existing: PlayerStatsType | None) -> PlayerStat:
         "names": [],
         "status": "offline",
     }
+    if existing is not None:
+        # The recorded stats don't keep the p_* fields, nor the live ones
+        defaults.update(
+            combat=existing.combat,
+            offense=existing.offense,
+            defense=existing.defense,
+            support=existing.support,
+            vehicle_kills=existing.vehicle_kills,
+            vehicles_destroyed=existing.vehicles_destroyed,
+            kills_and_assists=existing.kills,
+            deaths_and_redeploys=existing.deaths,
+            units=existing.units,
+            level=existing.level,
+        )
+    return defaults
 
 
 def get_default_player_stats() -> PlayerStatsType:
@@ -10,6 +10,7 @@ from rq import Queue
 from rq.job import Dependency, Job, Retry
 from rq_scheduler import Scheduler
 from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.orm import Session
 
 from rcon.cache_utils import get_redis_client
@@ -17,7 +18,7 @@ from rcon.game.registry import GAME_ID
 from rcon.game_logs import get_historical_logs_records
 from rcon.logs.recorder import LogRecorder
 from rcon.models import Maps, PlayerStats, enter_session
-from rcon.player_history import get_player
+from rcon.player_history import get_player_ids
 from rcon.player_stats import TimeWindowStats
 from rcon.rcon import get_rcon
 from rcon.types import GameLayout, MapInfo, MapScore, PlayerStat
@@ -205,10 +206,10 @@ def save_missing_match_logs(map_: MapInfo):
             if match_start <= log["event_time"].replace(tzinfo=datetime.UTC)
             and log["event_time"].replace(tzinfo=datetime.UTC) <= match_end
         ]
-        # 20_000 logs should be enough (90 min warfare full server results in approx 4000 logs)
+        # Only the lines logged since the start of the match are read
         match_redis_logs = [
             log
-            for log in LogsHistory()[:20000]
+            for log in LogsHistory().since(int(match_start.timestamp() * 1000))
             if match_start <= log["event_time"].replace(tzinfo=datetime.UTC)
             and log["event_time"].replace(tzinfo=datetime.UTC) <= match_end
         ]
@@ -247,11 +248,10 @@ def save_missing_match_logs(map_: MapInfo):
                 limit=99999999,
             )
             logger.info("DATABASE logs count: %d", len(db_match_logs))
-            logs_to_store = []
-            for log in db_match_logs:
-                if not id_to_log.get(unique_id(log.content)):
-                    logger.warning("Missing log - DATABASE: %s", log)
-                    logs_to_store.append(log)
+            db_ids = {unique_id(log.content) for log in db_match_logs}
+            logs_to_store = [
+                log for log_id, log in id_to_log.items() if log_id not in db_ids
+            ]
             if logs_to_store:
                 recorder = LogRecorder()
                 logger.info("Saving missing logs: %d", len(logs_to_store))
@@ -316,6 +316,7 @@ def clear_stats_cache(map: Maps, map_info: MapInfo | None):
     map_to_update["player_stats"] = {}
     map_to_update["cap_flips"] = []
     maps_history.update(map_index, map_to_update)
+    maps_history.clear_player_stats(map_to_update)
 
 
 def _record_stats(map_info: MapInfo):
@@ -328,6 +329,7 @@ def _record_stats(map_info: MapInfo):
 
     start = datetime.datetime.fromtimestamp(raw_start, UTC)
     end = datetime.datetime.fromtimestamp(raw_end, UTC)
+    map_info = MapsHistory().with_player_stats(map_info)
     with enter_session() as sess:
         map_ = get_or_create_map(
             sess=sess,
@@ -443,6 +445,29 @@ def _get_game_logs_stats(
     )
 
 
+def _upsert_player_stats(
+    sess: Session, rows: list[dict[str, Any]], force: bool = False
+) -> None:
+    """Insert the stats of the players of a map, updating the ones already
+    recorded when forced"""
+    if not rows:
+        return
+    stmt = postgresql_insert(PlayerStats).values(rows)
+    if force:
+        columns = PlayerStats.__mapper__.columns
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique_map_player",
+            set_={
+                columns[key].name: stmt.excluded[columns[key].name]
+                for key in rows[0]
+                if key not in ("player_id_id", "map_id")
+            },
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(constraint="unique_map_player")
+    sess.execute(stmt)
+
+
 def record_stats_from_map(
     sess: Session, map_: Maps, map_info: MapInfo | None, force: bool = False
 ) -> None:
@@ -454,7 +479,7 @@ def record_stats_from_map(
 
     _save_match_result(sess, map_)
 
-    seen_players: set[str] = set()
+    game_log_stats_by_player: dict[str, dict[str, Any]] = {}
     for player_game_log_stats in _get_game_logs_stats(sess, map_, temp_stats).values():
         player_id = player_game_log_stats.get("player_id")
         if not player_id:
@@ -463,47 +488,59 @@ def record_stats_from_map(
             )
             continue
 
-        if player_id in seen_players:
+        if player_id in game_log_stats_by_player:
             logger.info(f"Failed to record duplicate stats for {player_id}")
             continue
 
-        seen_players.add(player_id)
+        game_log_stats_by_player[player_id] = player_game_log_stats
+
+    player_ids = get_player_ids(sess, game_log_stats_by_player)
+    # Any already recorded stats
+    existing_by_player: dict[int, PlayerStats] = {
+        stats.player_id_id: stats
+        for stats in sess.query(PlayerStats).filter(PlayerStats.map_id == map_.id)
+    }
 
-        player_record = get_player(sess, player_id=player_id)
-        if not player_record:
+    rows = []
+    for player_id, player_game_log_stats in game_log_stats_by_player.items():
+        player_id_id = player_ids.get(player_id)
+        if player_id_id is None:
             logger.error("Can't find DB record for %s", player_id)
             continue
 
-        # Check for any already recorded stats
-        existing: PlayerStats | None = (
-            sess.query(PlayerStats)
-            .filter(
-                PlayerStats.map_id == map_.id,
-                PlayerStats.player_id_id == player_record.id,
-            )
-            .one_or_none()
-        )
-
+        existing = existing_by_player.get(player_id_id)
         # The stats were already recorded once
         if existing is not None and not force:
             continue
 
-        player_temp_stats = temp_stats.get(player_id, get_temp_default_stats(existing))
-
-        combined_player_stats = _build_player_stat_dict(
-            player_record.id, map_.id, player_game_log_stats, player_temp_stats
+        player_temp_stats = temp_stats.get(player_id)
+        if player_temp_stats is None:
+            player_temp_stats = get_temp_default_stats(existing)
+        rows.append(
+            _build_player_stat_dict(
+                player_id_id, map_.id, player_game_log_stats, player_temp_stats
+            )
         )
 
-        if existing is not None and force:
-            logger.debug("Updating stats for player %s on map %s", player_id, map_.id)
-            for key, value in combined_player_stats.items():
-                if key not in ("player_id_id", "map_id"):
-                    setattr(existing, key, value)
-            continue
+    logger.debug("Saving stats of %d players on map %s", len(rows), map_.id)
+    _upsert_player_stats(sess, rows, force=force)
+
 
-        logger.debug("Saving stats for player %s on map %s", player_id, map_.id)
-        player_stat_record = PlayerStats(**combined_player_stats)
-        sess.add(player_stat_record)
+def record_map_stats(map_id: int, force: bool = False) -> str | None:
+    """Record the stats of a map in its own session, returns why it failed"""
+    with enter_session() as sess:
+        try:
+            map_ = sess.get(Maps, map_id)
+            if map_ is None:
+                return f"Map {map_id} not found"
+            record_stats_from_map(sess, map_, None, force=force)
+            sess.commit()
+        except Exception as e:
+            # One map failing must not stop a backfill of many
+            logger.exception("Unable to record the stats of map %s", map_id)
+            sess.rollback()
+            return repr(e)
+    return None
 
 
 def get_job_results(job_key):
@@ -16,9 +16,9 @@ const RconConnectionNotes = `
         
         /*
             Whether Community RCon should track performance metrics for the RCon communication, such as
-            number of opened/closed connections or send commands. The metrics will be counted for the interval
-            configured with performance_statistics_interval_seconds and reset every interval. You should only
-            enable this when you know what you're doing.
+            number of opened/closed connections or send commands, and the p50/p95/p99 latency of each RCon command.
+            The metrics will be counted for the interval configured with performance_statistics_interval_seconds
+            and reset every interval. They are buffered in memory and only written to Redis every few seconds.
             Changing this setting requires a restart of the supervisor and backend container.
          */
         "performance_statistics_enabled": false,
@@ -33,7 +33,20 @@ const RconConnectionNotes = `
 
             This needs to be a multiple of 10 (10, 20, 30, 40, etc.) and cannot be smaller than 10.
          */
-        "performance_statistics_interval_seconds": 30
+        "performance_statistics_interval_seconds": 30,
+
+        /*
+            The number of pipelined connections shared by every thread of a worker.
+            When set to 0 (the default) each thread opens its own connection and waits for
+            every command to complete before sending the next one.
+            When set to 1 or more, commands are written back to back on these shared connections
+            and responses are matched to their requests as they arrive, which cuts down the
+            number of round trips for things like the game view.
+            Changing this setting requires a restart of the supervisor and backend container.
+
+            This must be an integer 0 <= x <= 10
+         */
+        "multiplexed_connections": 0
     }
     `;
 
@@ -7,7 +7,7 @@ const logStreamNotes = `
             - stream_size: The number of logs the stream will retain before discarding the oldest logs.
             - startup_since_mins: The number of minutes of logs to request from the game service when the service starts up
             - refresh_frequency_sec: The poll rate for asking for new logs from the game server
-            - refresh_since_mins The number of minutes of logs to request from the game service each loop
+            - refresh_since_mins: Ignored, new logs are read from the log bus as they come
 
             See https://github.com/MarechJ/hll_rcon_tool/wiki/Developer-Guides-%E2%80%90-Streaming-Logs for a detailed description.
         */
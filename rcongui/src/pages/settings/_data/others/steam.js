@@ -5,9 +5,27 @@ const SteamNotes = `
             and is used for the VAC/game ban feature (if configured)
             Get a key from: https://steamcommunity.com/dev/apikey
         */
-        "api_key": "your_api_key_here"
+        "api_key": "your_api_key_here",
+
+        /*
+            Continuously refresh steam profiles and bans in the background.
+            Players that are online or were seen recently are refreshed first and more often,
+            players that were seen a long time ago are refreshed less often.
+        */
+        "refresh_enabled": true,
+
+        /*
+            The maximum number of steam API calls the refresh may make per day, spread evenly over the day.
+            Each batch of up to 100 players costs 2 calls (profiles and bans).
+            Steam allows 100,000 calls per day per API key, shared with everything else using your key.
+        */
+        "refresh_daily_api_budget": 5000,
+
+        /*
+            Players that have not been seen on your server for this many days are not refreshed at all.
+        */
+        "refresh_dormant_after_days": 180
     }
     `;
 
 export default SteamNotes;
-
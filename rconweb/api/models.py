@@ -481,4 +481,5 @@ class RconUser(User):
             ("can_add_map_to_votemap", "Can add map to current votemap selection"),
             ("can_set_votemap_winner", "Can guarantee next map with votemap enabled"),
             ("can_add_votemap_vote", "Can manually add vote"),
+            ("can_view_cache_metrics", "Can view CRCON cache metrics"),
         )
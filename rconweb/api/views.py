@@ -419,6 +419,7 @@ ENDPOINT_PERMISSIONS: dict[Callable, list[str] | set[str] | str] = {
     rcon_api.add_vip: "api.can_add_vip",
     rcon_api.ban_profanities: "api.can_ban_profanities",
     rcon_api.clear_cache: "api.can_clear_crcon_cache",
+    rcon_api.get_cache_metrics: "api.can_view_cache_metrics",
     rcon_api.delete_message_template: "api.can_delete_message_templates",
     rcon_api.edit_message_template: "api.can_edit_message_templates",
     rcon_api.flag_player: "api.can_flag_player",
@@ -726,6 +727,7 @@ RCON_ENDPOINT_HTTP_METHODS: dict[Callable, list[str]] = {
     rcon_api.get_ban: ["GET"],
     rcon_api.get_bans: ["GET"],
     rcon_api.get_broadcast_message: ["GET"],
+    rcon_api.get_cache_metrics: ["GET"],
     rcon_api.get_camera_discord_webhooks_config: ["GET"],
     rcon_api.get_camera_notification_config: ["GET"],
     rcon_api.get_chat_commands_config: ["GET"],
@@ -0,0 +1,111 @@
+"""Micro-benchmarks for the `ttl_cache` value codecs
+
+Not collected by pytest, run with:
+
+    python -m tests.benchmarks.bench_cache
+"""
+
+import pickle
+import timeit
+from datetime import UTC, datetime, timedelta
+
+from rcon.cache_codecs import CompressedCodec, OrjsonCodec, PickleCodec
+
+
+def detailed_player(i: int) -> dict:
+    """Roughly what `Rcon.get_detailed_players` holds for a single player"""
+    now = datetime.now(tz=UTC)
+    return {
+        "name": f"Some Player {i}",
+        "player_id": f"7656119800000{i:04}",
+        "country": "FR",
+        "steam_bans": None,
+        "is_vip": i % 10 == 0,
+        "unit_id": i // 6,
+        "unit_name": f"squad {i // 6}",
+        "loadout": "standard issue",
+        "team": "allies" if i % 2 else "axis",
+        "faction": "us" if i % 2 else "ger",
+        "role": "rifleman",
+        "kills": i,
+        "deaths": i // 2,
+        "team_kills": 0,
+        "vehicle_kills": 0,
+        "vehicles_destroyed": 0,
+        "combat": 12 * i,
+        "offense": 20 * i,
+        "defense": 40 * i,
+        "support": 5 * i,
+        "level": 100 + i,
+        "platform": "steam",
+        "eos_id": f"{i:032x}",
+        "steam_id": f"7656119800000{i:04}",
+        "world_position": {"x": 1.5 * i, "y": -2.5 * i, "z": 0.0},
+        "clan_tag": "",
+        "map_playtime_seconds": 60 * i,
+        "profile": {
+            "id": i,
+            "player_id": f"7656119800000{i:04}",
+            "created": now - timedelta(days=i),
+            "names": [
+                {"id": i * 10 + n, "name": f"alias {n}", "created": now}
+                for n in range(3)
+            ],
+            "sessions": [{"start": now - timedelta(hours=1), "end": None}],
+            "sessions_count": 100 + i,
+            "total_playtime_seconds": 3600 * i,
+            "current_playtime_seconds": 60 * i,
+            "received_actions": [],
+            "penalty_count": {"KICK": 0, "PUNISH": 1, "TEMPBAN": 0, "PERMABAN": 0},
+            "is_blacklisted": False,
+            "is_vip": False,
+            "vips": [],
+            "watchlist": None,
+            "steaminfo": {"profile": {"personaname": f"persona {i}"}, "bans": None},
+        },
+    }
+
+
+def team_view_like(players: int = 100) -> dict:
+    teams: dict = {}
+    for i in range(players):
+        player = detailed_player(i)
+        squad = teams.setdefault(player["team"], {}).setdefault(
+            player["unit_name"], {"players": [], "type": "infantry"}
+        )
+        squad["players"].append(player)
+    return {"fail_count": 0, **{team: {"squads": s} for team, s in teams.items()}}
+
+
+def _best_of(stmt, number: int = 50, repeat: int = 5) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+
+def bench_codecs() -> None:
+    value = team_view_like()
+    codecs = {
+        "pickle": PickleCodec(),
+        "orjson": OrjsonCodec(),
+        "orjson + zlib": CompressedCodec(OrjsonCodec()),
+        "pickle + zlib": CompressedCodec(PickleCodec()),
+    }
+    print("Team view like payload, 100 players")
+    for label, codec in codecs.items():
+        data = codec.dumps(value)
+        assert codec.loads(data) == value
+        dumps = _best_of(lambda: codec.dumps(value))
+        loads = _best_of(lambda: codec.loads(data))
+        print(
+            f"  {label:<15} {len(data) / 1024:7.1f} KB"
+            f"   dumps {dumps * 1000:7.3f} ms   loads {loads * 1000:7.3f} ms"
+        )
+    # Sanity check that the baseline is what ttl_cache used to store
+    assert PickleCodec().loads(pickle.dumps(value)) == value
+
+
+def main() -> None:
+    bench_codecs()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Micro-benchmarks for the admin log parser
+
+Not collected by pytest, run with:
+
+    python -m tests.benchmarks.bench_log_parser [recorded_dump.json]
+
+A recorded dump is a JSON list of raw `GetAdminLog` lines, without one a
+synthetic 3 hour log of a busy 100 player server is used.
+"""
+
+import json
+import logging
+import re
+import sys
+import timeit
+from datetime import UTC, datetime
+
+from rcon.logs import parser as log_parser
+
+logger = logging.getLogger(__name__)
+
+START = 1_700_000_000
+
+
+def synthetic_dump(minutes: int = 180, lines_per_minute: int = 120) -> list[str]:
+    """Roughly the mix of lines a busy server logs, oldest first"""
+    templates = (
+        "KILL: Some Player {a}(Allies/7656119800000{a:04}) -> Another Player {b}(Axis/7656119800001{b:04}) with M1 GARAND",
+        "KILL: Another Player {b}(Axis/7656119800001{b:04}) -> Some Player {a}(Allies/7656119800000{a:04}) with MG42",
+        "TEAM KILL: Some Player {a}(Allies/7656119800000{a:04}) -> Some Player {b}(Allies/7656119800000{b:04}) with M1 GARAND",
+        "CHAT[Team][Some Player {a}(Allies/7656119800000{a:04})]: need ammo at {b}",
+        "CHAT[Unit][Another Player {b}(Axis/7656119800001{b:04})]: push left",
+        "CONNECTED Some Player {a} (7656119800000{a:04})",
+        "DISCONNECTED Another Player {b} (7656119800001{b:04})",
+        "TEAMSWITCH Some Player {a} (None > Allies)",
+        "Player [Admin {b} (7656119800002{b:04})] Entered Admin Camera",
+        "VOTESYS: Player [Some Player {a}] voted [PV_Favour] for VoteID[{b}]",
+        "MESSAGE: player [Some Player {a}(7656119800000{a:04})], content [Welcome\nhave fun]",
+        "KICK: [Some Player {a}] has been kicked. [KICKED BY THE ADMINISTRATOR!]",
+    )
+    # Kills dominate a real log
+    weights = (40, 30, 2, 8, 8, 3, 3, 2, 1, 1, 1, 1)
+    pool = [
+        template for template, weight in zip(templates, weights) for _ in range(weight)
+    ]
+    lines = []
+    for i in range(minutes * lines_per_minute):
+        timestamp = START + i * 60 // lines_per_minute
+        relative = minutes - i // lines_per_minute
+        line = pool[i % len(pool)].format(a=i % 100, b=(i * 7) % 97)
+        lines.append(f"[{relative}:00 min ({timestamp})] {line}")
+    return lines
+
+
+def legacy_parse_log_line(raw_line: str) -> dict:
+    """The prefix chain `Rcon.parse_log_line` used to have"""
+
+    player: str | None = None
+    player2: str | None = None
+    player_id_1: str | None = None
+    player_id_2: str | None = None
+    weapon: str | None = None
+    action: str | None = None
+    content: str = raw_line
+    sub_content: str | None = None
+
+    if raw_line.startswith(("KILL", "TEAM KILL")):
+        # KILL: Muctar(Axis/71234567891234567) -> Chris(Allies/71234567891234576) with GEWEHR 43
+        # TEAM KILL: SonofJack(Allies/71234567891234567) -> Joseph Cannon(Allies/71234567891234576) with M1 GARAND
+        action, content = raw_line.split(": ", 1)
+        if match := re.match(log_parser.KILL_TEAMKILL_PATTERN, content):
+            player, player_id_1, player2, player_id_2, weapon = match.groups()
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+    elif raw_line.startswith(("DISCONNECTED", "CONNECTED")):
+        action, name_and_player_id = raw_line.split(" ", 1)
+        if match := re.match(log_parser.CONNECT_DISCONNECT_PATTERN, name_and_player_id):
+            player, player_id_1 = match.groups()
+            content = name_and_player_id
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+    elif raw_line.startswith("CHAT"):
+        # CHAT[Team][Azure(Allies/71234567891234567)]: supply truck bot hq for nodes
+        # CHAT[Unit][dominguez1987(Axis/71234567891234567)]: back
+        if match := log_parser.CHAT_PATTERN.match(raw_line):
+            scope, player, side, player_id_1, sub_content = match.groups()
+            action = f"CHAT[{side}][{scope}]"
+            content = f"{player}: {sub_content} ({player_id_1})"
+    elif raw_line.upper().startswith("TEAMSWITCH"):
+        # TEAMSWITCH Plebs_23 (Axis > None)
+        # TEAMSWITCH SupremeOneechan (None > Allies)
+        action = "TEAMSWITCH"
+        if match := re.match(log_parser.TEAMSWITCH_PATTERN, raw_line):
+            player, sub_content = match.groups()
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+    elif raw_line.startswith(("KICK", "BAN")):
+        if match := re.match(log_parser.KICK_BAN_PATTERN, raw_line):
+            _action, player, sub_content, type_ = match.groups()
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+
+        if type_ == "PERMANENTLY":
+            type_ = "PERMA BANNED"
+        elif type_ == "YOU":
+            type_ = "IDLE"
+        elif type_ == "Host":
+            type_ = ""
+        elif type_ == "Anti-Cheat":
+            type_ = "ANTI-CHEAT"
+        elif type_ == "KICKED":
+            type_ = "KICKED"
+        elif type_ == "BANNED":
+            type_ = "BANNED"
+        else:
+            type_ = "MISC"
+
+        action = f"ADMIN {type_}".strip()
+
+        if "FOR TEAM KILLING" in raw_line:
+            action = f"TK AUTO {type_}"
+
+        # Reconstruct the log line without the newlines and tack on the trailing ] we lose
+        content = f"{_action}: [{player}] {sub_content}"
+        if content[-1] != "]":
+            content += "]"
+            sub_content = sub_content + "]" if sub_content else ""
+    elif raw_line.startswith("VOTE"):
+        action = "VOTE"
+
+        _, sub_content = raw_line.split("VOTESYS: ", 1)
+        content = sub_content
+
+        # VOTESYS: Player [Dingbat252] voted [PV_Favour] for VoteID[2]
+        if match := re.match(log_parser.VOTE_PATTERN, raw_line):
+            player = match.groups()[0]
+        # VOTESYS: Player [NoodleArms] Started a vote of type (PVR_Kick_Abuse) against [buscÃ´O-sensei]. VoteID: [2]
+        elif match := re.match(
+            log_parser.VOTE_STARTED_PATTERN,
+            raw_line,
+        ):
+            action = "VOTE STARTED"
+            player, player2 = match.groups()
+        # VOTESYS: Vote [2] completed. Result: PVR_Passed
+        elif match := re.match(log_parser.VOTE_COMPLETE_PATTERN, raw_line):
+            action = "VOTE COMPLETED"
+        # VOTESYS: Vote [1] expired before completion.
+        elif match := re.match(log_parser.VOTE_EXPIRED_PATTERN, raw_line):
+            action = "VOTE EXPIRED"
+        # VOTESYS: Vote Kick {buscÃ´O-sensei} successfully passed. [For: 2/1 - Against: 0]
+        elif match := re.match(log_parser.VOTE_PASSED_PATTERN, raw_line):
+            action = "VOTE PASSED"
+            content, player, sub_content = match.groups()
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+
+    elif raw_line.upper().startswith("PLAYER"):
+        # Player [Fachi (71234567891234567)] Entered Admin Camera
+        action = "CAMERA"
+        _, content = raw_line.split(" ", 1)
+
+        if match := re.match(log_parser.CAMERA_PATTERN, content):
+            player, player_id_1, sub_content = match.groups()
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+
+    elif raw_line.upper().startswith("MATCH START"):
+        # MATCH START UTAH BEACH WARFARE
+        action = "MATCH START"
+        _, sub_content = raw_line.split("MATCH START ")
+        content = raw_line
+    elif raw_line.upper().startswith("MATCH ENDED"):
+        # MATCH ENDED `Kharkov WARFARE` ALLIED (0 - 5) AXIS
+        action = "MATCH ENDED"
+        _, sub_content = raw_line.split("MATCH ENDED ")
+    elif raw_line.upper().startswith("MESSAGE"):
+        action = "MESSAGE"
+        raw_line = raw_line.replace("\n", " ")
+        content = raw_line
+        if match := re.match(log_parser.MESSAGE_PATTERN, raw_line):
+            player, player_id_1, message_content = match.groups()
+            content = f"{player}({player_id_1}): {message_content}"
+            sub_content = message_content
+        else:
+            raise ValueError(f"Unable to parse line: {raw_line}")
+
+    if action is None:
+        raise ValueError(f"Unknown type line: '{raw_line}'")
+
+    return {
+        "action": action,
+        "player_name_1": player,
+        "player_id_1": player_id_1,
+        "player_name_2": player2,
+        "player_id_2": player_id_2,
+        "weapon": weapon,
+        "message": content,
+        "sub_content": sub_content,
+    }
+
+
+def legacy_split_raw_log_lines(raw_logs: list[str]):
+    for raw_log in raw_logs:
+        log = re.match(r"^(\[.+? \((\d+)\)\]) ([\w\W]*)$", raw_log, flags=re.MULTILINE)
+        if log is None:
+            logger.error(f"Unable to parse log line: '{raw_log}'")
+            continue
+
+        (raw_relative_time, raw_timestamp, raw_log_line) = log.groups()
+        yield raw_relative_time, raw_timestamp, raw_log_line.strip()
+
+
+def legacy_parse_logs(
+    raw_logs: list[str],
+    filter_action: str | None = None,
+    filter_player: str | None = None,
+) -> dict:
+    """The two pass `Rcon.parse_logs` used to have"""
+    now = datetime.now(tz=UTC)
+    parsed_log_lines: list[dict] = []
+    actions: set[str] = set()
+    players: set[str] = set()
+
+    for raw_relative_time, raw_timestamp, raw_log_line in legacy_split_raw_log_lines(
+        raw_logs
+    ):
+        time = datetime.fromtimestamp(int(raw_timestamp), tz=UTC)
+        try:
+            log_line = legacy_parse_log_line(raw_log_line)
+
+            if filter_action and not log_line["action"].startswith(filter_action):
+                continue
+
+            if filter_player and filter_player not in raw_log_line:
+                continue
+
+            parsed_log_lines.append(
+                {
+                    "version": 1,
+                    "timestamp_ms": int(time.timestamp() * 1000),
+                    "event_time": datetime.fromtimestamp(int(raw_timestamp), tz=UTC),
+                    "relative_time_ms": (time - now).total_seconds() * 1000,
+                    "raw": raw_relative_time + " " + raw_log_line,
+                    "line_without_time": raw_log_line,
+                    "action": log_line["action"],
+                    "player_name_1": log_line["player_name_1"],
+                    "player_id_1": log_line["player_id_1"],
+                    "player_name_2": log_line["player_name_2"],
+                    "player_id_2": log_line["player_id_2"],
+                    "weapon": log_line["weapon"],
+                    "message": log_line["message"],
+                    "sub_content": log_line["sub_content"],
+                }
+            )
+        except ValueError:
+            logger.error(
+                f"Unable to parse line: '{raw_relative_time} {raw_timestamp} {raw_log_line}'"
+            )
+            continue
+
+        if player := log_line["player_name_1"]:
+            players.add(player)
+
+        if player2 := log_line["player_name_2"]:
+            players.add(player2)
+
+        actions.add(log_line["action"])
+
+    parsed_log_lines.reverse()
+
+    return {
+        "actions": list(actions),
+        "players": list(players),
+        "logs": parsed_log_lines,
+    }
+
+
+def _best_of(stmt, number: int = 3, repeat: int = 5) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+
+def _comparable(parsed: dict) -> dict:
+    # relative_time_ms depends on when the parser ran
+    logs = [{**log, "relative_time_ms": None} for log in parsed["logs"]]
+    return {**parsed, "actions": sorted(parsed["actions"]), "logs": logs}
+
+
+def bench_parse_logs(raw_logs: list[str], label: str) -> None:
+    expected = _comparable(legacy_parse_logs(raw_logs))
+    assert _comparable(log_parser.parse_logs(raw_logs)) == expected
+    legacy = _best_of(lambda: legacy_parse_logs(raw_logs))
+    current = _best_of(lambda: log_parser.parse_logs(raw_logs))
+    print(f"parse_logs, {label} ({len(raw_logs):,} lines)")
+    print(
+        f"  legacy {legacy * 1000:9.1f} ms ({len(raw_logs) / legacy:,.0f} lines/s)"
+        f"   current {current * 1000:9.1f} ms ({len(raw_logs) / current:,.0f} lines/s)"
+        f"   x{legacy / current:,.2f}"
+    )
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            bench_parse_logs(json.load(f), sys.argv[1])
+    else:
+        bench_parse_logs(synthetic_dump(), "synthetic 3 hours")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Micro-benchmark of receiving a large RCON response
+
+Not collected by pytest, run with:
+
+    python -m tests.benchmarks.bench_receive
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import timeit
+
+from rcon.connection import (
+    HEADER_FORMAT,
+    MAGIC_HEADER_VALUE,
+    HLLConnection,
+    Response,
+    XorCodec,
+)
+from tests.benchmarks.bench_xor import legacy_xor
+
+
+def legacy_receive(sock: socket.socket, key: bytes) -> Response:
+    """The receive path `HLLConnection.receive` used to have"""
+    header_bytes = sock.recv(struct.calcsize(HEADER_FORMAT))
+    _, req_id, body_len = struct.unpack(HEADER_FORMAT, header_bytes)
+    raw = bytearray()
+    while len(raw) < body_len:
+        raw += sock.recv(body_len - len(raw))
+    body = json.loads(legacy_xor(raw, key))
+    return Response(
+        request_id=req_id,
+        command=body["name"],
+        version=body["version"],
+        status_code=body["statusCode"],
+        status_message=body["statusMessage"],
+        content=body["contentBody"],
+    )
+
+
+def admin_log_frame(key: bytes, minutes: int = 180, lines_per_minute: int = 120):
+    """An encoded `GetAdminLog` response for a busy 100 player server"""
+    entries = [
+        {
+            "timestamp": f"2024.01.01-12.{i % 60:02}.{i % 60:02}:000",
+            "message": f"KILL: Some Player {i % 100}(Allies/7656119800000{i % 100:04}) "
+            f"-> Another Player {i % 97}(Axis/7656119800001{i % 97:04}) with M1 GARAND",
+        }
+        for i in range(minutes * lines_per_minute)
+    ]
+    body = json.dumps(
+        {
+            "name": "GetAdminLog",
+            "version": 2,
+            "statusCode": 200,
+            "statusMessage": "OK",
+            "contentBody": json.dumps({"entries": entries}),
+        }
+    ).encode()
+    header = struct.pack(HEADER_FORMAT, MAGIC_HEADER_VALUE, 1, len(body))
+    return header + XorCodec(key).xor(body)
+
+
+def main() -> None:
+    key = os.urandom(32)
+    frame = admin_log_frame(key)
+    reader, writer = socket.socketpair()
+    conn = HLLConnection()
+    conn.sock.close()
+    conn.sock = reader
+    conn.xorkey = key
+
+    def timed(receive) -> float:
+        sender = threading.Thread(target=writer.sendall, args=(frame,))
+        sender.start()
+        elapsed = min(timeit.repeat(receive, number=1, repeat=1))
+        sender.join()
+        return elapsed
+
+    def legacy():
+        legacy_receive(reader, key).content_dict
+
+    def current():
+        conn._read_response().content_dict
+
+    print(f"GetAdminLog receive, 180 minutes ({len(frame) / 1024:,.0f} KB)")
+    legacy_time = min(timed(legacy) for _ in range(3))
+    current_time = min(timed(current) for _ in range(10))
+    print(
+        f"  legacy {legacy_time * 1000:9.3f} ms   current {current_time * 1000:9.3f} ms"
+        f"   x{legacy_time / current_time:,.1f}"
+    )
+    reader.close()
+    writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Micro-benchmark of the XOR applied to every RCON frame
+
+Not collected by pytest, run with:
+
+    python -m tests.benchmarks.bench_xor
+"""
+
+import os
+import timeit
+
+from rcon.connection import XorCodec
+
+# Roughly: a single command, a 100 player `players` response and a
+# `GetAdminLog` response with 180 minutes of backtrack on a busy server
+PAYLOAD_SIZES = {
+    "command (256 B)": 256,
+    "players (64 KB)": 64 * 1024,
+    "admin log (600 KB)": 600 * 1024,
+}
+
+
+def legacy_xor(msg, key: bytes) -> bytes:
+    """The byte by byte implementation `HLLConnection._xor` used to have"""
+    n = []
+    for i in range(len(msg)):
+        n.append(msg[i] ^ key[i % len(key)])
+    return bytes(n)
+
+
+def _best_of(stmt, number: int, repeat: int = 5) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    key = os.urandom(32)
+    codec = XorCodec(key)
+    for label, size in PAYLOAD_SIZES.items():
+        payload = os.urandom(size)
+        assert codec.xor(payload) == legacy_xor(payload, key)
+        number = max(1, 2_000_000 // size)
+        legacy = _best_of(lambda: legacy_xor(payload, key), number=max(1, number // 50))
+        fast = _best_of(lambda: codec.xor(payload), number=number)
+        print(
+            f"{label:<20} legacy {legacy * 1000:9.3f} ms"
+            f"   codec {fast * 1000:9.3f} ms   x{legacy / fast:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
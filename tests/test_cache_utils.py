@@ -1,11 +1,27 @@
+import datetime
 import os
+import pickle
+import re
+import threading
+import time
 from logging import getLogger
 from unittest import mock
 
+import fakeredis
+import pytest
 import redis
 import redis.exceptions
 
-from rcon.cache_utils import RedisCached, ttl_cache
+from rcon.cache_codecs import CompressedCodec, OrjsonCodec, PickleCodec
+from rcon.cache_utils import (
+    LOCAL_CACHE_MAX_TTL_SECONDS,
+    RedisCached,
+    _handle_invalidation,
+    flush_cache_metrics,
+    get_cache_metrics,
+    reset_cache_metrics,
+    ttl_cache,
+)
 
 logger = getLogger(__name__)
 
@@ -72,3 +88,193 @@ def test_mem_cache_used(monkeypatch):
     # so we can't isinstance check it
     c = ttl_cache(ttl=1)
     assert not isinstance(c, RedisCached)
+
+
+def _local_cached(red, function, local_ttl_seconds=5):
+    return RedisCached(
+        pool=None,
+        red=red,
+        ttl_seconds=10,
+        function=function,
+        serializer=pickle.dumps,
+        deserializer=pickle.loads,
+        local_ttl_seconds=local_ttl_seconds,
+    )
+
+
+def test_local_cache_disabled_by_default():
+    c = RedisCached(
+        pool=None, red=fakeredis.FakeRedis(), ttl_seconds=10, function=_needs_qual_name
+    )
+    assert c.local_cache is None
+
+
+def test_local_cache_hit_skips_redis():
+    red = fakeredis.FakeRedis()
+    function = mock.Mock(spec=_needs_qual_name, return_value={"players": 1})
+    c = _local_cached(red, function)
+
+    with mock.patch("rcon.cache_utils._ensure_invalidation_listener"):
+        assert c() == {"players": 1}
+        with mock.patch.object(red, "get", side_effect=AssertionError):
+            result = c()
+
+    assert result == {"players": 1}
+    # Every hit is a fresh copy, callers can't alter the cached value
+    result["players"] = 2
+    assert c.local_cache is not None
+    assert pickle.loads(c.local_cache.get(c.key())) == {"players": 1}
+    function.assert_called_once()
+
+
+def test_local_cache_invalidation_message_evicts():
+    red = fakeredis.FakeRedis()
+    function = mock.Mock(spec=_needs_qual_name, return_value=1)
+    c = _local_cached(red, function)
+    other = _local_cached(red, mock.Mock(spec=_needs_qual_name))
+    assert c.local_cache is not None and other.local_cache is not None
+
+    with mock.patch("rcon.cache_utils._ensure_invalidation_listener"):
+        c()
+        other.local_cache.set(other.key(), b"other")
+        with mock.patch.object(red, "publish") as publish:
+            c.clear_for()
+        message = publish.call_args.args[1]
+
+        # Simulate another process having cached it before the message arrives
+        c.local_cache.set(c.key(), pickle.dumps(1))
+        _handle_invalidation(message)
+
+    assert c.local_cache.get(c.key()) is None
+    assert other.local_cache.get(other.key()) == b"other"
+
+    _handle_invalidation(b"\x00")
+    assert len(other.local_cache) == 0
+
+
+def test_local_cache_ttl_is_capped():
+    c = _local_cached(fakeredis.FakeRedis(), _needs_qual_name, local_ttl_seconds=60)
+    assert c.local_cache is not None
+    assert c.local_cache._cache.ttl == LOCAL_CACHE_MAX_TTL_SECONDS
+
+
+def test_stale_value_served_while_refreshed_once_in_background():
+    red = fakeredis.FakeRedis()
+    refreshing = threading.Event()
+    release = threading.Event()
+
+    def slow_function():
+        refreshing.set()
+        release.wait(5)
+        return "fresh"
+
+    c = RedisCached(
+        pool=None,
+        red=red,
+        ttl_seconds=10,
+        function=slow_function,
+        serializer=pickle.dumps,
+        deserializer=pickle.loads,
+        stale_ttl_seconds=30,
+    )
+    # The value outlived its ttl but not its stale ttl
+    red.setex(c.key(), 30, pickle.dumps("stale"))
+
+    assert c() == "stale"
+    assert refreshing.wait(5)
+    assert c() == "stale"
+    release.set()
+    for _ in range(100):
+        if red.get(c.fresh_key(c.key())):
+            break
+        time.sleep(0.01)
+
+    assert c() == "fresh"
+    stats = c.get_stats()
+    assert (stats["stale"], stats["refresh"], stats["hit"]) == (2, 1, 1)
+    assert stats["source_calls"] == 1
+    assert red.ttl(c.key()) > 10
+
+
+@pytest.mark.parametrize(
+    "codec",
+    [
+        PickleCodec(),
+        OrjsonCodec(),
+        CompressedCodec(OrjsonCodec(), min_size=0),
+        CompressedCodec(PickleCodec()),
+    ],
+)
+def test_codecs_round_trip(codec):
+    value = {
+        "created": datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.UTC),
+        "naive": datetime.datetime(2024, 1, 1, 12),
+        "time_remaining": datetime.timedelta(minutes=11, seconds=51),
+        "players": [{"name": "a", "kills": 1, "profile": None}],
+    }
+    assert codec.loads(codec.dumps(value)) == value
+
+
+def test_orjson_codec_falls_back_to_pickle():
+    # JSON objects can't have a None key, squads without a name do
+    value = {None: {"players": []}, "squad": (1, 2)}
+    assert OrjsonCodec().loads(OrjsonCodec().dumps(value)) == value
+
+
+def test_compressed_codec_only_compresses_large_values():
+    codec = CompressedCodec(PickleCodec(), min_size=1024)
+    small, large = "a" * 10, "a" * 10_000
+
+    assert len(codec.dumps(small)) > len(small)
+    assert len(codec.dumps(large)) < 1024
+    assert codec.loads(codec.dumps(large)) == large
+
+
+def test_hashed_keys_are_stable():
+    def get_player(player_id, player=None):
+        pass
+
+    c = RedisCached(
+        pool=None,
+        red=fakeredis.FakeRedis(),
+        ttl_seconds=10,
+        function=get_player,
+        hashed_keys=True,
+    )
+    key = c.key(player_id="1", player={"b": 1, "a": 2})
+
+    assert key == c.key(player={"a": 2, "b": 1}, player_id="1")
+    assert key != c.key(player_id="2")
+    assert re.fullmatch(rf"{re.escape(c.key_prefix)}__[0-9a-f]{{32}}", key)
+
+
+def test_cache_metrics_are_flushed_and_aggregated():
+    red = fakeredis.FakeRedis()
+
+    def get_team_view():
+        return {"players": list(range(100))}
+
+    c = RedisCached(
+        pool=None,
+        red=red,
+        ttl_seconds=10,
+        function=get_team_view,
+        serializer=pickle.dumps,
+        deserializer=pickle.loads,
+    )
+    c()
+    c()
+    c()
+    flush_cache_metrics(red)
+    # Another service reporting for the same function
+    red.hincrbyfloat(f"cache_metrics:{c.metrics_name}", "miss", 1)
+
+    metrics = get_cache_metrics(red)[c.metrics_name]
+    assert (metrics["hit"], metrics["miss"], metrics["source_calls"]) == (2, 2, 1)
+    assert metrics["hit_ratio"] == 0.5
+    assert metrics["avg_stored_bytes"] == len(pickle.dumps(get_team_view()))
+    assert metrics["avg_lock_wait_ms"] is None
+    assert c.take_unflushed_stats() == {}
+
+    assert reset_cache_metrics(red) >= 1
+    assert c.metrics_name not in get_cache_metrics(red)
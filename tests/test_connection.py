@@ -0,0 +1,284 @@
+import asyncio
+import base64
+import json
+import socket
+import struct
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from rcon.commands import ServerCtl
+from rcon.connection import (
+    HEADER_FORMAT,
+    MAGIC_HEADER_VALUE,
+    AsyncHLLConnection,
+    HLLBrokenConnectionError,
+    HLLConnection,
+    HLLMultiplexedConnection,
+    XorCodec,
+)
+from rcon.types import ServerInfo
+
+XOR_KEY = b"\x01\x02\x03\x04"
+
+
+def _xor(data: bytes) -> bytes:
+    return bytes(b ^ XOR_KEY[i % len(XOR_KEY)] for i, b in enumerate(data))
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError
+        buf += chunk
+    return buf
+
+
+class FakeServer:
+    """A minimal RCON v2 server that answers requests in batches, in reverse order"""
+
+    def __init__(self, batch_size: int = 1) -> None:
+        self.batch_size = batch_size
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def read_request(self, sock: socket.socket, encoded: bool):
+        header = _recv_exactly(sock, struct.calcsize(HEADER_FORMAT))
+        _, request_id, body_len = struct.unpack(HEADER_FORMAT, header)
+        body = _recv_exactly(sock, body_len)
+        return request_id, json.loads(_xor(body) if encoded else body)
+
+    def write_response(
+        self, sock: socket.socket, request_id: int, request: dict, content: str
+    ):
+        body = json.dumps(
+            {
+                "name": request["name"],
+                "version": 2,
+                "statusCode": 200,
+                "statusMessage": "OK",
+                "contentBody": content,
+            }
+        ).encode()
+        header = struct.pack(HEADER_FORMAT, MAGIC_HEADER_VALUE, request_id, len(body))
+        sock.sendall(header + _xor(body))
+
+    def serve(self):
+        sock, _ = self.listener.accept()
+        with sock:
+            request_id, request = self.read_request(sock, encoded=False)
+            body = json.dumps(
+                {
+                    "name": request["name"],
+                    "version": 2,
+                    "statusCode": 200,
+                    "statusMessage": "OK",
+                    "contentBody": base64.b64encode(XOR_KEY).decode(),
+                }
+            ).encode()
+            sock.sendall(
+                struct.pack(HEADER_FORMAT, MAGIC_HEADER_VALUE, request_id, len(body))
+                + body
+            )
+            request_id, request = self.read_request(sock, encoded=True)
+            self.write_response(sock, request_id, request, "token")
+
+            try:
+                while True:
+                    batch = [
+                        self.read_request(sock, encoded=True)
+                        for _ in range(self.batch_size)
+                    ]
+                    for request_id, request in reversed(batch):
+                        self.write_response(
+                            sock, request_id, request, request["contentBody"]
+                        )
+            except ConnectionError:
+                pass
+
+
+@pytest.mark.parametrize("conn_class", [HLLConnection, HLLMultiplexedConnection])
+def test_out_of_order_responses_are_matched_to_requests(conn_class):
+    server = FakeServer(batch_size=3)
+    conn = conn_class()
+    conn.connect("127.0.0.1", server.port, "password")
+    try:
+        assert conn.auth_token == "token"
+        handles = [conn.send("Echo", 2, f"message {i}") for i in range(3)]
+        assert [h.receive().content for h in handles] == [
+            "message 0",
+            "message 1",
+            "message 2",
+        ]
+    finally:
+        conn.close()
+
+
+def test_multiplexed_connection_shared_between_threads():
+    server = FakeServer(batch_size=4)
+    conn = HLLMultiplexedConnection()
+    conn.connect("127.0.0.1", server.port, "password")
+    results: dict[int, str] = {}
+
+    def worker(i: int):
+        results[i] = conn.exchange("Echo", 2, f"thread {i}").content
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        assert results == {i: f"thread {i}" for i in range(4)}
+        assert conn.in_flight == 0
+    finally:
+        conn.close()
+
+
+def test_multiplexed_connection_fails_pending_requests_when_closed():
+    server = FakeServer(batch_size=2)
+    conn = HLLMultiplexedConnection()
+    conn.connect("127.0.0.1", server.port, "password")
+    handle = conn.send("Echo", 2, "never answered")
+    conn.close()
+
+    with pytest.raises(HLLBrokenConnectionError):
+        handle.receive()
+
+
+def test_requests_sent_while_the_reader_fails_are_not_left_pending():
+    server = FakeServer(batch_size=2)
+    conn = HLLMultiplexedConnection()
+    conn.connect("127.0.0.1", server.port, "password")
+    xor = conn._xor
+
+    def reader_fails_meanwhile(msg):
+        # After the broken check of `send`, before the request is pending
+        conn._fail_pending(HLLBrokenConnectionError("reader stopped"))
+        return xor(msg)
+
+    conn._xor = reader_fails_meanwhile
+    try:
+        with pytest.raises(HLLBrokenConnectionError):
+            conn.send("Echo", 2, "too late")
+        assert conn.in_flight == 0
+    finally:
+        conn.close()
+
+
+def test_shared_connection_is_only_dropped_once_broken():
+    server = FakeServer(batch_size=2)
+    ctl = ServerCtl(
+        ServerInfo(host="127.0.0.1", port=server.port, password="password"),
+        Mock(),
+        multiplexed_connections=1,
+    )
+    with ctl.with_connection() as conn:
+        pending = conn.send("Echo", 2, "in flight")
+
+    # Timeouts and failed requests only fail their caller
+    with pytest.raises(TimeoutError):
+        with ctl.with_connection() as same_conn:
+            raise TimeoutError()
+    assert same_conn is conn
+    assert ctl.conns == {"multiplexed-0": conn}
+
+    with pytest.raises(OSError):
+        with ctl.with_connection():
+            conn.broken = True
+            raise OSError()
+    assert ctl.conns == {}
+    with pytest.raises(HLLBrokenConnectionError):
+        pending.receive()
+
+
+@pytest.mark.parametrize("size", [0, 1, 3, 4, 5, 1000, 65537])
+def test_xor_codec_matches_byte_by_byte_xor(size):
+    payload = bytes((i * 7) % 256 for i in range(size))
+    codec = XorCodec(XOR_KEY)
+
+    assert codec.xor(payload) == _xor(payload)
+    assert codec.xor(bytearray(payload)) == _xor(payload)
+    assert codec.xor(memoryview(payload)) == _xor(payload)
+    assert codec.xor(codec.xor(payload)) == payload
+
+
+def _response_frame(request_id: int, content: str) -> bytes:
+    body = json.dumps(
+        {
+            "name": "Echo",
+            "version": 2,
+            "statusCode": 200,
+            "statusMessage": "OK",
+            "contentBody": content,
+        }
+    ).encode()
+    header = struct.pack(HEADER_FORMAT, MAGIC_HEADER_VALUE, request_id, len(body))
+    return header + _xor(body)
+
+
+def test_receive_handles_frames_split_across_reads():
+    reader, writer = socket.socketpair()
+    conn = HLLConnection()
+    conn.sock.close()
+    conn.sock = reader
+    conn.xorkey = XOR_KEY
+    frame = _response_frame(1, "split")
+
+    def trickle():
+        # Split the header itself so a single `recv` can only ever short read
+        for chunk in (frame[:5], frame[5:17], frame[17:]):
+            writer.sendall(chunk)
+            time.sleep(0.05)
+
+    sender = threading.Thread(target=trickle)
+    sender.start()
+    try:
+        assert conn.receive(1).content == "split"
+    finally:
+        sender.join()
+        conn.close()
+        writer.close()
+
+
+def test_receive_marks_connection_broken_when_closed_mid_frame():
+    reader, writer = socket.socketpair()
+    conn = HLLConnection()
+    conn.sock.close()
+    conn.sock = reader
+    conn.xorkey = XOR_KEY
+    writer.sendall(_response_frame(1, "truncated")[:20])
+    writer.close()
+
+    with pytest.raises(HLLBrokenConnectionError):
+        conn.receive(1)
+    assert conn.broken
+    conn.close()
+
+
+def test_async_connection_pipelines_concurrent_requests():
+    server = FakeServer(batch_size=3)
+
+    async def run():
+        conn = AsyncHLLConnection()
+        await conn.connect("127.0.0.1", server.port, "password")
+        try:
+            assert conn.auth_token == "token"
+            responses = await asyncio.gather(
+                *(conn.exchange("Echo", 2, f"coroutine {i}") for i in range(3))
+            )
+            return [r.content for r in responses], conn.in_flight
+        finally:
+            await conn.close()
+
+    contents, in_flight = asyncio.run(run())
+    assert contents == ["coroutine 0", "coroutine 1", "coroutine 2"]
+    assert in_flight == 0
@@ -0,0 +1,177 @@
+import threading
+import time
+from functools import partial
+
+import fakeredis
+import pytest
+
+from rcon.logs.hook_executor import HookExecutor, hook_options
+from rcon.perf_statistics import PerformanceStatistics
+
+
+def make_log(action: str, player_id: str | None) -> dict:
+    return {
+        "action": action,
+        "player_id_1": player_id,
+        "player_name_1": player_id,
+        "raw": f"{action} {player_id}",
+    }
+
+
+@pytest.fixture
+def stats():
+    return PerformanceStatistics(
+        "log_hooks", True, flush_interval=3600, red=fakeredis.FakeRedis()
+    )
+
+
+@pytest.fixture
+def executor(stats):
+    executor = HookExecutor(None, max_workers=4, stats=stats)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def test_lines_of_a_player_are_processed_in_order(executor):
+    calls = []
+
+    def on_connect(_, log):
+        # The disconnect hook must not start before this one is done
+        time.sleep(0.05)
+        calls.append(("connect", log["player_id_1"]))
+
+    def on_disconnect(_, log):
+        calls.append(("disconnect", log["player_id_1"]))
+
+    for player in ("a", "b"):
+        executor.submit([on_connect], make_log("CONNECTED", player))
+        executor.submit([on_disconnect], make_log("DISCONNECTED", player))
+    assert executor.wait(timeout=5)
+
+    for player in ("a", "b"):
+        player_calls = [call for call, p in calls if p == player]
+        assert player_calls == ["connect", "disconnect"]
+
+
+def test_slow_hooks_do_not_block_other_players(executor):
+    release = threading.Event()
+    done = threading.Event()
+
+    def slow(_, log):
+        release.wait(5)
+
+    def fast(_, log):
+        done.set()
+
+    started = time.monotonic()
+    executor.submit([slow], make_log("KILL", "a"))
+    executor.submit([fast], make_log("KILL", "b"))
+    assert done.wait(1)
+    assert time.monotonic() - started < 1
+    release.set()
+    assert executor.wait(timeout=5)
+
+
+def test_timed_out_hooks_stop_holding_up_their_player(executor, stats):
+    release = threading.Event()
+    done = threading.Event()
+
+    @hook_options(timeout=0.05)
+    def stuck(_, log):
+        release.wait(5)
+
+    def next_line(_, log):
+        done.set()
+
+    executor.submit([stuck, next_line], make_log("CONNECTED", "a"))
+    assert not done.wait(0.1)
+    executor.expire()
+    assert done.wait(1)
+    release.set()
+    assert executor.wait(timeout=5)
+
+    metrics = stats.dump()
+    assert metrics["timeouts::tests.test_hook_executor.stuck"] == 1
+    assert metrics["latency::tests.test_hook_executor.next_line"]["count"] == 1
+
+
+def test_max_concurrency(executor):
+    running = 0
+    peak = 0
+    mu = threading.Lock()
+
+    @hook_options(max_concurrency=2)
+    def limited(_, log, extra=None):
+        nonlocal running, peak
+        with mu:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with mu:
+            running -= 1
+
+    # Options apply to the partials of a hook too, see load_generic_hooks
+    hook = partial(limited, extra=1)
+    hook.__name__ = limited.__name__
+    hook.__module__ = limited.__module__
+    for player in range(8):
+        executor.submit([hook], make_log("KILL", str(player)))
+    assert executor.wait(timeout=5)
+    assert peak == 2
+
+
+def test_errors_are_recorded(executor, stats):
+    def failing(_, log):
+        raise ValueError("boom")
+
+    calls = []
+    executor.submit([failing, lambda _, log: calls.append(log)], make_log("CHAT", "a"))
+    assert executor.wait(timeout=5)
+    assert len(calls) == 1
+    assert stats.dump()["errors::tests.test_hook_executor.failing"] == 1
+
+
+def test_queued_hooks_do_not_time_out(stats):
+    executor = HookExecutor(None, max_workers=1, stats=stats)
+    release = threading.Event()
+    calls = []
+
+    def busy(_, log):
+        release.wait(5)
+
+    @hook_options(timeout=0.05)
+    def queued(_, log):
+        calls.append(log["action"])
+
+    executor.submit([busy], make_log("KILL", "a"))
+    executor.submit([queued], make_log("CONNECTED", "b"))
+    executor.submit([queued], make_log("DISCONNECTED", "b"))
+    time.sleep(0.1)
+    executor.expire()
+    release.set()
+    assert executor.wait(timeout=5)
+    executor.shutdown()
+
+    assert calls == ["CONNECTED", "DISCONNECTED"]
+    assert "timeouts::tests.test_hook_executor.queued" not in stats.dump()
+
+
+def test_timed_out_hooks_count_against_their_max_concurrency(executor):
+    release = threading.Event()
+    calls = []
+
+    @hook_options(timeout=0.05, max_concurrency=1)
+    def limited(_, log):
+        calls.append(log["player_id_1"])
+        release.wait(5)
+
+    executor.submit([limited], make_log("KILL", "a"))
+    executor.submit([limited], make_log("KILL", "b"))
+    time.sleep(0.1)
+    executor.expire()
+    time.sleep(0.1)
+    assert calls == ["a"]
+
+    release.set()
+    assert executor.wait(timeout=5)
+    assert calls == ["a", "b"]
@@ -0,0 +1,218 @@
+import contextlib
+import datetime
+import os
+import time
+from datetime import UTC
+from unittest import mock
+
+import fakeredis
+import pytest
+import redis.exceptions
+
+os.environ["HLL_MAINTENANCE_CONTAINER"] = "1"
+import rcon.live_stats
+import rcon.player_stats
+from rcon.live_stats import LiveGameStats, LiveSessionStats, LiveStatsEngine
+from rcon.logs.bus import MAX_BLOCK_MS, LogBus, LogBusConsumer
+from rcon.logs.record import LogRecord
+from rcon.player_stats import TimeWindowStats
+
+START = 1_700_000_000
+ALICE = ("Alice", "76561198000000001")
+BOB = ("Bob", "76561198000000002")
+CAROL = ("Carol", "76561198000000003")
+
+
+def make_log(second, action, player=(None, None), other=(None, None), weapon=None):
+    line = f"{action}: {player[0]} -> {other[0]} with {weapon}"
+    return LogRecord(
+        timestamp_ms=(START + second) * 1000,
+        raw_prefix=f"[0:00 min ({START + second})]",
+        line_without_time=line,
+        action=action,
+        player_name_1=player[0],
+        player_id_1=player[1],
+        player_name_2=other[0],
+        player_id_2=other[1],
+        weapon=weapon,
+        message=line,
+    )
+
+
+LOGS = [
+    make_log(0, "MATCH START", weapon="SAINTE-MARIE-DU-MONT Warfare"),
+    make_log(200, "KILL", ALICE, BOB, "M1 GARAND"),
+    make_log(230, "KILL", ALICE, BOB, "M1 GARAND"),
+    make_log(250, "CONNECTED", CAROL),
+    make_log(300, "KILL", BOB, ALICE, "MP40"),
+    make_log(310, "TEAM KILL", CAROL, ALICE, "MP40"),
+    make_log(400, "KILL", ALICE, CAROL, "M1 GARAND"),
+    make_log(420, "DISCONNECTED", CAROL),
+    make_log(500, "KILL", ALICE, BOB, "THOMPSON"),
+]
+
+
+@pytest.fixture(autouse=True)
+def no_server(monkeypatch):
+    monkeypatch.setattr(rcon.player_stats, "get_rcon", mock.Mock)
+    monkeypatch.setattr(rcon.player_stats, "get_redis_client", fakeredis.FakeRedis)
+    for module in (rcon.player_stats, rcon.live_stats):
+        monkeypatch.setattr(module, "enter_session", contextlib.nullcontext)
+        monkeypatch.setattr(
+            module, "get_player_profile_by_player_ids", lambda sess, ids: []
+        )
+
+
+def test_game_stats_match_the_time_window_stats():
+    until = datetime.datetime.fromtimestamp(START + 600, UTC)
+    expected = TimeWindowStats()._get_players_stats_from_logs(
+        LOGS,
+        datetime.datetime.fromtimestamp(START, UTC),
+        until,
+        offset_cooldown_time_seconds=0,
+    )
+
+    game = LiveGameStats()
+    for log in LOGS:
+        game.fold(log)
+    assert game.snapshot(until) == expected
+    assert expected[ALICE[1]]["kills_streak"] == 2
+    assert expected[CAROL[1]]["time_seconds"] == 170
+
+
+def test_game_stats_start_over_at_match_start():
+    game = LiveGameStats()
+    for log in LOGS:
+        game.fold(log)
+    game.fold(make_log(700, "MATCH START", weapon="CARENTAN Warfare"))
+    game.fold(make_log(800, "KILL", BOB, ALICE, "MP40"))
+
+    stats = game.snapshot(datetime.datetime.fromtimestamp(START + 900, UTC))
+    assert game.start == datetime.datetime.fromtimestamp(START + 700, UTC)
+    assert stats.keys() == {ALICE[1], BOB[1]}
+    assert stats[BOB[1]]["kills"] == 1
+    assert stats[ALICE[1]]["kills"] == 0
+
+
+def test_session_stats_start_over_when_players_reconnect():
+    sessions = LiveSessionStats()
+    for log in LOGS:
+        sessions.fold(log)
+    assert CAROL[1] not in sessions.players
+    assert sessions.players[ALICE[1]].stats["kills"] == 4
+
+    sessions.fold(make_log(600, "CONNECTED", CAROL))
+    sessions.fold(make_log(610, "KILL", CAROL, BOB, "MP40"))
+    carol = {
+        "name": CAROL[0],
+        "player_id": CAROL[1],
+        "profile": {
+            "current_playtime_seconds": 60,
+            "soldier": {"platform": "steam"},
+            "steaminfo": None,
+            "sessions": [],
+        },
+    }
+    stats = sessions.snapshot([carol], {})[CAROL[1]]
+    assert stats["kills"] == 1
+    assert stats["teamkills"] == 0
+    assert stats["platform"] == "steam"
+    assert stats["kills_per_minute"] == 1
+
+
+def test_session_stats_only_use_lines_of_the_current_sessions():
+    now = datetime.datetime.fromtimestamp(START + 600, UTC)
+    sessions = LiveSessionStats()
+    sessions_start = sessions.prime(
+        [
+            {
+                "name": ALICE[0],
+                "player_id": ALICE[1],
+                "profile": {"current_playtime_seconds": 350, "sessions": []},
+            }
+        ],
+        now,
+    )
+    for log in LOGS:
+        sessions.fold(log, sessions_start)
+    assert sessions.players.keys() == {ALICE[1]}
+    assert sessions.players[ALICE[1]].stats["kills"] == 2
+    assert sessions.players[ALICE[1]].stats["deaths_by_tk"] == 1
+
+
+@pytest.fixture
+def engine():
+    red = fakeredis.FakeRedis()
+    consumer = LogBusConsumer("live_stats", LogBus(red))
+    consumer.setup()
+    return LiveStatsEngine(consumer, red, logs_history=mock.Mock())
+
+
+def test_lines_are_folded_once_and_resumed_from_the_checkpoint(engine):
+    assert engine.fold(LOGS[:5]) == 5
+    # Read from both the logs history and the bus
+    assert engine.fold(LOGS[3:]) == 4
+    engine.checkpoint()
+
+    restarted = LiveStatsEngine(engine.consumer, engine.red, mock.Mock())
+    assert restarted.restore()
+    assert restarted.fold(LOGS) == 0
+    assert restarted.game.start == datetime.datetime.fromtimestamp(START, UTC)
+    assert restarted.sessions.players[ALICE[1]].stats["kills"] == 4
+    assert restarted.game.players[BOB[1]].stats["deaths"] == 3
+
+
+def test_old_checkpoints_are_not_restored(engine):
+    engine.fold(LOGS)
+    engine.checkpoint()
+    an_hour_later = time.time() + 3600
+    with mock.patch("time.time", return_value=an_hour_later):
+        assert not engine.restore()
+
+
+def test_rebuilt_from_the_logs_history_without_a_checkpoint(engine, monkeypatch):
+    maps_history = mock.Mock()
+    maps_history.return_value.get_current_map.return_value = {
+        "start": START,
+        "player_stats": {},
+    }
+    monkeypatch.setattr(rcon.live_stats, "MapsHistory", maps_history)
+    engine.sessions.rcon.get_players.return_value = [
+        {
+            "name": ALICE[0],
+            "player_id": ALICE[1],
+            "profile": {"current_playtime_seconds": 350, "sessions": []},
+        }
+    ]
+    engine.logs_history.since.return_value = list(reversed(LOGS))
+
+    engine.rebuild(now=datetime.datetime.fromtimestamp(START + 600, UTC))
+
+    engine.logs_history.since.assert_called_once_with(START * 1000)
+    assert engine.sessions.players[ALICE[1]].stats["kills"] == 2
+    assert engine.game.players[ALICE[1]].stats["kills"] == 4
+    assert engine.fold(LOGS) == 0
+
+
+def test_bus_errors_do_not_stop_the_engine(engine, monkeypatch):
+    class Stop(Exception):
+        pass
+
+    monkeypatch.setattr(engine, "start", mock.Mock())
+    monkeypatch.setattr(engine, "refresh", mock.Mock())
+    monkeypatch.setattr(rcon.live_stats.time, "sleep", mock.Mock())
+    monkeypatch.setattr(
+        rcon.live_stats.RconServerSettingsUserConfig,
+        "load_from_db",
+        mock.Mock(return_value=mock.Mock(live_stats_refresh_seconds=15)),
+    )
+    read = mock.Mock(side_effect=[redis.exceptions.TimeoutError(), [], Stop()])
+    monkeypatch.setattr(engine.consumer, "read", read)
+    monkeypatch.setattr(engine.consumer, "retry_pending", mock.Mock())
+
+    with pytest.raises(Stop):
+        engine.run()
+    engine.consumer.retry_pending.assert_called_once()
+    assert all(
+        0 < call.kwargs["block_ms"] <= MAX_BLOCK_MS for call in read.call_args_list[1:]
+    )
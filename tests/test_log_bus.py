@@ -0,0 +1,115 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from rcon.logs.bus import MAX_BLOCK_MS, LogBus, LogBusConsumer
+from rcon.logs.record import LogRecord
+from rcon.logs.stream import LogStream
+
+START = 1_700_000_000
+
+
+def make_log(i: int, second: int | None = None) -> LogRecord:
+    timestamp = START + (i if second is None else second)
+    line = f"KILL: Some Player -> Other {i}"
+    return LogRecord(
+        timestamp_ms=timestamp * 1000,
+        raw_prefix=f"[0:00 min ({timestamp})]",
+        line_without_time=line,
+        action="KILL",
+        player_name_1="Some Player",
+        player_id_1="76561198000000001",
+        player_name_2="Other",
+        message=line,
+    )
+
+
+@pytest.fixture
+def bus():
+    return LogBus(fakeredis.FakeRedis(decode_responses=True), max_len=100)
+
+
+def test_each_group_gets_every_line(bus):
+    recorder = LogBusConsumer("log_recorder", bus)
+    stream = LogBusConsumer("log_stream", bus)
+    recorder.setup()
+    stream.setup()
+
+    bus.publish([make_log(i) for i in range(3)])
+    read = {}
+    for consumer in (recorder, stream):
+        read[consumer.group] = entries = consumer.read()
+        assert [log["raw"] for _, log in entries] == [
+            make_log(i)["raw"] for i in range(3)
+        ]
+        assert entries[1][1]["player_id_1"] == "76561198000000001"
+
+    recorder.ack(id_ for id_, _ in read["log_recorder"])
+    lag = bus.lag()
+    assert lag["log_recorder"]["pending"] == 0
+    assert lag["log_stream"]["pending"] == 3
+
+
+def test_unacknowledged_lines_are_read_again_after_a_restart(bus):
+    consumer = LogBusConsumer("log_recorder", bus)
+    consumer.setup()
+    bus.publish([make_log(i) for i in range(4)])
+
+    entries = consumer.read(count=2)
+    consumer.ack([entries[0][0]])
+    # Crashed before acknowledging the second line
+
+    restarted = LogBusConsumer("log_recorder", bus)
+    assert not restarted.setup()
+    assert [id_ for id_, _ in restarted.read()] == [entries[1][0]]
+    restarted.ack([entries[1][0]])
+    assert len(restarted.read()) == 2
+    assert restarted.read() == []
+
+
+def test_groups_only_get_lines_published_after_they_were_created(bus):
+    bus.publish([make_log(0)])
+    consumer = LogBusConsumer("log_stream", bus)
+    assert consumer.setup()
+    bus.publish([make_log(1)])
+    assert [log["raw"] for _, log in consumer.read()] == [make_log(1)["raw"]]
+
+
+def test_skip_to_latest(bus):
+    consumer = LogBusConsumer("log_stream", bus)
+    consumer.setup()
+    bus.publish([make_log(i) for i in range(3)])
+    consumer.read(count=1)
+
+    consumer.skip_to_latest()
+    assert consumer.read() == []
+    bus.publish([make_log(3)])
+    assert [log["raw"] for _, log in consumer.read()] == [make_log(3)["raw"]]
+
+
+@pytest.mark.parametrize(
+    ("block_ms", "expected"),
+    ((None, None), (100, 100), (15_000, MAX_BLOCK_MS), (0, MAX_BLOCK_MS)),
+)
+def test_reads_block_for_less_than_the_socket_timeout(bus, block_ms, expected):
+    consumer = LogBusConsumer("log_stream", bus)
+    consumer.setup()
+    consumer.skip_to_latest()
+    with mock.patch.object(bus.red, "xreadgroup", return_value=[]) as xreadgroup:
+        consumer.read(block_ms=block_ms)
+    assert xreadgroup.call_args.kwargs["block"] == expected
+
+
+def test_stream_ids_are_numbered_across_batches():
+    stream = object.__new__(LogStream)
+    stream._last_timestamp = None
+    stream._last_second_lines = set()
+
+    first, second, third = (make_log(i, second=5) for i in range(3))
+    assert stream._stream_id(first) == f"{START + 5}-0"
+    assert stream._stream_id(second) == f"{START + 5}-1"
+    # Read from the logs history then from the bus
+    assert stream._stream_id(second) is None
+    assert stream._stream_id(third) == f"{START + 5}-2"
+    assert stream._stream_id(make_log(6)) == f"{START + 6}-0"
@@ -0,0 +1,74 @@
+import fakeredis
+
+from rcon.logs.cursor import LogCursor, raw_line_fingerprint
+
+NOW = 1_700_000_000
+
+
+def line(timestamp: int, content: str, relative: str = "0:01 min") -> str:
+    return f"[{relative} ({timestamp})] {content}"
+
+
+def make_cursor(red=None, **kwargs) -> LogCursor:
+    return LogCursor(red, clock=lambda: NOW, **kwargs)
+
+
+def test_fingerprint_ignores_relative_time():
+    assert raw_line_fingerprint(line(NOW, "CHAT", "0:01 min")) == (NOW, "CHAT")
+    assert raw_line_fingerprint(line(NOW, "CHAT", "5:01 min")) == (NOW, "CHAT")
+    assert raw_line_fingerprint("garbage") is None
+
+
+def test_window_shrinks_once_lines_are_consumed():
+    cursor = make_cursor(wide_window_seconds=3 * 3600, margin_seconds=60)
+    assert cursor.window_minutes() == 180
+
+    cursor.advance([line(NOW - 20, "KILL: a -> b")])
+    assert cursor.window_minutes() == 80 / 60
+
+
+def test_only_new_lines_are_returned():
+    cursor = make_cursor()
+    first = [line(NOW - 10, "CONNECTED a"), line(NOW - 5, "KILL: a -> b")]
+    assert cursor.advance(first) == first
+
+    # The same lines are returned by the next poll, with a new relative time
+    second = [
+        line(NOW - 10, "CONNECTED a", "0:11 min"),
+        line(NOW - 5, "KILL: a -> b", "0:06 min"),
+        line(NOW - 1, "CHAT a: hello"),
+    ]
+    assert cursor.advance(second) == [second[-1]]
+    assert cursor.advance(second) == []
+
+
+def test_lines_sharing_the_cursor_second_are_not_lost():
+    cursor = make_cursor()
+    cursor.advance([line(NOW, "KILL: a -> b")])
+
+    later = [line(NOW, "KILL: a -> b"), line(NOW, "KILL: c -> d")]
+    assert cursor.advance(later) == [later[1]]
+    assert cursor.seen_at_timestamp == {"KILL: a -> b", "KILL: c -> d"}
+
+
+def test_reset_looks_further_back_but_skips_consumed_lines():
+    cursor = make_cursor(margin_seconds=60, catch_up_seconds=300)
+    consumed = line(NOW - 10, "KILL: a -> b")
+    cursor.advance([consumed])
+    assert cursor.window_minutes() == 70 / 60
+
+    cursor.reset()
+    assert cursor.window_minutes() == 5
+    assert cursor.advance([consumed]) == []
+    assert cursor.window_minutes() == 70 / 60
+
+
+def test_cursor_is_persisted():
+    red = fakeredis.FakeRedis()
+    cursor = make_cursor(red)
+    cursor.advance([line(NOW - 10, "CONNECTED a"), line(NOW - 10, "CONNECTED b")])
+
+    restarted = make_cursor(red)
+    assert restarted.timestamp == NOW - 10
+    assert restarted.seen_at_timestamp == {"CONNECTED a", "CONNECTED b"}
+    assert restarted.advance([line(NOW - 10, "CONNECTED a")]) == []
@@ -0,0 +1,67 @@
+import time
+
+import fakeredis
+
+from rcon.logs.dedup import LEGACY_KEY, LogDedupIndex
+
+NOW_MS = int(time.time()) * 1000
+
+
+def log(timestamp_ms: int, line: str) -> dict:
+    return {"timestamp_ms": timestamp_ms, "line_without_time": line}
+
+
+def test_batch_reports_new_lines():
+    red = fakeredis.FakeRedis()
+    index = LogDedupIndex(red)
+
+    first = [log(NOW_MS, "KILL: a -> b"), log(NOW_MS, "KILL: c -> d")]
+    assert index.add_many(first) == [True, True]
+
+    second = first + [log(NOW_MS + 1000, "CHAT a: hi"), log(NOW_MS, "KILL: a -> b")]
+    assert index.add_many(second) == [False, False, True, False]
+    assert index.add_many([]) == []
+
+
+def test_lines_are_bucketed_and_buckets_expire():
+    red = fakeredis.FakeRedis()
+    index = LogDedupIndex(red, bucket_seconds=60, retention_seconds=3600)
+
+    index.add_many([log(NOW_MS, "a"), log(NOW_MS + 120_000, "b")])
+    buckets = sorted(k.decode() for k in red.scan_iter("unique_logs:*"))
+    assert buckets == [
+        index.bucket_key(index.bucket(NOW_MS)),
+        index.bucket_key(index.bucket(NOW_MS + 120_000)),
+    ]
+
+    bucket = index.bucket(NOW_MS)
+    expires_at = red.expiretime(index.bucket_key(bucket))
+    assert expires_at == index.bucket_expires_at(bucket)
+    assert NOW_MS // 1000 + 3600 < expires_at <= NOW_MS // 1000 + 3660
+
+
+def test_legacy_set_is_dropped():
+    red = fakeredis.FakeRedis()
+    red.sadd(LEGACY_KEY, "1|a")
+    index = LogDedupIndex(red)
+    index.add(log(NOW_MS, "a"))
+
+    index.drop_legacy_index()
+    assert not red.exists(LEGACY_KEY)
+    assert not index.add(log(NOW_MS, "a"))
+
+
+def test_recent_legacy_lines_are_not_recorded_again():
+    red = fakeredis.FakeRedis()
+    recent = [log(NOW_MS - i * 60_000, f"KILL: {i}") for i in range(5)]
+    red.sadd(
+        LEGACY_KEY,
+        "1|old",
+        *(f"{line['timestamp_ms']}|{line['line_without_time']}" for line in recent),
+    )
+    index = LogDedupIndex(red, retention_seconds=3600)
+
+    index.drop_legacy_index(batch_size=2)
+    assert not red.exists(LEGACY_KEY)
+    assert index.add_many(recent) == [False] * 5
+    assert index.add(log(1, "old"))
@@ -0,0 +1,114 @@
+import fakeredis
+import pytest
+
+from rcon import game_logs
+from rcon.logs.index import LogIndex
+from rcon.logs.record import LogRecord
+from rcon.utils import LogsHistory
+
+START = 1_700_000_000
+PLAYERS = ["Some Player", "Other", "Ünïcode Guy", "sniper"]
+ACTIONS = ["KILL", "TEAM KILL", "CHAT[Allies][Team]", "CONNECTED"]
+
+
+def make_log(i: int) -> LogRecord:
+    player_1 = PLAYERS[i % len(PLAYERS)]
+    player_2 = PLAYERS[(i + 1) % len(PLAYERS)] if i % 3 else None
+    action = ACTIONS[i % len(ACTIONS)]
+    line = f"{action}: {player_1} -> {player_2} {i}"
+    return LogRecord(
+        timestamp_ms=(START + i) * 1000,
+        raw_prefix=f"[0:00 min ({START + i})]",
+        line_without_time=line,
+        action=action,
+        player_name_1=player_1,
+        player_name_2=player_2,
+        message=line,
+    )
+
+
+@pytest.fixture
+def history(monkeypatch):
+    red = fakeredis.FakeRedis(decode_responses=True)
+    history = LogsHistory(max_len=50)
+    history.red = red
+    history.index = LogIndex(red, history.key, history.max_len)
+    monkeypatch.setattr(game_logs.LogLoop, "get_log_history_list", lambda: history)
+    return history
+
+
+def _scanned(monkeypatch, history, **kwargs):
+    with monkeypatch.context() as m:
+        m.setattr(history.index, "query", lambda *args, **kwargs: None)
+        return game_logs.get_recent_logs(**kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"end": 10},
+        {"start": 5, "end": 20},
+        {"min_timestamp": START + 70},
+        {"player_search": "some"},
+        {"player_search": "Unicode"},
+        {"player_search": ["Other", "sniper"], "exact_player_match": True},
+        {"action_filter": ["KILL"]},
+        {"action_filter": ["KILL"], "exact_action": True},
+        {"action_filter": ["CHAT"], "inclusive_filter": False},
+        {"player_search": "other", "action_filter": ["TEAM"], "end": 30},
+    ],
+)
+def test_indexed_results_match_a_full_scan(monkeypatch, history, kwargs):
+    for i in range(80):
+        history.add(make_log(i))
+    # Older lines were trimmed with the history
+    assert len(history) == 50
+
+    indexed = game_logs.get_recent_logs(**kwargs)
+    scanned = _scanned(monkeypatch, history, **kwargs)
+    assert indexed["logs"] == scanned["logs"]
+    assert sorted(indexed["players"]) == sorted(scanned["players"])
+    assert indexed["actions"] == scanned["actions"]
+
+
+def test_only_matching_lines_are_read(monkeypatch, history):
+    for i in range(40):
+        history.add(make_log(i))
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("The history was scanned")
+
+    monkeypatch.setattr(LogsHistory, "__iter__", no_scan)
+    result = game_logs.get_recent_logs(
+        player_search="sniper", exact_player_match=True, as_records=True
+    )
+    expected = [
+        i
+        for i in range(40)
+        if "sniper" in (make_log(i)["player_name_1"], make_log(i)["player_name_2"])
+    ]
+    assert [log["timestamp_ms"] for log in result["logs"]] == [
+        (START + i) * 1000 for i in reversed(expected)
+    ]
+    assert all(isinstance(log, LogRecord) for log in result["logs"])
+
+
+def test_lines_added_before_the_index_are_scanned(history):
+    history.red.lpush(history.key, make_log(0).dumps())
+    history.add(make_log(1))
+
+    assert history.index.query(0, 1) is not None
+    assert history.index.query(0, 100) is None
+    assert len(game_logs.get_recent_logs()["logs"]) == 2
+
+
+def test_stale_indexes_are_pruned(history):
+    for i in range(60):
+        history.add(make_log(i))
+    history.index.prune(oldest=60)
+    assert not history.red.zrange(history.index.names_key, 0, -1)
+    assert not list(history.red.scan_iter(match=f"{history.index.prefix}:name:*"))
+
+    history.clear()
+    assert not list(history.red.scan_iter(match=f"{history.key}*"))
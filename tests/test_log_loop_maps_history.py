@@ -2,6 +2,7 @@ import os
 from datetime import timedelta
 from unittest.mock import Mock, patch
 
+import fakeredis
 import pytest
 
 os.environ.setdefault("HLL_MAINTENANCE_CONTAINER", "1")
@@ -11,7 +12,7 @@ from rcon.game.hll.profile import HLL_PROFILE
 from rcon.game.hllv.profile import HLLV_PROFILE
 from rcon.logs.loop import LogLoop
 from rcon.maps import GameMode
-from rcon.utils import default_player_info_dict
+from rcon.utils import MapsHistory, default_player_info_dict
 
 OFFENSIVE_MAP = "carentan_offensive_us"
 
@@ -53,6 +54,8 @@ def make_loop(gamestate, now=1002):
     loop.rcon.get_gamestate.return_value = gamestate
     loop.get_detailed_players = Mock(return_value={"players": {}, "fail_count": 0})
     loop.record_player_stats = Mock()
+    loop.get_player_stats = Mock(return_value={})
+    loop.save_player_stats = Mock()
     return loop
 
 
@@ -199,13 +202,107 @@ def test_hllv_player_stats_use_normalized_logical_team_ids(team, expected_team_i
     }
 
     # The first sample creates the cache entry; the next records its unit.
-    loop.record_player_stats(current_map, 10, detailed_players)
-    loop.record_player_stats(current_map, 20, detailed_players)
+    player_stats = {}
+    loop.record_player_stats(current_map, player_stats, 10, detailed_players)
+    loop.record_player_stats(current_map, player_stats, 20, detailed_players)
 
-    unit = current_map["player_stats"]["player-id"]["p_unit"]
+    unit = player_stats["player-id"]["p_unit"]
     assert unit == {
         "ts": 20,
         "team": expected_team_id,
         "squad": 3,
         "role": 5,
     }
+
+
+@patch("rcon.logs.loop.MapsHistory")
+def test_unchanged_map_is_not_written_back(maps_history_cls):
+    current_map = make_map_info(match_time=9_000)
+    history = maps_history_cls.return_value
+    history.get_current_map.return_value = current_map
+    loop = make_loop(make_gamestate())
+
+    loop.update_maps_history(prev_map_time_elapsed=1)
+    loop.update_maps_history(prev_map_time_elapsed=2)
+
+    assert loop.save_player_stats.call_count == 2
+    history.update.assert_called_once_with(0, current_map)
+
+
+def make_player_stat(name, combat=0):
+    return {"names": [name], "status": "online", "combat": combat}
+
+
+@pytest.fixture
+def maps_history():
+    history = object.__new__(MapsHistory)
+    history.red = fakeredis.FakeRedis()
+    history.key = "maps_history"
+    return history
+
+
+def make_stats_loop():
+    loop = object.__new__(LogLoop)
+    loop.player_stats_key = None
+    loop.player_stats = {}
+    loop.saved_player_stats = {}
+    return loop
+
+
+def test_only_the_players_whose_stats_changed_are_written(maps_history):
+    current_map = make_map_info()
+    loop = make_stats_loop()
+    player_stats = loop.get_player_stats(maps_history, current_map)
+    player_stats["1"] = make_player_stat("Alice")
+    player_stats["2"] = make_player_stat("Bob")
+    loop.save_player_stats(maps_history, current_map)
+
+    with patch.object(
+        maps_history, "save_player_stats", wraps=maps_history.save_player_stats
+    ) as save_player_stats:
+        loop.save_player_stats(maps_history, current_map)
+        save_player_stats.assert_not_called()
+
+        player_stats["2"]["combat"] = 10
+        loop.save_player_stats(maps_history, current_map)
+        assert save_player_stats.call_args.args[1].keys() == {"2"}
+
+    restarted = make_stats_loop()
+    assert restarted.get_player_stats(maps_history, current_map) == {
+        "1": make_player_stat("Alice"),
+        "2": make_player_stat("Bob", combat=10),
+    }
+    assert maps_history.red.ttl("maps_history:player_stats:1000") > 0
+
+
+def test_player_stats_are_reloaded_when_the_match_changes(maps_history):
+    previous_map = make_map_info()
+    loop = make_stats_loop()
+    loop.get_player_stats(maps_history, previous_map)["1"] = make_player_stat("Alice")
+    loop.save_player_stats(maps_history, previous_map)
+
+    current_map = make_map_info()
+    current_map["start"] = 2_000
+    assert loop.get_player_stats(maps_history, current_map) == {}
+    assert maps_history.get_player_stats(previous_map) == {
+        "1": make_player_stat("Alice")
+    }
+
+    maps_history.clear_player_stats(previous_map)
+    assert maps_history.get_player_stats(previous_map) == {}
+
+
+def test_maps_recorded_with_their_player_stats_are_still_read(maps_history):
+    current_map = make_map_info()
+    current_map["player_stats"] = {"1": make_player_stat("Alice")}
+    loop = make_stats_loop()
+
+    assert loop.get_player_stats(maps_history, current_map) == {
+        "1": make_player_stat("Alice")
+    }
+    # Moved to the hash on the next write
+    loop.save_player_stats(maps_history, current_map)
+    current_map["player_stats"] = {}
+    assert maps_history.with_player_stats(current_map)["player_stats"] == {
+        "1": make_player_stat("Alice")
+    }
@@ -0,0 +1,64 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from rcon.logs.partitions import (
+    Partition,
+    add_months,
+    expired_partitions,
+    list_partitions,
+    partition_name,
+)
+
+
+@pytest.mark.parametrize(
+    "month, months, expected",
+    [
+        (datetime(2024, 1, 1), 0, datetime(2024, 1, 1)),
+        (datetime(2024, 11, 1), 2, datetime(2025, 1, 1)),
+        (datetime(2024, 1, 1), -1, datetime(2023, 12, 1)),
+        (datetime(2024, 3, 1), -26, datetime(2022, 1, 1)),
+    ],
+)
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_partition_name():
+    assert partition_name(datetime(2024, 3, 1)) == "log_lines_p2024_03"
+
+
+def test_list_partitions():
+    sess = MagicMock()
+    sess.execute.return_value = [
+        (
+            "log_lines_p2024_02",
+            "FOR VALUES FROM ('2024-02-01 00:00:00') TO ('2024-03-01 00:00:00')",
+        ),
+        ("log_lines_default", "DEFAULT"),
+        (
+            "log_lines_p2024_01",
+            "FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')",
+        ),
+    ]
+    assert list_partitions(sess) == [
+        Partition("log_lines_p2024_01", datetime(2024, 1, 1), datetime(2024, 2, 1)),
+        Partition("log_lines_p2024_02", datetime(2024, 2, 1), datetime(2024, 3, 1)),
+        Partition("log_lines_default"),
+    ]
+
+
+def test_expired_partitions():
+    partitions = [
+        Partition(partition_name(start), start, add_months(start, 1))
+        for start in (datetime(2024, month, 1) for month in range(1, 7))
+    ] + [Partition("log_lines_default")]
+
+    now = datetime(2024, 6, 15)
+    assert [p.name for p in expired_partitions(partitions, 2, now)] == [
+        "log_lines_p2024_01",
+        "log_lines_p2024_02",
+        "log_lines_p2024_03",
+    ]
+    assert expired_partitions(partitions, 12, now) == []
@@ -0,0 +1,58 @@
+import pickle
+from datetime import UTC, datetime
+
+import orjson
+
+from rcon.logs.parser import parse_log_records, parse_logs
+from rcon.logs.record import LogRecord, dumps_log
+from rcon.utils import logs_deserializer
+
+RAW_LOGS = [
+    "[10:00 min (1700000000)] CONNECTED Some Player (76561198000000001)",
+    "[8:00 min (1700000120)] KILL: Some Player(Allies/76561198000000001) -> Other(Axis/76561198000000002) with M1 GARAND",
+    "[7:00 min (1700000180)] MESSAGE: player [Other(76561198000000002)], content [multi\nline]",
+]
+
+
+def _without_relative_time(log) -> dict:
+    return {**log, "relative_time_ms": None}
+
+
+def test_records_match_the_parsed_dicts():
+    records = parse_log_records(RAW_LOGS)
+    dicts = parse_logs(RAW_LOGS)["logs"]
+
+    assert [_without_relative_time(r.to_dict()) for r in records] == [
+        _without_relative_time(d) for d in dicts
+    ]
+    kill = records[1]
+    assert kill["action"] == "KILL"
+    assert kill.get("weapon") == "M1 GARAND"
+    assert kill["event_time"] == datetime.fromtimestamp(1700000120, tz=UTC)
+    assert dict(kill) == kill.to_dict()
+
+
+def test_strings_are_shared():
+    kill = parse_log_records(RAW_LOGS)[1]
+    # The message is a slice of the line and the raw line is rebuilt from it
+    assert isinstance(kill._message, int)
+    assert kill._raw_prefix == "[8:00 min (1700000120)]"
+    assert kill["raw"] == RAW_LOGS[1]
+    assert kill["action"] is parse_log_records(RAW_LOGS)[1]["action"]
+
+
+def test_logs_history_round_trip():
+    for record in parse_log_records(RAW_LOGS):
+        record["player_id_1"] = "backtracked"
+        data = dumps_log(record)
+        assert orjson.loads(data) == orjson.loads(orjson.dumps(record.to_dict()))
+
+        loaded = LogRecord.loads(data)
+        assert loaded == logs_deserializer(data)
+        assert loaded["player_id_1"] == "backtracked"
+        assert pickle.loads(pickle.dumps(loaded)) == loaded
+
+
+def test_non_log_entries_are_returned_as_is():
+    assert LogRecord.loads(b'"garbage"') == "garbage"
+    assert LogRecord.loads(b'{"event_time": 1}') == {"event_time": 1}
@@ -1,10 +1,16 @@
 import datetime
+from contextlib import contextmanager
 from datetime import UTC
+from unittest import mock
 
+import fakeredis
 import pytest
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from rcon.logs.recorder import LogRecorder
+from rcon.logs.bus import LogBus, LogBusConsumer
+from rcon.logs.record import LogRecord
+from rcon.logs.recorder import HighWaterMark, LogRecorder, _copy_buffer
 from rcon.models import LogLine, PlayerID, enter_session
 
 first_player_id = "76561198091327692"
@@ -142,3 +148,97 @@ class TestLogRecorder:
             assert res[1].player_1.player_id == first_player_id
             assert res[1].type == "KILL"
             assert res[1].player_2.player_id == second_player_id
+
+
+def test_high_water_mark():
+    mark = HighWaterMark()
+    first = {"timestamp_ms": 1612695641000, "raw": "[646 ms (1612695641)] KILL: a"}
+    second = {**first, "raw": "[1.2 sec (1612695641)] TEAM KILL: b"}
+    later = {"timestamp_ms": 1612695642000, "raw": "[0 ms (1612695642)] KILL: c"}
+    assert not mark.covers(first)
+
+    mark.advance([first])
+    assert mark.covers(first)
+    # Same time, but not recorded yet
+    assert not mark.covers(second)
+    # The relative time of a line changes from a poll to the next
+    assert mark.covers({**first, "raw": "[5 sec (1612695641)] KILL: a"})
+
+    mark.advance([second, later])
+    assert mark.covers(second)
+    assert mark.covers(later)
+    assert mark.lines == {"KILL: c"}
+
+
+def test_copy_buffer_tells_nulls_from_empty_strings():
+    event_time = datetime.datetime.fromtimestamp(1612695641, tz=UTC)
+    row = {
+        "version": 1,
+        "event_time": event_time,
+        "type": "MESSAGE",
+        "player1_name": "Some Player",
+        "player1_player_id": 42,
+        "player2_name": None,
+        "player2_player_id": None,
+        "weapon": None,
+        "raw": '[1 sec (1612695641)] MESSAGE: player [Some Player], content [a "quoted"\nline]',
+        "content": "",
+        "server": "1",
+        "game": 0,
+    }
+    buffer = _copy_buffer([row], event_time)
+    assert buffer.getvalue() == (
+        '"1","2021-02-07 11:00:41","2021-02-07 11:00:41","MESSAGE","Some Player","42",,,,'
+        '"[1 sec (1612695641)] MESSAGE: player [Some Player], content [a ""quoted""\nline]",'
+        '"","1","0"\r\n'
+    )
+
+
+@pytest.mark.parametrize("failure", ["flush", "commit"])
+def test_failed_save_leaves_the_batch_pending(failure):
+    red = fakeredis.FakeRedis(decode_responses=True)
+    bus = LogBus(red, max_len=100)
+    consumer = LogBusConsumer("log_recorder", bus)
+    consumer.setup()
+    bus.publish(
+        [
+            LogRecord(
+                timestamp_ms=1612695641000 + i,
+                raw_prefix="[646 ms (1612695641)]",
+                line_without_time=f"KILL: a -> b {i}",
+                action="KILL",
+                message=f"a -> b {i}",
+            )
+            for i in range(3)
+        ]
+    )
+
+    sess = mock.MagicMock()
+    sess.get_bind.return_value.dialect.name = "sqlite"
+    if failure == "flush":
+        sess.flush.side_effect = IntegrityError("INSERT", {}, Exception())
+    else:
+        sess.commit.side_effect = IntegrityError("COMMIT", {}, Exception())
+
+    @contextmanager
+    def failing_session():
+        # Like enter_session, the error is logged but not raised
+        try:
+            yield sess
+        except IntegrityError:
+            sess.rollback()
+
+    mark = HighWaterMark(1612695640000, ["KILL: x"])
+    recorder = LogRecorder()
+    with (
+        mock.patch("rcon.logs.recorder.enter_session", failing_session),
+        mock.patch.object(recorder, "_collect_player_ids", return_value={}),
+    ):
+        recorder._record_from_bus(consumer, mark, red)
+
+    assert bus.lag()["log_recorder"]["pending"] == 3
+    assert mark.timestamp_ms == 1612695640000
+    assert mark.lines == {"KILL: x"}
+    assert HighWaterMark.load(red) is None
+    # They're read again on the next run
+    assert len(consumer.read()) == 3
@@ -1107,3 +1107,29 @@ to test something]""",
 )
 def test_player_messages(raw_log_line, expected):
     assert Rcon.parse_log_line(raw_log_line) == expected
+
+
+def test_parse_logs_single_pass():
+    raw_logs = [
+        "[10:00 min (1700000000)] CONNECTED Some Player (76561198000000001)",
+        "[9:00 min (1700000060)] SOMETHING NEW the parser doesn't know",
+        "[8:00 min (1700000120)] KILL: Some Player(Allies/76561198000000001) -> Other(Axis/76561198000000002) with M1 GARAND",
+        "[8:00 min (1700000120)] CHAT[Team][Other(Axis/76561198000000002)]: hello",
+    ]
+
+    parsed = Rcon.parse_logs(raw_logs)
+    assert [log["action"] for log in parsed["logs"]] == [
+        "CHAT[Axis][Team]",
+        "KILL",
+        "CONNECTED",
+    ]
+    assert parsed["logs"][0]["timestamp_ms"] == 1700000120000
+    assert parsed["logs"][0]["event_time"] == datetime.fromtimestamp(1700000120, tz=UTC)
+    assert sorted(parsed["players"]) == ["Other", "Some Player"]
+    assert "CHAT[Axis][Team]" in parsed["actions"]
+    assert "MESSAGE" in parsed["actions"]
+
+    kills = Rcon.parse_logs(raw_logs, filter_action="KILL")
+    assert [log["action"] for log in kills["logs"]] == ["KILL"]
+    chats = Rcon.parse_logs(raw_logs, filter_player="Other")
+    assert [log["action"] for log in chats["logs"]] == ["CHAT[Axis][Team]", "KILL"]
@@ -0,0 +1,125 @@
+import fakeredis
+import orjson
+import pytest
+
+from rcon.logs.index import LogIndex
+from rcon.logs.record import LogRecord
+from rcon.utils import FixedLenList, LogsHistory
+
+START = 1_700_000_000
+
+
+def make_log(i: int) -> LogRecord:
+    line = f"KILL: Some Player -> Other {i}"
+    return LogRecord(
+        timestamp_ms=(START + i) * 1000,
+        raw_prefix=f"[0:00 min ({START + i})]",
+        line_without_time=line,
+        action="KILL",
+        player_name_1="Some Player",
+        player_name_2="Other",
+        message=line,
+    )
+
+
+@pytest.fixture
+def red():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def history(red):
+    history = LogsHistory(max_len=500)
+    history.red = red
+    history.index = LogIndex(red, history.key, history.max_len)
+    history.page_size = 7
+    return history
+
+
+def test_iteration_is_paged(red):
+    fixed = FixedLenList[int]("fixed", max_len=50)
+    fixed.red = red
+    fixed.page_size = 4
+    for i in range(10):
+        fixed.add(i)
+
+    assert list(fixed) == list(reversed(range(10)))
+    assert [len(page) for page in fixed.iter_pages()] == [4, 4, 2]
+    assert [len(page) for page in fixed.iter_pages(2, 7)] == [4, 1]
+    assert 3 in fixed
+    assert 42 not in fixed
+
+
+def test_iteration_stops_early(red, monkeypatch):
+    fixed = FixedLenList[int]("fixed", max_len=50)
+    fixed.red = red
+    fixed.page_size = 4
+    for i in range(20):
+        fixed.add(i)
+
+    reads = []
+    read_range = fixed._read_range
+
+    def counting_read_range(start, end, state):
+        reads.append((start, end))
+        return read_range(start, end, state)
+
+    monkeypatch.setattr(fixed, "_read_range", counting_read_range)
+    for value in fixed:
+        if value == 15:
+            break
+    assert reads == [(0, 3), (4, 7)]
+
+
+def test_pages_are_not_shifted_by_new_lines(history):
+    for i in range(20):
+        history.add(make_log(i))
+
+    seen = []
+    for log in history:
+        seen.append(log["timestamp_ms"])
+        if len(seen) == 5:
+            # Pushed while paging through the history
+            history.add(make_log(100))
+            history.add(make_log(101))
+    assert seen == [(START + i) * 1000 for i in reversed(range(20))]
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 13, 64, 200])
+@pytest.mark.parametrize("since", [-5, 0, 1, 7, 63, 150, 199, 300])
+def test_since(history, count, since):
+    for i in range(count):
+        history.add(make_log(i))
+
+    expected = [
+        log["raw"] for log in history if log["timestamp_ms"] >= (START + since) * 1000
+    ]
+    assert [log["raw"] for log in history.since((START + since) * 1000)] == expected
+
+
+def test_since_only_reads_recent_lines(history, monkeypatch):
+    for i in range(200):
+        history.add(make_log(i))
+
+    positions = []
+    read_range = history._read_range
+
+    def tracking_read_range(start, end, state):
+        positions.append(end)
+        return read_range(start, end, state)
+
+    monkeypatch.setattr(history, "_read_range", tracking_read_range)
+    lines = history.since((START + 195) * 1000)
+    assert len(lines) == 5
+    assert max(positions) < 8
+
+
+def test_since_skips_entries_that_are_not_logs(history):
+    for i in range(5):
+        history.add(make_log(i))
+    history.red.lpush(history.key, orjson.dumps("garbage"))
+    history.add(make_log(5))
+
+    assert [log["timestamp_ms"] for log in history.since((START + 3) * 1000)] == [
+        (START + i) * 1000 for i in (5, 4, 3)
+    ]
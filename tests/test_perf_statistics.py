@@ -0,0 +1,65 @@
+import fakeredis
+
+from rcon.perf_statistics import (
+    PerformanceStatistics,
+    latency_bucket,
+    percentiles_from_buckets,
+)
+
+
+def test_metrics_are_buffered_until_flushed():
+    red = fakeredis.FakeRedis()
+    stats = PerformanceStatistics("rcon", True, flush_interval=3600, red=red)
+
+    stats.increment("send")
+    stats.increment("send_size", 42)
+    stats.observe_latency("GetServerInformation", 0.004)
+    assert red.dbsize() == 0
+
+    stats.flush()
+    assert int(red.get("rcon::send")) == 1
+    assert int(red.get("rcon::send_size")) == 42
+
+
+def test_disabled_statistics_record_nothing():
+    red = fakeredis.FakeRedis()
+    stats = PerformanceStatistics("rcon", False, flush_interval=0, red=red)
+    stats.increment("send")
+    stats.observe_latency("GetServerInformation", 0.004)
+    stats.flush()
+    assert red.dbsize() == 0
+
+
+def test_dump_returns_counters_and_latency_percentiles_then_resets():
+    red = fakeredis.FakeRedis()
+    # Two services reporting into the same namespace
+    first = PerformanceStatistics("rcon", True, flush_interval=3600, red=red)
+    second = PerformanceStatistics("rcon", True, flush_interval=3600, red=red)
+    for _ in range(90):
+        first.observe_latency("GetServerInformation", 0.003)
+    for _ in range(10):
+        second.observe_latency("GetServerInformation", 0.2)
+    first.increment("send", 90)
+    second.increment("send", 10)
+    first.flush()
+    second.flush()
+
+    dump = PerformanceStatistics("rcon", True, red=red).dump()
+
+    assert dump["send"] == 100
+    assert dump["latency::GetServerInformation"] == {
+        "count": 100,
+        "p50_ms": 5.0,
+        "p95_ms": 250.0,
+        "p99_ms": 250.0,
+    }
+    after = PerformanceStatistics("rcon", True, red=red).dump()
+    assert after == {"send": 0}
+
+
+def test_latency_buckets():
+    assert latency_bucket(0.0005) == "1"
+    assert latency_bucket(0.001) == "1"
+    assert latency_bucket(0.0011) == "2.5"
+    assert latency_bucket(60) == "inf"
+    assert percentiles_from_buckets({}) == {"count": 0}
@@ -1,12 +1,26 @@
+import contextlib
+import datetime
 import os
+from unittest.mock import MagicMock
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 os.environ["HLL_MAINTENANCE_CONTAINER"] = "1"
+import rcon.workers
+from rcon.game_logs import get_historical_logs_columns
 from rcon.maps import Team
-from rcon.models import PlayerID, PlayerSoldier, PlayerStats, calc_weapon_type_usage
+from rcon.models import (
+    LogLine,
+    PlayerID,
+    PlayerSoldier,
+    PlayerStats,
+    calc_weapon_type_usage,
+)
 from rcon.player_stats import BaseStats
 from rcon.types import PlayerTeamAssociation, PlayerTeamConfidence
+from rcon.utils import get_temp_default_stats
+from rcon.workers import _upsert_player_stats, record_map_stats
 
 
 class StaticStats(BaseStats):
@@ -212,3 +226,126 @@ def test_detect_ignores_some_other_side():
     assert p.detect_team() == PlayerTeamAssociation(
         side=Team.ALLIES, confidence=PlayerTeamConfidence.STRONG, ratio=99.12
     )
+
+
+def test_historical_logs_columns_match_the_log_line_dicts():
+    event_time = datetime.datetime(2024, 3, 1, 20, 15, 30, tzinfo=datetime.UTC)
+    killer = PlayerID(player_id="killer-id")
+    victim = PlayerID(player_id="victim-id")
+    lines = [
+        LogLine(
+            version=1,
+            event_time=event_time,
+            type="KILL",
+            player1_name="Killer",
+            player2_name="Victim",
+            weapon=None,
+            raw="[1:00 min (1709324130)] KILL: Killer(Allies/killer-id) -> Victim(Axis/victim-id) with M1 GARAND",
+            content="Killer(Allies/killer-id) -> Victim(Axis/victim-id) with M1 GARAND",
+        ),
+        LogLine(
+            version=1,
+            event_time=event_time,
+            type="CHAT[Allies]",
+            player1_name="Killer",
+            weapon=None,
+            raw="[1:00 min (1709324130)] CHAT[Allies][Killer(Allies/killer-id)]: gg",
+            content="Killer: gg",
+        ),
+    ]
+    lines[0].player_1, lines[0].player_2 = killer, victim
+    lines[1].player_1 = killer
+    sess = MagicMock()
+    sess.execute.return_value = [
+        (
+            line.version,
+            line.event_time,
+            line.type,
+            line.player1_name,
+            line.player_1.player_id if line.player_1 else None,
+            line.player2_name,
+            line.player_2.player_id if line.player_2 else None,
+            line.weapon,
+            line.raw,
+            line.content,
+        )
+        for line in lines
+    ]
+
+    logs = get_historical_logs_columns(sess, event_time, event_time, server_filter="1")
+    assert logs == [line.compatible_dict() for line in lines]
+    assert logs[0]["weapon"] == "M1 GARAND"
+
+    (statement,) = sess.execute.call_args.args
+    query = str(statement.compile(dialect=postgresql.dialect()))
+    assert query.count("LEFT OUTER JOIN steam_id_64") == 2
+    assert "ORDER BY log_lines.event_time ASC" in query
+
+
+def _stat_row(player_id_id):
+    return {
+        "player_id_id": player_id_id,
+        "map_id": 1,
+        "name": "Player",
+        "kills": 3,
+        "weapons": {"M1 GARAND": 3},
+    }
+
+
+@pytest.mark.parametrize(
+    "force, conflict",
+    [
+        (
+            True,
+            "ON CONFLICT ON CONSTRAINT unique_map_player DO UPDATE SET "
+            "name = excluded.name, kills = excluded.kills, weapons = excluded.weapons",
+        ),
+        (False, "ON CONFLICT ON CONSTRAINT unique_map_player DO NOTHING"),
+    ],
+)
+def test_player_stats_are_upserted_in_one_statement(force, conflict):
+    sess = MagicMock()
+    _upsert_player_stats(sess, [_stat_row(1), _stat_row(2)], force=force)
+
+    sess.execute.assert_called_once()
+    (statement,) = sess.execute.call_args.args
+    query = str(statement.compile(dialect=postgresql.dialect()))
+    assert query.startswith("INSERT INTO player_stats (playersteamid_id, map_id")
+    assert query.count("%(playersteamid_id_m") == 2
+    assert query.endswith(conflict)
+
+
+def test_temp_default_stats_of_recorded_stats():
+    existing = PlayerStats(
+        combat=10,
+        offense=20,
+        defense=30,
+        support=40,
+        vehicle_kills=1,
+        vehicles_destroyed=2,
+        kills=5,
+        deaths=6,
+        units=[],
+        level=50,
+    )
+    stats = get_temp_default_stats(existing)
+    assert stats["combat"] == 10
+    assert stats["p_combat"] == 0
+    assert stats["level"] == 50
+    assert stats["status"] == "offline"
+
+
+def test_a_failing_map_is_reported_instead_of_raised(monkeypatch):
+    sess = MagicMock()
+    monkeypatch.setattr(
+        rcon.workers, "enter_session", lambda: contextlib.nullcontext(sess)
+    )
+    monkeypatch.setattr(
+        rcon.workers,
+        "record_stats_from_map",
+        MagicMock(side_effect=RuntimeError("connection lost")),
+    )
+
+    assert record_map_stats(1) == "RuntimeError('connection lost')"
+    sess.rollback.assert_called_once()
+    sess.commit.assert_not_called()
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from rcon.steam_refresh import (
+    API_CALLS_PER_BATCH,
+    SteamRefreshScheduler,
+    get_refresh_tiers,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_tiers_are_ordered_by_priority():
+    tiers = get_refresh_tiers(dormant_after_days=180)
+
+    assert [t.name for t in tiers] == ["online", "active", "recent", "occasional"]
+    assert tiers[0].last_seen_within is None
+    assert tiers[-1].last_seen_within == timedelta(days=180)
+    # More active players are refreshed more often
+    max_ages = [t.max_age for t in tiers]
+    assert max_ages == sorted(max_ages)
+
+
+def test_short_dormancy_drops_redundant_tiers():
+    tiers = get_refresh_tiers(dormant_after_days=10)
+
+    assert [t.name for t in tiers] == ["online", "active", "occasional"]
+
+
+def test_budget_is_spread_over_the_day(clock):
+    scheduler = SteamRefreshScheduler(red=mock.Mock(), tick_seconds=30, clock=clock)
+    daily_budget = 86_400 // 10  # one call every 10 seconds
+
+    clock.now += 10
+    scheduler.fill_tokens(daily_budget)
+    assert scheduler.batches_available() == 0
+
+    clock.now += 10
+    scheduler.fill_tokens(daily_budget)
+    assert scheduler.batches_available() == 1
+
+
+def test_idle_time_does_not_build_up_a_burst(clock):
+    scheduler = SteamRefreshScheduler(red=mock.Mock(), tick_seconds=30, clock=clock)
+
+    clock.now += 24 * 60 * 60
+    scheduler.fill_tokens(daily_api_budget=100_000)
+
+    # 100k calls a day is ~35 calls per 30 second tick
+    assert scheduler.tokens == pytest.approx(100_000 / 86_400 * 30)
+    assert scheduler.batches_available() == int(scheduler.tokens // API_CALLS_PER_BATCH)
@@ -0,0 +1,120 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+import redis.exceptions
+
+import rcon.user_config.utils
+from rcon.cache_utils import _handle_invalidation
+from rcon.user_config.log_stream import LogStreamUserConfig
+from rcon.user_config.utils import (
+    USER_CONFIG_VERSIONS_KEY,
+    UserConfigCache,
+    bump_user_config_version,
+)
+
+IDENTITY = "1_1_LogStreamUserConfig"
+
+
+@pytest.fixture
+def red():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def cache(red, monkeypatch):
+    cache = UserConfigCache(check_seconds=3600, red=red)
+    monkeypatch.setattr(rcon.user_config.utils, "_user_config_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def get_user_config(cache, monkeypatch):
+    monkeypatch.setenv("HLL_DB_URL", "postgresql://")
+    monkeypatch.setenv("HLL_GAME", "hll")
+    monkeypatch.setenv("SERVER_NUMBER", "1")
+    get_user_config = mock.Mock(return_value={"enabled": True, "stream_size": 10})
+    monkeypatch.setattr(rcon.user_config.utils, "get_user_config", get_user_config)
+    with mock.patch("rcon.cache_utils._ensure_invalidation_listener"):
+        yield get_user_config
+
+
+def test_configs_are_loaded_once(get_user_config):
+    config = LogStreamUserConfig.load_from_db()
+    assert config.stream_size == 10
+    assert LogStreamUserConfig.load_from_db() is config
+    get_user_config.assert_called_once()
+
+
+def test_saving_a_config_reloads_it(get_user_config, red):
+    LogStreamUserConfig.load_from_db()
+    get_user_config.return_value = {"enabled": True, "stream_size": 20}
+
+    with mock.patch.object(red, "publish") as publish:
+        bump_user_config_version(IDENTITY)
+    assert LogStreamUserConfig.load_from_db().stream_size == 20
+    assert red.hget(USER_CONFIG_VERSIONS_KEY, IDENTITY) == "1"
+
+    # Saved by another process
+    get_user_config.return_value = {"enabled": True, "stream_size": 30}
+    _handle_invalidation(publish.call_args.args[1])
+    assert LogStreamUserConfig.load_from_db().stream_size == 30
+
+
+def test_missed_invalidations_are_caught_by_the_version_check(
+    get_user_config, cache, red
+):
+    LogStreamUserConfig.load_from_db()
+    red.hincrby(USER_CONFIG_VERSIONS_KEY, IDENTITY, 1)
+    get_user_config.return_value = {"enabled": True, "stream_size": 20}
+    assert LogStreamUserConfig.load_from_db().stream_size == 10
+
+    cache.check_seconds = 0
+    assert LogStreamUserConfig.load_from_db().stream_size == 20
+    assert LogStreamUserConfig.load_from_db().stream_size == 20
+    assert get_user_config.call_count == 2
+
+
+def test_configs_are_reloaded_once_too_old(get_user_config, cache):
+    LogStreamUserConfig.load_from_db()
+    # Saved by another process that couldn't bump the version
+    get_user_config.return_value = {"enabled": True, "stream_size": 20}
+    assert LogStreamUserConfig.load_from_db().stream_size == 10
+
+    cache.max_age_seconds = 0
+    assert LogStreamUserConfig.load_from_db().stream_size == 20
+    assert get_user_config.call_count == 2
+
+
+def test_configs_invalidated_while_loading_are_not_cached(get_user_config, cache):
+    def saved_while_loading(*args, **kwargs):
+        cache.pop(IDENTITY)
+        return {"enabled": True, "stream_size": 10}
+
+    get_user_config.side_effect = saved_while_loading
+    LogStreamUserConfig.load_from_db()
+    get_user_config.side_effect = None
+    LogStreamUserConfig.load_from_db()
+    LogStreamUserConfig.load_from_db()
+    assert get_user_config.call_count == 2
+
+
+def test_invalid_configs_are_not_cached(get_user_config):
+    get_user_config.return_value = {"enabled": True, "stream_size": 0}
+    assert LogStreamUserConfig.load_from_db().stream_size == 1000
+    LogStreamUserConfig.load_from_db()
+    assert get_user_config.call_count == 2
+
+
+def test_configs_are_not_cached_without_redis(get_user_config, red):
+    with mock.patch.object(red, "hget", side_effect=redis.exceptions.ConnectionError):
+        LogStreamUserConfig.load_from_db()
+        LogStreamUserConfig.load_from_db()
+    assert get_user_config.call_count == 2
+
+
+def test_saving_a_config_without_redis_configured_does_not_fail(monkeypatch):
+    monkeypatch.delenv("HLL_REDIS_HOST", raising=False)
+    monkeypatch.delenv("HLL_REDIS_PORT", raising=False)
+    monkeypatch.setattr(rcon.user_config.utils, "_user_config_cache", UserConfigCache())
+    bump_user_config_version(IDENTITY)